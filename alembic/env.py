@@ -12,13 +12,16 @@ from sqlalchemy import pool
 
 from alembic import context
 
-from app.database.database import Base
+from app.database.database import Base, DATABASE_URL
 from app.models.activity import Activity
 from app.models.building import Building
 from app.models.organization import Organization
 from app.models.phones import Phones
 from app.models.organization_activity import OrganizationActivity
 from app.models.building_organization import BuildingOrganization
+from app.models.activity_closure import ActivityClosure
+from app.models.import_progress import ImportProgress, ImportDeferred
+from app.models.change_log import ChangeLog, ChangeLogState
 
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
@@ -27,7 +30,11 @@ config = context.config
 # Interpret the config file for Python logging.
 # This line sets up loggers basically.
 if config.config_file_name is not None:
-    fileConfig(config.config_file_name)
+    fileConfig(config.config_file_name, disable_existing_loggers=False)
+
+# URL базы данных - тот же, что у приложения (переменная окружения DATABASE_URL, см. app/database/database.py)
+# ("%" экранируется для configparser)
+config.set_main_option("sqlalchemy.url", DATABASE_URL.replace("%", "%%"))
 
 # add your model's MetaData object here
 # for 'autogenerate' support
@@ -73,6 +80,18 @@ def run_migrations_online() -> None:
     and associate a connection with the context.
 
     """
+    # соединение, переданное вызывающим кодом (например, генератором тестового каталога)
+    connection = config.attributes.get("connection")
+    if connection is not None:
+        context.configure(
+            connection=connection, 
+            target_metadata=target_metadata,
+            render_as_batch=True
+        )
+        with context.begin_transaction():
+            context.run_migrations()
+        return
+
     connectable = engine_from_config(
         config.get_section(config.config_ini_section, {}),
         prefix="sqlalchemy.",
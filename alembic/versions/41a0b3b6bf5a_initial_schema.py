@@ -0,0 +1,90 @@
+"""initial schema
+
+Revision ID: 41a0b3b6bf5a
+Revises: 
+Create Date: 2025-01-15 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '41a0b3b6bf5a'
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('activities',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(), nullable=True),
+        sa.Column('parent_id', sa.Integer(), nullable=True),
+        sa.Column('level', sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(['parent_id'], ['activities.id'], ),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_activities_id', 'activities', ['id'], unique=False)
+    op.create_index('ix_activities_name', 'activities', ['name'], unique=False)
+
+    op.create_table('buildings',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('address', sa.String(), nullable=False),
+        sa.Column('latitude', sa.Float(), nullable=False),
+        sa.Column('longitude', sa.Float(), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_buildings_address', 'buildings', ['address'], unique=False)
+    op.create_index('ix_buildings_id', 'buildings', ['id'], unique=False)
+
+    op.create_table('organizations',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_organizations_id', 'organizations', ['id'], unique=False)
+    op.create_index('ix_organizations_name', 'organizations', ['name'], unique=False)
+
+    op.create_table('building_organization',
+        sa.Column('building_id', sa.Integer(), nullable=False),
+        sa.Column('organization_id', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['building_id'], ['buildings.id'], name='fk_building_id'),
+        sa.ForeignKeyConstraint(['organization_id'], ['organizations.id'], name='fk_organization_id'),
+        sa.PrimaryKeyConstraint('building_id', 'organization_id')
+    )
+
+    op.create_table('organization_activity',
+        sa.Column('organization_id', sa.Integer(), nullable=False),
+        sa.Column('activity_id', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['activity_id'], ['activities.id'], name='fk_activity_id'),
+        sa.ForeignKeyConstraint(['organization_id'], ['organizations.id'], name='fk_organization_id'),
+        sa.PrimaryKeyConstraint('organization_id', 'activity_id')
+    )
+
+    op.create_table('phones',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('organization_id', sa.Integer(), nullable=True),
+        sa.Column('phone_number', sa.String(), nullable=True),
+        sa.ForeignKeyConstraint(['organization_id'], ['organizations.id'], ),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_phones_id', 'phones', ['id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_phones_id', table_name='phones')
+    op.drop_table('phones')
+    op.drop_table('organization_activity')
+    op.drop_table('building_organization')
+    op.drop_index('ix_organizations_name', table_name='organizations')
+    op.drop_index('ix_organizations_id', table_name='organizations')
+    op.drop_table('organizations')
+    op.drop_index('ix_buildings_id', table_name='buildings')
+    op.drop_index('ix_buildings_address', table_name='buildings')
+    op.drop_table('buildings')
+    op.drop_index('ix_activities_name', table_name='activities')
+    op.drop_index('ix_activities_id', table_name='activities')
+    op.drop_table('activities')
@@ -0,0 +1,73 @@
+"""buildings spatial index
+
+Revision ID: 7c2d9e4f1a03
+Revises: 41a0b3b6bf5a
+Create Date: 2026-10-18 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7c2d9e4f1a03'
+down_revision: Union[str, None] = '41a0b3b6bf5a'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Составной индекс по координатам - используется для поиска по прямоугольнику,
+    # если R*Tree недоступен (не SQLite)
+    op.create_index('ix_buildings_latitude_longitude', 'buildings', ['latitude', 'longitude'], unique=False)
+
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+
+    # R*Tree индекс по координатам зданий (точка = вырожденный прямоугольник)
+    op.execute("""
+        CREATE VIRTUAL TABLE buildings_rtree USING rtree(
+            id,
+            min_lat, max_lat,
+            min_lon, max_lon
+        )
+    """)
+    op.execute("""
+        INSERT INTO buildings_rtree (id, min_lat, max_lat, min_lon, max_lon)
+        SELECT id, latitude, latitude, longitude, longitude
+        FROM buildings
+    """)
+
+    # Триггеры синхронизации R*Tree с таблицей buildings
+    op.execute("""
+        CREATE TRIGGER buildings_rtree_insert AFTER INSERT ON buildings
+        BEGIN
+            INSERT INTO buildings_rtree (id, min_lat, max_lat, min_lon, max_lon)
+            VALUES (NEW.id, NEW.latitude, NEW.latitude, NEW.longitude, NEW.longitude);
+        END
+    """)
+    op.execute("""
+        CREATE TRIGGER buildings_rtree_update AFTER UPDATE OF id, latitude, longitude ON buildings
+        BEGIN
+            DELETE FROM buildings_rtree WHERE id = OLD.id;
+            INSERT INTO buildings_rtree (id, min_lat, max_lat, min_lon, max_lon)
+            VALUES (NEW.id, NEW.latitude, NEW.latitude, NEW.longitude, NEW.longitude);
+        END
+    """)
+    op.execute("""
+        CREATE TRIGGER buildings_rtree_delete AFTER DELETE ON buildings
+        BEGIN
+            DELETE FROM buildings_rtree WHERE id = OLD.id;
+        END
+    """)
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name == 'sqlite':
+        op.execute("DROP TRIGGER IF EXISTS buildings_rtree_delete")
+        op.execute("DROP TRIGGER IF EXISTS buildings_rtree_update")
+        op.execute("DROP TRIGGER IF EXISTS buildings_rtree_insert")
+        op.execute("DROP TABLE IF EXISTS buildings_rtree")
+    op.drop_index('ix_buildings_latitude_longitude', table_name='buildings')
@@ -0,0 +1,115 @@
+"""organization cards read model
+
+Revision ID: a9c4e7d2f318
+Revises: f2b8d61a4c95
+Create Date: 2026-10-18 15:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a9c4e7d2f318'
+down_revision: Union[str, None] = 'f2b8d61a4c95'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Карточки организаций по списку ID (ids - список или подзапрос): здание с наименьшим ID,
+# телефоны в порядке добавления, деятельности в порядке (level, parent_id, id) - в JSON
+CARD_ROWS = """
+    INSERT INTO organization_cards (id, name, building_id, address, latitude, longitude, phones, activities)
+    SELECT
+        o.id, o.name, b.id, b.address, b.latitude, b.longitude,
+        (
+            SELECT json_group_array(p.phone_number)
+            FROM (SELECT phone_number FROM phones WHERE organization_id = o.id ORDER BY id) p
+        ),
+        (
+            SELECT json_group_array(json_object('id', a.id, 'level', a.level, 'name', a.name, 'parent_id', a.parent_id))
+            FROM (
+                SELECT c.id, c.level, c.name, c.parent_id
+                FROM organization_activity oa
+                JOIN activities c ON c.id = oa.activity_id
+                WHERE oa.organization_id = o.id
+                ORDER BY c.level, c.parent_id, c.id
+            ) a
+        )
+    FROM organizations o
+    LEFT JOIN buildings b ON b.id = (SELECT MIN(building_id) FROM building_organization WHERE organization_id = o.id)
+    WHERE o.id IN ({ids});
+"""
+
+# Триггеры обновления карточек: имя -> (событие, ID затронутых организаций)
+TRIGGERS = {
+    'organization_cards_organizations_insert': ("AFTER INSERT ON organizations", "NEW.id"),
+    'organization_cards_organizations_update': ("AFTER UPDATE OF id, name ON organizations", "OLD.id, NEW.id"),
+    'organization_cards_organizations_delete': ("AFTER DELETE ON organizations", "OLD.id"),
+    'organization_cards_building_organization_insert': ("AFTER INSERT ON building_organization", "NEW.organization_id"),
+    'organization_cards_building_organization_update': ("AFTER UPDATE ON building_organization", "OLD.organization_id, NEW.organization_id"),
+    'organization_cards_building_organization_delete': ("AFTER DELETE ON building_organization", "OLD.organization_id"),
+    'organization_cards_buildings_update': (
+        "AFTER UPDATE OF id, address, latitude, longitude ON buildings",
+        "SELECT organization_id FROM building_organization WHERE building_id IN (OLD.id, NEW.id)"
+    ),
+    'organization_cards_buildings_delete': (
+        "AFTER DELETE ON buildings",
+        "SELECT organization_id FROM building_organization WHERE building_id = OLD.id"
+    ),
+    'organization_cards_phones_insert': ("AFTER INSERT ON phones", "NEW.organization_id"),
+    'organization_cards_phones_update': ("AFTER UPDATE ON phones", "OLD.organization_id, NEW.organization_id"),
+    'organization_cards_phones_delete': ("AFTER DELETE ON phones", "OLD.organization_id"),
+    'organization_cards_organization_activity_insert': ("AFTER INSERT ON organization_activity", "NEW.organization_id"),
+    'organization_cards_organization_activity_update': ("AFTER UPDATE ON organization_activity", "OLD.organization_id, NEW.organization_id"),
+    'organization_cards_organization_activity_delete': ("AFTER DELETE ON organization_activity", "OLD.organization_id"),
+    'organization_cards_activities_update': (
+        "AFTER UPDATE OF id, name, level, parent_id ON activities",
+        "SELECT organization_id FROM organization_activity WHERE activity_id IN (OLD.id, NEW.id)"
+    ),
+    'organization_cards_activities_delete': (
+        "AFTER DELETE ON activities",
+        "SELECT organization_id FROM organization_activity WHERE activity_id = OLD.id"
+    ),
+}
+
+
+def upgrade() -> None:
+    # Только SQLite (как FTS5 и R*Tree): без таблицы карточки собираются запросами по нормализованным таблицам
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+
+    # Карточка организации одной строкой (phones - JSON список строк, activities - JSON список деятельностей)
+    op.create_table('organization_cards',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(), nullable=False),
+        sa.Column('building_id', sa.Integer(), nullable=True),
+        sa.Column('address', sa.String(), nullable=True),
+        sa.Column('latitude', sa.Float(), nullable=True),
+        sa.Column('longitude', sa.Float(), nullable=True),
+        sa.Column('phones', sa.Text(), nullable=False, server_default='[]'),
+        sa.Column('activities', sa.Text(), nullable=False, server_default='[]'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.execute(CARD_ROWS.format(ids="SELECT id FROM organizations"))
+
+    # Триггеры пересобирают карточки затронутых организаций в транзакции изменения
+    for name, (event, ids) in TRIGGERS.items():
+        op.execute(f"""
+            CREATE TRIGGER {name} {event}
+            BEGIN
+                DELETE FROM organization_cards WHERE id IN ({ids});
+                {CARD_ROWS.format(ids=ids)}
+            END
+        """)
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+
+    for name in reversed(list(TRIGGERS)):
+        op.execute(f"DROP TRIGGER IF EXISTS {name}")
+    op.drop_table('organization_cards')
@@ -0,0 +1,53 @@
+"""activity closure table
+
+Revision ID: b5e81f2c9d47
+Revises: 7c2d9e4f1a03
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b5e81f2c9d47'
+down_revision: Union[str, None] = '7c2d9e4f1a03'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('activity_closure',
+        sa.Column('ancestor_id', sa.Integer(), nullable=False),
+        sa.Column('descendant_id', sa.Integer(), nullable=False),
+        sa.Column('depth', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['ancestor_id'], ['activities.id'], name='fk_ancestor_id'),
+        sa.ForeignKeyConstraint(['descendant_id'], ['activities.id'], name='fk_descendant_id'),
+        sa.PrimaryKeyConstraint('ancestor_id', 'descendant_id')
+    )
+    op.create_index('ix_activity_closure_descendant_id', 'activity_closure', ['descendant_id', 'ancestor_id'], unique=False)
+    op.create_index('ix_organization_activity_activity_id', 'organization_activity', ['activity_id', 'organization_id'], unique=False)
+
+    # Заполнение по существующему дереву: каждая деятельность - предок самой себя (depth = 0),
+    # далее рекурсивно спускаемся по parent_id
+    op.execute("""
+        INSERT INTO activity_closure (ancestor_id, descendant_id, depth)
+        WITH RECURSIVE tree (ancestor_id, descendant_id, depth) AS (
+            SELECT id, id, 0
+            FROM activities
+            UNION ALL
+            SELECT t.ancestor_id, a.id, t.depth + 1
+            FROM tree t
+            JOIN activities a ON a.parent_id = t.descendant_id
+        )
+        SELECT ancestor_id, descendant_id, depth
+        FROM tree
+    """)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_organization_activity_activity_id', table_name='organization_activity')
+    op.drop_index('ix_activity_closure_descendant_id', table_name='activity_closure')
+    op.drop_table('activity_closure')
@@ -0,0 +1,34 @@
+"""activity levels from closure table
+
+Revision ID: c8f3e1a6d572
+Revises: a9c4e7d2f318
+Create Date: 2026-10-18 16:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c8f3e1a6d572'
+down_revision: Union[str, None] = 'a9c4e7d2f318'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Деятельности, добавленные через /add_activity/ до пакетной записи, сохранялись без уровня:
+    # уровень - число предков вместе с самой деятельностью (наибольшая глубина в activity_closure + 1)
+    op.execute("""
+        UPDATE activities
+        SET level = (SELECT MAX(depth) + 1 FROM activity_closure WHERE descendant_id = activities.id)
+        WHERE level IS NULL
+          AND EXISTS (SELECT 1 FROM activity_closure WHERE descendant_id = activities.id)
+    """)
+
+
+def downgrade() -> None:
+    # Уровни верны и для прежней схемы - отменять нечего
+    pass
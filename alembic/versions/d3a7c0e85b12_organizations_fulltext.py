@@ -0,0 +1,82 @@
+"""organizations full-text search
+
+Revision ID: d3a7c0e85b12
+Revises: b5e81f2c9d47
+Create Date: 2026-10-18 11:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd3a7c0e85b12'
+down_revision: Union[str, None] = 'b5e81f2c9d47'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    dialect = op.get_bind().dialect.name
+
+    if dialect == 'postgresql':
+        # Триграммы для поиска по подстроке и tsvector для поиска по префиксам слов
+        op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        op.execute("CREATE INDEX ix_organizations_name_trgm ON organizations USING gin (lower(name) gin_trgm_ops)")
+        op.execute("CREATE INDEX ix_organizations_name_tsv ON organizations USING gin (to_tsvector('simple', name))")
+        return
+
+    if dialect != 'sqlite':
+        return
+
+    # FTS5 индекс с внешним содержимым (текст хранится только в organizations).
+    # unicode61 приводит к нижнему регистру в т.ч. кириллицу, remove_diacritics 2 - убирает диакритику (ё -> е)
+    op.execute("""
+        CREATE VIRTUAL TABLE organizations_fts USING fts5(
+            name,
+            content='organizations',
+            content_rowid='id',
+            tokenize="unicode61 remove_diacritics 2"
+        )
+    """)
+    op.execute("INSERT INTO organizations_fts (organizations_fts) VALUES ('rebuild')")
+
+    # Триггеры синхронизации FTS5 индекса с таблицей organizations
+    op.execute("""
+        CREATE TRIGGER organizations_fts_insert AFTER INSERT ON organizations
+        BEGIN
+            INSERT INTO organizations_fts (rowid, name) VALUES (NEW.id, NEW.name);
+        END
+    """)
+    op.execute("""
+        CREATE TRIGGER organizations_fts_delete AFTER DELETE ON organizations
+        BEGIN
+            INSERT INTO organizations_fts (organizations_fts, rowid, name) VALUES ('delete', OLD.id, OLD.name);
+        END
+    """)
+    op.execute("""
+        CREATE TRIGGER organizations_fts_update AFTER UPDATE OF id, name ON organizations
+        BEGIN
+            INSERT INTO organizations_fts (organizations_fts, rowid, name) VALUES ('delete', OLD.id, OLD.name);
+            INSERT INTO organizations_fts (rowid, name) VALUES (NEW.id, NEW.name);
+        END
+    """)
+
+
+def downgrade() -> None:
+    dialect = op.get_bind().dialect.name
+
+    if dialect == 'postgresql':
+        op.execute("DROP INDEX IF EXISTS ix_organizations_name_tsv")
+        op.execute("DROP INDEX IF EXISTS ix_organizations_name_trgm")
+        return
+
+    if dialect != 'sqlite':
+        return
+
+    op.execute("DROP TRIGGER IF EXISTS organizations_fts_update")
+    op.execute("DROP TRIGGER IF EXISTS organizations_fts_delete")
+    op.execute("DROP TRIGGER IF EXISTS organizations_fts_insert")
+    op.execute("DROP TABLE IF EXISTS organizations_fts")
@@ -0,0 +1,140 @@
+"""change log for incremental sync
+
+Revision ID: e1d4b7a9c360
+Revises: c8f3e1a6d572
+Create Date: 2026-10-18 17:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e1d4b7a9c360'
+down_revision: Union[str, None] = 'c8f3e1a6d572'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Таблицы журнала: таблица -> (сущность, колонка ID, колонка второго ключа у связей)
+ENTITIES = {
+    'organizations': ('organization', 'id', None),
+    'buildings': ('building', 'id', None),
+    'activities': ('activity', 'id', None),
+    'phones': ('phone', 'id', None),
+    'building_organization': ('building_organization', 'organization_id', 'building_id'),
+    'organization_activity': ('organization_activity', 'organization_id', 'activity_id'),
+}
+
+# PostgreSQL: одна функция для всех таблиц, сущность и колонки ключа - аргументы триггера.
+# Блокировка на время транзакции: пишущие в журнал транзакции идут по одной, поэтому seq растет в порядке commit
+# и читатель не пропускает изменение, зафиксированное позже изменения с большим seq
+CHANGE_LOG_FUNCTION = """
+    CREATE OR REPLACE FUNCTION change_log_row() RETURNS trigger LANGUAGE plpgsql AS $$
+    DECLARE
+        old_id integer;
+        old_ref integer;
+        new_id integer;
+        new_ref integer;
+    BEGIN
+        PERFORM pg_advisory_xact_lock(hashtext('change_log'));
+        IF TG_OP <> 'INSERT' THEN
+            old_id := (to_jsonb(OLD) ->> TG_ARGV[1])::integer;
+            old_ref := COALESCE((to_jsonb(OLD) ->> TG_ARGV[2])::integer, 0);
+        END IF;
+        IF TG_OP <> 'DELETE' THEN
+            new_id := (to_jsonb(NEW) ->> TG_ARGV[1])::integer;
+            new_ref := COALESCE((to_jsonb(NEW) ->> TG_ARGV[2])::integer, 0);
+        END IF;
+        IF TG_OP = 'DELETE' OR (TG_OP = 'UPDATE' AND (old_id, old_ref) IS DISTINCT FROM (new_id, new_ref)) THEN
+            INSERT INTO change_log (entity, entity_id, ref_id, op) VALUES (TG_ARGV[0], old_id, old_ref, 'delete');
+        END IF;
+        IF TG_OP <> 'DELETE' THEN
+            INSERT INTO change_log (entity, entity_id, ref_id, op) VALUES (TG_ARGV[0], new_id, new_ref, 'upsert');
+        END IF;
+        RETURN NULL;
+    END
+    $$
+"""
+
+
+def upgrade() -> None:
+    dialect = op.get_bind().dialect.name
+
+    # seq не переиспользуется после удаления строк (AUTOINCREMENT в SQLite, последовательность в PostgreSQL)
+    op.create_table('change_log',
+        sa.Column('seq', sa.Integer(), autoincrement=True, nullable=False),
+        sa.Column('entity', sa.String(), nullable=False),
+        sa.Column('entity_id', sa.Integer(), nullable=False),
+        sa.Column('ref_id', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('op', sa.String(), nullable=False),
+        sa.Column('changed_at', sa.DateTime(), nullable=False, server_default=sa.func.current_timestamp()),
+        sa.PrimaryKeyConstraint('seq'),
+        sqlite_autoincrement=True
+    )
+    op.create_index('ix_change_log_entity_key', 'change_log', ['entity', 'entity_id', 'ref_id', 'seq'], unique=False)
+    op.create_index('ix_change_log_changed_at', 'change_log', ['changed_at'], unique=False)
+    op.create_table('change_log_state',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('horizon', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.execute("INSERT INTO change_log_state (id, horizon) VALUES (1, 0)")
+
+    # Журнал ведется с этой ревизии: строки, существовавшие до нее, клиенты получают полной выгрузкой
+    if dialect == 'postgresql':
+        op.execute(CHANGE_LOG_FUNCTION)
+        for table, (entity, key, ref) in ENTITIES.items():
+            op.execute(f"""
+                CREATE TRIGGER change_log_{table} AFTER INSERT OR UPDATE OR DELETE ON {table}
+                FOR EACH ROW EXECUTE FUNCTION change_log_row('{entity}', '{key}', '{ref or ''}')
+            """)
+        return
+
+    if dialect != 'sqlite':
+        return
+
+    for table, (entity, key, ref) in ENTITIES.items():
+        old_ref, new_ref = (f"OLD.{ref}", f"NEW.{ref}") if ref else ("0", "0")
+        op.execute(f"""
+            CREATE TRIGGER change_log_{table}_insert AFTER INSERT ON {table}
+            BEGIN
+                INSERT INTO change_log (entity, entity_id, ref_id, op) VALUES ('{entity}', NEW.{key}, {new_ref}, 'upsert');
+            END
+        """)
+        # ключ строки изменился - для клиента это удаление старой строки и новая строка
+        op.execute(f"""
+            CREATE TRIGGER change_log_{table}_update AFTER UPDATE ON {table}
+            BEGIN
+                INSERT INTO change_log (entity, entity_id, ref_id, op)
+                SELECT '{entity}', OLD.{key}, {old_ref}, 'delete'
+                WHERE OLD.{key} IS NOT NEW.{key} OR {old_ref} IS NOT {new_ref};
+                INSERT INTO change_log (entity, entity_id, ref_id, op) VALUES ('{entity}', NEW.{key}, {new_ref}, 'upsert');
+            END
+        """)
+        op.execute(f"""
+            CREATE TRIGGER change_log_{table}_delete AFTER DELETE ON {table}
+            BEGIN
+                INSERT INTO change_log (entity, entity_id, ref_id, op) VALUES ('{entity}', OLD.{key}, {old_ref}, 'delete');
+            END
+        """)
+
+
+def downgrade() -> None:
+    dialect = op.get_bind().dialect.name
+
+    if dialect == 'postgresql':
+        for table in ENTITIES:
+            op.execute(f"DROP TRIGGER IF EXISTS change_log_{table} ON {table}")
+        op.execute("DROP FUNCTION IF EXISTS change_log_row()")
+    elif dialect == 'sqlite':
+        for table in ENTITIES:
+            for event in ('insert', 'update', 'delete'):
+                op.execute(f"DROP TRIGGER IF EXISTS change_log_{table}_{event}")
+
+    op.drop_table('change_log_state')
+    op.drop_index('ix_change_log_changed_at', table_name='change_log')
+    op.drop_index('ix_change_log_entity_key', table_name='change_log')
+    op.drop_table('change_log')
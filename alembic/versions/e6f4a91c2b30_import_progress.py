@@ -0,0 +1,45 @@
+"""import progress
+
+Revision ID: e6f4a91c2b30
+Revises: d3a7c0e85b12
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e6f4a91c2b30'
+down_revision: Union[str, None] = 'd3a7c0e85b12'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Ход загрузки файлов командой импорта (для продолжения после сбоя)
+    op.create_table('import_progress',
+        sa.Column('source', sa.String(), nullable=False),
+        sa.Column('fingerprint', sa.String(), nullable=False),
+        sa.Column('chunk_size', sa.Integer(), nullable=False),
+        sa.Column('chunks', sa.Integer(), nullable=False),
+        sa.Column('rows', sa.Integer(), nullable=False),
+        sa.Column('inserted', sa.Integer(), nullable=False),
+        sa.Column('rejected', sa.Integer(), nullable=False),
+        sa.Column('finished', sa.Boolean(), nullable=False),
+        sa.PrimaryKeyConstraint('source')
+    )
+    # Индексы и триггеры, отложенные на время загрузки
+    op.create_table('import_deferred',
+        sa.Column('name', sa.String(), nullable=False),
+        sa.Column('kind', sa.String(), nullable=False),
+        sa.Column('sql', sa.Text(), nullable=False),
+        sa.PrimaryKeyConstraint('name')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('import_deferred')
+    op.drop_table('import_progress')
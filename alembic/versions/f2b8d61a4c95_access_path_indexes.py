@@ -0,0 +1,35 @@
+"""access path indexes
+
+Revision ID: f2b8d61a4c95
+Revises: e6f4a91c2b30
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f2b8d61a4c95'
+down_revision: Union[str, None] = 'e6f4a91c2b30'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Телефоны организации в порядке добавления (WHERE organization_id ORDER BY id - без сортировки)
+    op.create_index('ix_phones_organization_id', 'phones', ['organization_id', 'id'], unique=False)
+    # Здания организации (первичный ключ (building_id, organization_id) не подходит для отбора по организации)
+    op.create_index('ix_building_organization_organization_id', 'building_organization', ['organization_id', 'building_id'], unique=False)
+    # Дочерние деятельности и дерево деятельностей в порядке (level, parent_id, id)
+    op.create_index('ix_activities_parent_id', 'activities', ['parent_id'], unique=False)
+    op.create_index('ix_activities_level_parent_id', 'activities', ['level', 'parent_id', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_activities_level_parent_id', table_name='activities')
+    op.drop_index('ix_activities_parent_id', table_name='activities')
+    op.drop_index('ix_building_organization_organization_id', table_name='building_organization')
+    op.drop_index('ix_phones_organization_id', table_name='phones')
@@ -0,0 +1,33 @@
+"""unique phone per organization
+
+Revision ID: f7a2c5d8e913
+Revises: e1d4b7a9c360
+Create Date: 2026-10-18 18:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f7a2c5d8e913'
+down_revision: Union[str, None] = 'e1d4b7a9c360'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Повторы (например, после повторной загрузки каталога) удаляются, остается телефон с наименьшим ID
+    op.execute("""
+        DELETE FROM phones
+        WHERE id NOT IN (SELECT MIN(id) FROM phones GROUP BY organization_id, phone_number)
+    """)
+    # Ключ строки при загрузке каталога: INSERT OR IGNORE / ON CONFLICT DO NOTHING пропускают уже загруженные телефоны.
+    # Уникальный индекс не откладывается на время загрузки (app.services.importer.defer_maintenance)
+    op.create_index('ux_phones_organization_id_phone_number', 'phones', ['organization_id', 'phone_number'], unique=True)
+
+
+def downgrade() -> None:
+    op.drop_index('ux_phones_organization_id_phone_number', table_name='phones')
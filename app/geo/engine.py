@@ -0,0 +1,98 @@
+import logging
+from typing import Sequence, Tuple
+import numpy as np
+from app.geo.spatial import EARTH_RADIUS_KM
+
+# Создание логгера
+logger = logging.getLogger(__name__)
+
+
+# Расстояние (в км.) от точки до массива точек по формуле гаверсинусов --------------------------------------------------------------------------
+def haversine_km(
+        latitude: float,
+        longitude: float,
+        latitudes: np.ndarray,
+        longitudes: np.ndarray
+) -> np.ndarray:
+    """
+        Векторное вычисление расстояний (км.) от точки (latitude, longitude) до всех точек массивов
+        latitudes/longitudes (в градусах) за один проход.
+    """
+    lat1 = np.radians(latitude)
+    lat2 = np.radians(latitudes)
+    d_lat = lat2 - lat1
+    d_lon = np.radians(longitudes) - np.radians(longitude)
+    a = np.sin(d_lat / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(d_lon / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+# Индекс координат зданий в непрерывных массивах float64 ------------------------------------------------------------------------------------
+class GeoIndex:
+    """
+        Координаты зданий в виде непрерывных массивов numpy.<br>
+        Фильтр по прямоугольнику, расстояния и сортировка по удаленности выполняются
+        векторно для всех точек сразу.
+    """
+
+    def __init__(self, ids: Sequence[int], latitudes: Sequence[float], longitudes: Sequence[float]):
+        self.ids = np.ascontiguousarray(ids, dtype=np.int64)
+        self.latitudes = np.ascontiguousarray(latitudes, dtype=np.float64)
+        self.longitudes = np.ascontiguousarray(longitudes, dtype=np.float64)
+        # предвычисленные значения для формулы гаверсинусов
+        self._lat_rad = np.radians(self.latitudes)
+        self._lon_rad = np.radians(self.longitudes)
+        self._cos_lat = np.cos(self._lat_rad)
+
+    # создание индекса по строкам (id, latitude, longitude) из БД
+    @classmethod
+    def from_rows(cls, rows) -> "GeoIndex":
+        rows = list(rows)
+        return cls(
+            ids=[row.id for row in rows],
+            latitudes=[row.latitude for row in rows],
+            longitudes=[row.longitude for row in rows],
+        )
+
+    def __len__(self):
+        return len(self.ids)
+
+    # маска точек внутри прямоугольника (предварительный отбор в query_radius)
+    def box_mask(self, min_lat: float, max_lat: float, min_lon: float, max_lon: float) -> np.ndarray:
+        return (
+            (self.latitudes >= min_lat) & (self.latitudes <= max_lat)
+            & (self.longitudes >= min_lon) & (self.longitudes <= max_lon)
+        )
+
+    # расстояния (км.) от точки до точек индекса (все или только по маске)
+    def distances(self, latitude: float, longitude: float, mask: np.ndarray = None) -> np.ndarray:
+        lat_rad, lon_rad, cos_lat = self._lat_rad, self._lon_rad, self._cos_lat
+        if mask is not None:
+            lat_rad, lon_rad, cos_lat = lat_rad[mask], lon_rad[mask], cos_lat[mask]
+        lat1 = np.radians(latitude)
+        d_lat = lat_rad - lat1
+        d_lon = lon_rad - np.radians(longitude)
+        a = np.sin(d_lat / 2) ** 2 + np.cos(lat1) * cos_lat * np.sin(d_lon / 2) ** 2
+        return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+    # ID зданий в радиусе radius км. и расстояния до них, отсортированные по удаленности
+    def query_radius(
+            self,
+            latitude: float,
+            longitude: float,
+            radius: float,
+            bbox: Tuple[float, float, float, float] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+            bbox - необязательный прямоугольник (min_lat, max_lat, min_lon, max_lon) для предварительного
+            отбора, чтобы не считать расстояния до заведомо далеких точек.
+        """
+        ids = self.ids
+        mask = None
+        if bbox is not None:
+            mask = self.box_mask(*bbox)
+            ids = ids[mask]
+        d = self.distances(latitude, longitude, mask)
+        inside = d <= radius
+        ids, d = ids[inside], d[inside]
+        order = np.argsort(d, kind="stable")
+        return ids[order], d[order]
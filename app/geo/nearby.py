@@ -0,0 +1,45 @@
+"""
+    Поиск зданий в радиусе по БД.
+
+    Координаты в памяти процесса здесь не хранятся: кандидаты каждый раз отбираются R*Tree индексом по описанному
+    прямоугольнику, и GeoIndex строится только по ним (обычно десятки-сотни точек), поэтому отдельный
+    индекс на процесс со своим сбросом после записи не нужен. Координаты всех зданий постоянно в памяти держит
+    снимок каталога (app.services.snapshot_file, перестраивается после каждой записи): при нем HTML обработчики
+    и /api/v1/organizations/filter ищут по снимку и эту функцию не вызывают.
+"""
+import logging
+from typing import Dict, Tuple
+from sqlalchemy.orm import Session
+from app.geo.spatial import bounding_box, get_buildings_in_box
+
+# Создание логгера
+logger = logging.getLogger(__name__)
+
+
+# Здания в радиусе radius км. от точки и расстояния до них ---------------------------------------------------------------------------------
+def get_buildings_nearby(
+        db: Session,
+        latitude: float,
+        longitude: float,
+        radius: float
+) -> Tuple[Dict[int, object], Dict[int, float]]:
+    """
+        Возвращает (buildings, distances):<br>
+        buildings - строки зданий (id, address, latitude, longitude) по ID,<br>
+        distances - расстояние в км. по ID здания, ключи упорядочены от ближайшего к дальнему.<br>
+        Кандидаты отбираются по пространственному индексу (описанный прямоугольник),
+        точное расстояние считается векторно в GeoIndex.
+    """
+    logger.info(f"get_buildings_nearby() -> ...")
+    # numpy импортируется при первом поиске по радиусу, а не при запуске приложения
+    from app.geo.engine import GeoIndex
+    min_lat, max_lat, min_lon, max_lon = bounding_box(latitude, longitude, radius)
+    candidates = get_buildings_in_box(db=db, min_lat=min_lat, max_lat=max_lat, min_lon=min_lon, max_lon=max_lon)
+    logger.debug(f"candidate buildings: {candidates}")
+
+    building_ids, building_distances = GeoIndex.from_rows(candidates).query_radius(latitude, longitude, radius)
+    distances = dict(zip(building_ids.tolist(), building_distances.tolist()))
+    buildings = {building.id: building for building in candidates if building.id in distances}
+    logger.debug(f"distances: {distances}")
+    logger.debug(f"End get_buildings_nearby() -> ...")
+    return buildings, distances
@@ -0,0 +1,93 @@
+import logging
+import math
+from typing import Tuple
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from app.database.database import has_table
+
+# Создание логгера
+logger = logging.getLogger(__name__)
+
+# Средний радиус Земли (км.)
+EARTH_RADIUS_KM = 6371.0
+
+
+# Прямоугольник (min_lat, max_lat, min_lon, max_lon), описанный вокруг окружности радиуса radius км. ----------------------------------------
+def bounding_box(latitude: float, longitude: float, radius: float) -> Tuple[float, float, float, float]:
+    """
+        Возвращает прямоугольник в градусах, гарантированно содержащий все точки
+        не дальше radius км. от точки (latitude, longitude).<br>
+        Если окружность захватывает полюс или пересекает 180-й меридиан, то берется весь диапазон долгот.
+    """
+    d_lat = math.degrees(radius / EARTH_RADIUS_KM)
+    min_lat = latitude - d_lat
+    max_lat = latitude + d_lat
+    if min_lat <= -90.0 or max_lat >= 90.0:
+        return max(min_lat, -90.0), min(max_lat, 90.0), -180.0, 180.0
+
+    # по долготе: угловой радиус делим на косинус широты (с запасом - берем широту, ближайшую к полюсу)
+    d_lon = math.degrees(radius / EARTH_RADIUS_KM / math.cos(math.radians(max(abs(min_lat), abs(max_lat)))))
+    min_lon = longitude - d_lon
+    max_lon = longitude + d_lon
+    if min_lon < -180.0 or max_lon > 180.0:
+        return min_lat, max_lat, -180.0, 180.0
+    return min_lat, max_lat, min_lon, max_lon
+
+
+# Прямоугольник (min_lat, max_lat, min_lon, max_lon) с центром в точке и заданными шириной/высотой в км. -------------------------------------
+def rectangle(latitude: float, longitude: float, width: float, height: float) -> Tuple[float, float, float, float]:
+    d_lat = math.degrees(height / 2 / EARTH_RADIUS_KM)
+    d_lon = math.degrees(width / 2 / EARTH_RADIUS_KM / max(math.cos(math.radians(latitude)), 1e-9))
+    return (
+        max(latitude - d_lat, -90.0),
+        min(latitude + d_lat, 90.0),
+        max(longitude - d_lon, -180.0),
+        min(longitude + d_lon, 180.0),
+    )
+
+
+# Проверка наличия R*Tree индекса buildings_rtree (создается миграцией 7c2d9e4f1a03 только для SQLite) -----------------------------------------
+def has_rtree(db: Session) -> bool:
+    return db.get_bind().dialect.name == "sqlite" and has_table(db, "buildings_rtree")
+
+
+# Возвращает здания, попавшие в прямоугольник -----------------------------------------------------------------------------------------------
+def get_buildings_in_box(
+        db: Session,
+        min_lat: float,
+        max_lat: float,
+        min_lon: float,
+        max_lon: float
+):
+    """
+        Возвращает здания (id, address, latitude, longitude) внутри прямоугольника.<br>
+        В SQLite отбор выполняется по R*Tree индексу buildings_rtree (координаты в нем хранятся
+        во float32 с округлением наружу, поэтому точная проверка по таблице buildings выполняется дополнительно).<br>
+        Для остальных БД используется индекс ix_buildings_latitude_longitude.
+    """
+    logger.info(f"get_buildings_in_box() -> ...")
+    logger.debug(f"Запрос на получение зданий в прямоугольнике: lat=[{min_lat}, {max_lat}], lon=[{min_lon}, {max_lon}] ...")
+    if has_rtree(db):
+        s = """
+            SELECT b.id, b.address, b.latitude, b.longitude
+            FROM buildings_rtree r
+            JOIN buildings b ON b.id = r.id
+            WHERE r.min_lat <= :max_lat AND r.max_lat >= :min_lat
+              AND r.min_lon <= :max_lon AND r.max_lon >= :min_lon
+              AND b.latitude BETWEEN :min_lat AND :max_lat
+              AND b.longitude BETWEEN :min_lon AND :max_lon
+        """
+    else:
+        s = """
+            SELECT b.id, b.address, b.latitude, b.longitude
+            FROM buildings b
+            WHERE b.latitude BETWEEN :min_lat AND :max_lat
+              AND b.longitude BETWEEN :min_lon AND :max_lon
+        """
+    query = text(s)
+    logger.debug(f"query: {query}")
+    result = db.execute(query, {"min_lat": min_lat, "max_lat": max_lat, "min_lon": min_lon, "max_lon": max_lon})
+    buildings = result.fetchall()
+    logger.debug(f"buildings: {buildings}")
+    logger.debug(f"End get_buildings_in_box() -> ...")
+    return buildings
@@ -2,4 +2,6 @@ from .organization import Organization
 from .building import Building
 from .activity import Activity
 from .organization_activity import OrganizationActivity
-from .building_organization import BuildingOrganization 
\ No newline at end of file
+from .building_organization import BuildingOrganization 
+from .activity_closure import ActivityClosure
+from .import_progress import ImportProgress, ImportDeferred
\ No newline at end of file
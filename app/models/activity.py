@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey
+from sqlalchemy import Column, Integer, String, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from ..database.database import Base
 
@@ -6,10 +6,16 @@ class Activity(Base):
     __tablename__ = "activities"
 
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
-    level = Column(Integer, index=True)
+    level = Column(Integer)
     name = Column(String, index=True)
     parent_id = Column(Integer, ForeignKey('activities.id'), nullable=True)
 
+    # Дочерние деятельности и деятельности в порядке дерева (level, parent_id, id)
+    __table_args__ = (
+        Index('ix_activities_parent_id', 'parent_id'),
+        Index('ix_activities_level_parent_id', 'level', 'parent_id', 'id'),
+    )
+
     parent = relationship('Activity', back_populates='children', remote_side=[id])
     children = relationship('Activity', back_populates='parent')
     organization_activities = relationship("OrganizationActivity", back_populates="activity")  # Связь с OrganizationActivity
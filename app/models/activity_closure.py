@@ -0,0 +1,17 @@
+from sqlalchemy import Column, Integer, ForeignKey, Index
+from ..database.database import Base
+
+class ActivityClosure(Base):
+    """Таблица замыкания дерева деятельностей: все пары (предок, потомок) с расстоянием между ними."""
+    __tablename__ = 'activity_closure'
+
+    ancestor_id = Column(Integer, ForeignKey('activities.id', name='fk_ancestor_id'), primary_key=True)
+    descendant_id = Column(Integer, ForeignKey('activities.id', name='fk_descendant_id'), primary_key=True)
+    depth = Column(Integer, nullable=False)  # 0 - сама деятельность, 1 - дочерняя, 2 - внучатая ...
+
+    __table_args__ = (
+        Index('ix_activity_closure_descendant_id', 'descendant_id', 'ancestor_id'),
+    )
+
+    def __repr__(self):
+        return f"<ActivityClosure(ancestor_id={self.ancestor_id}, descendant_id={self.descendant_id}, depth={self.depth})>"
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float
+from sqlalchemy import Column, Integer, String, Float, Index
 from sqlalchemy.orm import relationship
 from ..database.database import Base
 
@@ -10,6 +10,11 @@ class Building(Base):
     latitude = Column(Float, nullable=False)
     longitude = Column(Float, nullable=False)
 
+    # Индекс по координатам для поиска по прямоугольнику (в SQLite дополнительно есть R*Tree buildings_rtree)
+    __table_args__ = (
+        Index('ix_buildings_latitude_longitude', 'latitude', 'longitude'),
+    )
+
     # Связь с кросс-таблицей BuildingOrganization
     building_organizations = relationship("BuildingOrganization", back_populates="building")  # Связь с BuildingOrganization
 
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, ForeignKey
+from sqlalchemy import Column, Integer, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from ..database.database import Base
 
@@ -8,5 +8,10 @@ class BuildingOrganization(Base):
     building_id = Column(Integer, ForeignKey('buildings.id', name='fk_building_id'), primary_key=True)
     organization_id = Column(Integer, ForeignKey('organizations.id', name='fk_organization_id'), primary_key=True)
 
+    # Здания организации (первичный ключ начинается с building_id)
+    __table_args__ = (
+        Index('ix_building_organization_organization_id', 'organization_id', 'building_id'),
+    )
+
     building = relationship("Building", back_populates="building_organizations")
     organization = relationship("Organization", back_populates="building_organizations") 
\ No newline at end of file
@@ -0,0 +1,33 @@
+from sqlalchemy import Column, DateTime, Index, Integer, String, func
+from ..database.database import Base
+
+class ChangeLog(Base):
+    """Журнал изменений каталога (заполняется триггерами): ключ измененной строки и вид изменения, по порядку seq."""
+    __tablename__ = 'change_log'
+
+    seq = Column(Integer, primary_key=True, autoincrement=True)  # номер изменения (не переиспользуется после удаления)
+    entity = Column(String, nullable=False)  # organization / building / activity / phone / building_organization / organization_activity
+    entity_id = Column(Integer, nullable=False)  # ID строки (у связей - organization_id)
+    ref_id = Column(Integer, nullable=False, default=0)  # у связей - building_id / activity_id, иначе 0
+    op = Column(String, nullable=False)  # upsert / delete (reset - отметка сброса журнала)
+    changed_at = Column(DateTime, nullable=False, server_default=func.current_timestamp())
+
+    __table_args__ = (
+        Index('ix_change_log_entity_key', 'entity', 'entity_id', 'ref_id', 'seq'),
+        Index('ix_change_log_changed_at', 'changed_at'),
+        {'sqlite_autoincrement': True},
+    )
+
+    def __repr__(self):
+        return f"<ChangeLog(seq={self.seq}, entity={self.entity}, entity_id={self.entity_id}, ref_id={self.ref_id}, op={self.op})>"
+
+
+class ChangeLogState(Base):
+    """Граница журнала (одна строка): изменения с seq не больше horizon удалены, курсоры меньше horizon устарели."""
+    __tablename__ = 'change_log_state'
+
+    id = Column(Integer, primary_key=True)
+    horizon = Column(Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f"<ChangeLogState(horizon={self.horizon})>"
@@ -0,0 +1,30 @@
+from sqlalchemy import Boolean, Column, Integer, String, Text
+from ..database.database import Base
+
+class ImportProgress(Base):
+    """Ход загрузки файла (scripts/import_catalog.py): число пачек фиксируется в одной транзакции со строками пачки."""
+    __tablename__ = 'import_progress'
+
+    source = Column(String, primary_key=True)  # таблица:путь к файлу
+    fingerprint = Column(String, nullable=False)  # размер и время изменения файла
+    chunk_size = Column(Integer, nullable=False)
+    chunks = Column(Integer, nullable=False, default=0)  # загружено пачек
+    rows = Column(Integer, nullable=False, default=0)  # прочитано строк
+    inserted = Column(Integer, nullable=False, default=0)
+    rejected = Column(Integer, nullable=False, default=0)  # не прошли проверку
+    finished = Column(Boolean, nullable=False, default=False)
+
+    def __repr__(self):
+        return f"<ImportProgress(source={self.source}, chunks={self.chunks}, rows={self.rows}, finished={self.finished})>"
+
+
+class ImportDeferred(Base):
+    """Индексы и триггеры, удаленные на время загрузки (восстанавливаются по окончании, в т.ч. после сбоя)."""
+    __tablename__ = 'import_deferred'
+
+    name = Column(String, primary_key=True)
+    kind = Column(String, nullable=False)  # index / trigger
+    sql = Column(Text, nullable=False)
+
+    def __repr__(self):
+        return f"<ImportDeferred(name={self.name}, kind={self.kind})>"
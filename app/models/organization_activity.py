@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, ForeignKey
+from sqlalchemy import Column, Integer, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from ..database.database import Base
 
@@ -8,5 +8,10 @@ class OrganizationActivity(Base):
     organization_id = Column(Integer, ForeignKey('organizations.id', name='fk_organization_id'), primary_key=True)
     activity_id = Column(Integer, ForeignKey('activities.id', name='fk_activity_id'), primary_key=True)
 
+    # Поиск организаций по деятельности (первичный ключ начинается с organization_id)
+    __table_args__ = (
+        Index('ix_organization_activity_activity_id', 'activity_id', 'organization_id'),
+    )
+
     organization = relationship("Organization", back_populates="organization_activities")
     activity = relationship("Activity", back_populates="organization_activities") 
\ No newline at end of file
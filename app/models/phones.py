@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey
+from sqlalchemy import Column, Integer, String, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from ..database.database import Base
 
@@ -10,5 +10,11 @@ class Phones(Base):
     phone_number = Column(String, nullable=True)  # Хранение номеров телефонов в виде строки
     organization = relationship("Organization", back_populates="phones")
 
+    # Телефоны организации в порядке добавления; телефон организации не повторяется (ключ строки при загрузке каталога)
+    __table_args__ = (
+        Index('ix_phones_organization_id', 'organization_id', 'id'),
+        Index('ux_phones_organization_id_phone_number', 'organization_id', 'phone_number', unique=True),
+    )
+
     def __repr__(self):
         return f"<Phones(organization_id={self.organization_id}, phone_number={self.phone_number})>" 
@@ -0,0 +1,567 @@
+import functools
+import logging
+import time
+from typing import Callable, Dict, Optional, Tuple
+from fastapi import APIRouter, BackgroundTasks, Depends, Header, HTTPException, Query, Request
+from sqlalchemy import Select, select
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from app.database.database import get_async_db, get_db
+from app.geo.nearby import get_buildings_nearby
+from app.routes.caching import json_cache_entry
+from app.routes.router import catalog_changed, verify_api_key
+from app.schemas.schemas import ActivitySchema, BatchResultSchema, BatchWriteSchema, BuildingSchema, ChangePageSchema, OrganizationCardSchema, OrganizationFacetPageSchema, OrganizationPageSchema
+from app.services.cache import response_cache
+from app.services.batch import write_batch
+from app.services.cards import get_organization_cards
+from app.services.changes import DEFAULT_CHANGES_LIMIT, MAX_CHANGES_LIMIT, CursorExpired, changes_page, has_change_log
+from app.services.facets import db_facets, facet_deadline, snapshot_facets
+from app.services import repository
+from app.services.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, decode_cursor, encode_cursor, keyset_page
+from app.services.repository import fetch_all
+from app.services.search import name_filter
+from app.services.snapshot import catalog_snapshot
+
+# Создание логгера
+logger = logging.getLogger(__name__)
+
+# Максимальное число зданий в радиусе для /organizations/nearby (ограничение числа параметров IN (...))
+MAX_NEARBY_BUILDINGS = 10000
+
+
+# Проверка API ключа: параметр api_key или заголовок X-API-Key ------------------------------------------------------------------------------
+def api_key_auth(
+    api_key: Optional[str] = Query(None, description="API ключ"),
+    x_api_key: Optional[str] = Header(None, description="API ключ")
+):
+    verify_api_key(api_key or x_api_key)
+
+
+# Создание роутера JSON API версии 1
+router = APIRouter(prefix="/api/v1", tags=["API v1"], dependencies=[Depends(api_key_auth)])
+
+
+# Страница карточек организаций по подзапросу ID ----------------------------------------------------------------------------------------------
+def organizations_page(
+        db: Session,
+        subquery: Select,
+        params: Dict,
+        limit: int,
+        cursor: Optional[str],
+        decorate: Optional[Callable[[OrganizationCardSchema], None]] = None
+) -> OrganizationPageSchema:
+    try:
+        rows, next_cursor = keyset_page(db=db, subquery=subquery, params=params, limit=limit, cursor=cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    cards = get_organization_cards(db=db, organization_ids=[row.id for row in rows])
+    if decorate is not None:
+        for card in cards:
+            decorate(card)
+    return OrganizationPageSchema(items=cards, next_cursor=next_cursor)
+
+
+# Страница организаций в радиусе от точки (с ближайшим найденным зданием и расстоянием) ---------------------------------------------------------
+def nearby_page(
+        db: Session,
+        latitude: float,
+        longitude: float,
+        radius: float,
+        limit: int,
+        cursor: Optional[str]
+) -> OrganizationPageSchema:
+    buildings, distances = get_buildings_nearby(db=db, latitude=latitude, longitude=longitude, radius=radius)
+    if not distances:
+        return OrganizationPageSchema()
+    if len(distances) > MAX_NEARBY_BUILDINGS:
+        raise HTTPException(status_code=400, detail=f"Слишком большой радиус: найдено более {MAX_NEARBY_BUILDINGS} зданий")
+
+    page = organizations_page(
+        db=db,
+        subquery=repository.SUBQUERY_ORGANIZATIONS_BY_BUILDINGS,
+        params={"building_ids": list(distances)},
+        limit=limit,
+        cursor=cursor
+    )
+    decorate_nearest(db=db, page=page, buildings=buildings, distances=distances)
+    return page
+
+
+# Ближайшее найденное здание каждой организации страницы и расстояние до него (результат get_buildings_nearby) ----------------------------------
+def decorate_nearest(db: Session, page: OrganizationPageSchema, buildings: Dict[int, object], distances: Dict[int, float]):
+    nearest = {}
+    if page.items:
+        for rec in fetch_all(db, repository.SELECT_BUILDINGS_OF_ORGANIZATIONS, {"organization_ids": [card.id for card in page.items]}):
+            if rec.building_id in distances:
+                current = nearest.get(rec.organization_id)
+                if current is None or distances[rec.building_id] < distances[current]:
+                    nearest[rec.organization_id] = rec.building_id
+    for card in page.items:
+        building = buildings[nearest[card.id]]
+        card.building = BuildingSchema(id=building.id, address=building.address, latitude=building.latitude, longitude=building.longitude)
+        card.distance = distances[building.id]
+
+
+# Страница поиска организаций по названию --------------------------------------------------------------------------------------------------
+def search_page(
+        db: Session,
+        name: str,
+        limit: int,
+        cursor: Optional[str]
+) -> OrganizationPageSchema:
+    condition = name_filter(db=db, name=name)
+    if condition is None:
+        return OrganizationPageSchema()
+    subquery, params = condition
+    return organizations_page(db=db, subquery=subquery, params=params, limit=limit, cursor=cursor)
+
+
+# Подзапрос ID организаций по нескольким фильтрам сразу (собирается один раз на сочетание фильтров) --------------------------------------------
+@functools.lru_cache(maxsize=32)
+def filter_subquery(activity: bool, nearby: bool, name_subquery: Optional[Select]) -> Select:
+    """
+        activity - деятельность с вложенными (:activity_id), nearby - здания (:building_ids),
+        name_subquery - подзапрос name_filter (app.services.repository.SUBQUERY_ORGANIZATIONS_BY_NAME_*).
+    """
+    organizations = repository.organizations
+    query = select(organizations.c.id)
+    if activity:
+        query = query.where(organizations.c.id.in_(repository.SUBQUERY_ORGANIZATIONS_BY_ACTIVITY_TREE))
+    if nearby:
+        query = query.where(organizations.c.id.in_(repository.SUBQUERY_ORGANIZATIONS_BY_BUILDINGS))
+    if name_subquery is not None:
+        query = query.where(organizations.c.id.in_(name_subquery))
+    return query
+
+
+# Условия комбинированного поиска для запроса к БД: (подзапрос, параметры, здания в радиусе, расстояния) -----------------------------------------
+def filter_conditions(
+        db: Session,
+        activity_id: Optional[int],
+        point: Optional[Tuple[float, float, float]],
+        name: Optional[str]
+) -> Optional[Tuple[Select, Dict, Optional[Dict], Optional[Dict]]]:
+    """
+        Здания и расстояния - результат get_buildings_nearby (при поиске по радиусу), None - заведомо ничего не найдено
+        (в радиусе нет зданий, в названии нет слов).
+    """
+    params = {}
+    buildings = distances = None
+    if activity_id is not None:
+        params["activity_id"] = activity_id
+    if point is not None:
+        buildings, distances = get_buildings_nearby(db=db, latitude=point[0], longitude=point[1], radius=point[2])
+        if not distances:
+            return None
+        if len(distances) > MAX_NEARBY_BUILDINGS:
+            raise HTTPException(status_code=400, detail=f"Слишком большой радиус: найдено более {MAX_NEARBY_BUILDINGS} зданий")
+        params["building_ids"] = list(distances)
+    name_subquery = None
+    if name is not None:
+        condition = name_filter(db=db, name=name)
+        if condition is None:
+            return None
+        name_subquery, name_params = condition
+        params.update(name_params)
+    return filter_subquery(activity_id is not None, point is not None, name_subquery), params, buildings, distances
+
+
+# Порядковый номер снимка, с которого начинается страница после курсора ---------------------------------------------------------------------
+def snapshot_position(db: Session, snapshot, cursor: str) -> int:
+    """
+        Организации курсора нет в снимке (удалена или переименована) - страница начинается с первой организации снимка
+        из следующих за курсором в порядке БД (сравнение строк - по правилам БД, как в выдаче без снимка).
+    """
+    name, id = decode_cursor(cursor)
+    position = snapshot.ordinal_after(name, id)
+    if position is None:
+        rows = fetch_all(db, repository.SELECT_ORGANIZATION_IDS_AFTER, {"after_name": name, "after_id": id, "page_limit": MAX_PAGE_SIZE})
+        found = snapshot.ordinals_of(row.id for row in rows)
+        position = int(found[0]) if len(found) else len(snapshot)
+    return position
+
+
+# Страница выдачи из снимка каталога (порядковые номера организаций по возрастанию, здания и расстояния - при поиске по радиусу) -----------------
+def snapshot_page(db: Session, snapshot, ordinals, buildings, distances, limit: int, cursor: Optional[str]) -> OrganizationPageSchema:
+    try:
+        position = snapshot_position(db, snapshot, cursor) if cursor else 0
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    start = int(ordinals.searchsorted(position))
+    end = start + min(limit, MAX_PAGE_SIZE)
+    next_cursor = None
+    if end < len(ordinals):
+        last = int(ordinals[end - 1])
+        next_cursor = encode_cursor(snapshot.text(snapshot.organization_name_offsets, snapshot.organization_names, last), int(snapshot.organization_ids[last]))
+    cards = snapshot.iter_cards(
+        ordinals[start:end],
+        buildings=buildings[start:end] if buildings is not None else None,
+        distances=distances[start:end] if distances is not None else None
+    )
+    return OrganizationPageSchema(items=list(cards), next_cursor=next_cursor)
+
+
+# Страница комбинированного поиска: деятельность (с вложенными) И радиус И название -------------------------------------------------------------
+def filter_page(
+        db: Session,
+        activity_id: Optional[int],
+        point: Optional[Tuple[float, float, float]],
+        name: Optional[str],
+        limit: int,
+        cursor: Optional[str],
+        version: Optional[int] = None
+) -> OrganizationPageSchema:
+    """
+        Со снимком каталога (SNAPSHOT_PATH) фильтры пересекаются как битовые множества порядковых номеров
+        (app.services.planner), карточки строятся только для страницы.<br>
+        Без снимка или только по названию - один запрос к БД со всеми условиями (постранично по (name, id):
+        страница по полнотекстовому индексу дешевле всех совпадений названия).<br>
+        point - (latitude, longitude, radius км.): у карточек ближайшее найденное здание и расстояние до него.<br>
+        version - версия каталога ответа: снимок другой версии не используется.
+    """
+    snapshot = catalog_snapshot.get(version) if activity_id is not None or point is not None else None
+    if snapshot is not None:
+        from app.services.planner import plan_search
+        ordinals, buildings, distances = plan_search(db=db, snapshot=snapshot, activity_id=activity_id, point=point, name=name)
+        return snapshot_page(db, snapshot, ordinals, buildings, distances, limit=limit, cursor=cursor)
+
+    conditions = filter_conditions(db=db, activity_id=activity_id, point=point, name=name)
+    if conditions is None:
+        return OrganizationPageSchema()
+    subquery, params, buildings, distances = conditions
+    page = organizations_page(db=db, subquery=subquery, params=params, limit=limit, cursor=cursor)
+    if point is not None:
+        decorate_nearest(db=db, page=page, buildings=buildings, distances=distances)
+    return page
+
+
+# Страница комбинированного поиска и счетчики всей выдачи по деятельностям и зданиям -----------------------------------------------------------
+def facets_page(
+        db: Session,
+        activity_id: Optional[int],
+        point: Optional[Tuple[float, float, float]],
+        name: Optional[str],
+        limit: int,
+        cursor: Optional[str],
+        version: Optional[int] = None
+) -> OrganizationFacetPageSchema:
+    """
+        Счетчикам нужна вся выдача, поэтому со снимком каталога она строится планировщиком и при поиске только по названию.<br>
+        Поиск и счетчики укладываются в FACET_BUDGET_MS (app.services.facets): со снимком не успевшие счетчики
+        считаются по части выдачи, без снимка запрос счетчиков прерывается по сроку и они не возвращаются
+        (в обоих случаях facets.complete=False), страница возвращается всегда целиком.<br>
+        version - версия каталога ответа: снимок другой версии не используется.
+    """
+    deadline = facet_deadline(time.perf_counter())
+    snapshot = catalog_snapshot.get(version)
+    if snapshot is not None:
+        from app.services.planner import plan_search
+        ordinals, buildings, distances = plan_search(db=db, snapshot=snapshot, activity_id=activity_id, point=point, name=name)
+        page = snapshot_page(db, snapshot, ordinals, buildings, distances, limit=limit, cursor=cursor)
+        facets = snapshot_facets(snapshot, ordinals, point=point, deadline=deadline)
+        return OrganizationFacetPageSchema(items=page.items, next_cursor=page.next_cursor, facets=facets)
+
+    conditions = filter_conditions(db=db, activity_id=activity_id, point=point, name=name)
+    if conditions is None:
+        return OrganizationFacetPageSchema()
+    subquery, params, buildings, distances = conditions
+    page = organizations_page(db=db, subquery=subquery, params=params, limit=limit, cursor=cursor)
+    if point is not None:
+        decorate_nearest(db=db, page=page, buildings=buildings, distances=distances)
+    facets = db_facets(db=db, subquery=subquery, params=params, building_ids=params.get("building_ids"), deadline=deadline)
+    return OrganizationFacetPageSchema(items=page.items, next_cursor=page.next_cursor, facets=facets)
+
+
+# Параметры постраничной выдачи
+def page_limit(limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE, description="размер страницы")) -> int:
+    return limit
+
+
+def page_cursor(cursor: Optional[str] = Query(None, description="курсор страницы (next_cursor предыдущей страницы)")) -> Optional[str]:
+    return cursor
+
+
+# Фильтры комбинированного поиска: {"activity_id", "point" - (latitude, longitude, radius) или None, "name"}
+def search_filters(
+    activity_id: Optional[int] = Query(None, description="ID деятельности (с вложенными)"),
+    latitude: Optional[float] = Query(None, ge=-90, le=90),
+    longitude: Optional[float] = Query(None, ge=-180, le=180),
+    radius: Optional[float] = Query(None, gt=0, description="радиус в км."),
+    name: Optional[str] = Query(None, min_length=1, description="слова названия (можно по началу слов)")
+) -> Dict:
+    geo = (latitude, longitude, radius)
+    if any(value is not None for value in geo) and not all(value is not None for value in geo):
+        raise HTTPException(status_code=400, detail="Параметры latitude, longitude и radius задаются вместе")
+    point = geo if radius is not None else None
+    if activity_id is None and point is None and name is None:
+        raise HTTPException(status_code=400, detail="Не задан ни один фильтр: activity_id, latitude/longitude/radius, name")
+    return {"activity_id": activity_id, "point": point, "name": name}
+
+
+# Организации в здании ---------------------------------------------------------------------------------------------------------------------
+@router.get("/organizations/by_building/{building_id}", response_model=OrganizationPageSchema)
+async def api_organizations_by_building(
+    request: Request,
+    building_id: int,
+    limit: int = Depends(page_limit),
+    cursor: Optional[str] = Depends(page_cursor),
+    db: AsyncSession = Depends(get_async_db)
+) -> OrganizationPageSchema:
+    """
+        Список организаций в здании (по названию).<br>
+        building_id - ID здания<br>
+    """
+    logger.info(f"api_organizations_by_building() -> ...")
+    # Ответ из кэша (тело или 304 по ETag для текущей версии каталога)
+    cache_entry = await json_cache_entry(request, {"building_id": building_id, "limit": limit, "cursor": cursor})
+    if cache_entry.response is not None:
+        return cache_entry.response
+    page = await db.run_sync(
+        organizations_page,
+        subquery=repository.SUBQUERY_ORGANIZATIONS_BY_BUILDING,
+        params={"building_id": building_id},
+        limit=limit,
+        cursor=cursor
+    )
+    return await cache_entry.store_json(page)
+
+
+# Организации с видом деятельности --------------------------------------------------------------------------------------------------------
+@router.get("/organizations/by_activity/{activity_id}", response_model=OrganizationPageSchema)
+async def api_organizations_by_activity(
+    request: Request,
+    activity_id: int,
+    limit: int = Depends(page_limit),
+    cursor: Optional[str] = Depends(page_cursor),
+    db: AsyncSession = Depends(get_async_db)
+) -> OrganizationPageSchema:
+    """
+        Список организаций с указанным видом деятельности (без вложенных).<br>
+        activity_id - ID деятельности<br>
+    """
+    logger.info(f"api_organizations_by_activity() -> ...")
+    # Ответ из кэша (тело или 304 по ETag для текущей версии каталога)
+    cache_entry = await json_cache_entry(request, {"activity_id": activity_id, "limit": limit, "cursor": cursor})
+    if cache_entry.response is not None:
+        return cache_entry.response
+    page = await db.run_sync(
+        organizations_page,
+        subquery=repository.SUBQUERY_ORGANIZATIONS_BY_ACTIVITY,
+        params={"activity_id": activity_id},
+        limit=limit,
+        cursor=cursor
+    )
+    return await cache_entry.store_json(page)
+
+
+# Организации с видом деятельности и всеми вложенными -------------------------------------------------------------------------------------
+@router.get("/organizations/by_activity_tree/{activity_id}", response_model=OrganizationPageSchema)
+async def api_organizations_by_activity_tree(
+    request: Request,
+    activity_id: int,
+    limit: int = Depends(page_limit),
+    cursor: Optional[str] = Depends(page_cursor),
+    db: AsyncSession = Depends(get_async_db)
+) -> OrganizationPageSchema:
+    """
+        Список организаций с указанным видом деятельности и всеми вложенными в него (например, Еда -> Мясная продукция).<br>
+        activity_id - ID деятельности<br>
+    """
+    logger.info(f"api_organizations_by_activity_tree() -> ...")
+    # Ответ из кэша (тело или 304 по ETag для текущей версии каталога)
+    cache_entry = await json_cache_entry(request, {"activity_id": activity_id, "limit": limit, "cursor": cursor})
+    if cache_entry.response is not None:
+        return cache_entry.response
+    page = await db.run_sync(
+        organizations_page,
+        subquery=repository.SUBQUERY_ORGANIZATIONS_BY_ACTIVITY_TREE,
+        params={"activity_id": activity_id},
+        limit=limit,
+        cursor=cursor
+    )
+    return await cache_entry.store_json(page)
+
+
+# Организации в радиусе от точки --------------------------------------------------------------------------------------------------------
+@router.get("/organizations/nearby", response_model=OrganizationPageSchema)
+async def api_organizations_nearby(
+    request: Request,
+    latitude: float = Query(..., ge=-90, le=90),
+    longitude: float = Query(..., ge=-180, le=180),
+    radius: float = Query(..., gt=0, description="радиус в км."),
+    limit: int = Depends(page_limit),
+    cursor: Optional[str] = Depends(page_cursor),
+    db: AsyncSession = Depends(get_async_db)
+) -> OrganizationPageSchema:
+    """
+        Список организаций в радиусе radius км. от точки (latitude, longitude) с расстоянием до каждой.<br>
+    """
+    logger.info(f"api_organizations_nearby() -> ...")
+    # Ответ из кэша (тело или 304 по ETag для текущей версии каталога)
+    cache_entry = await json_cache_entry(request, {"latitude": latitude, "longitude": longitude, "radius": radius, "limit": limit, "cursor": cursor})
+    if cache_entry.response is not None:
+        return cache_entry.response
+    page = await db.run_sync(nearby_page, latitude=latitude, longitude=longitude, radius=radius, limit=limit, cursor=cursor)
+    return await cache_entry.store_json(page)
+
+
+# Поиск организаций по названию -----------------------------------------------------------------------------------------------------------
+@router.get("/organizations/search", response_model=OrganizationPageSchema)
+async def api_search_organizations(
+    request: Request,
+    name: str = Query(..., min_length=1, description="слова названия (можно по началу слов)"),
+    limit: int = Depends(page_limit),
+    cursor: Optional[str] = Depends(page_cursor),
+    db: AsyncSession = Depends(get_async_db)
+) -> OrganizationPageSchema:
+    """
+        Поиск организаций по названию (по алфавиту).<br>
+    """
+    logger.info(f"api_search_organizations() -> ...")
+    # Ответ из кэша (тело или 304 по ETag для текущей версии каталога)
+    cache_entry = await json_cache_entry(request, {"name": name, "limit": limit, "cursor": cursor})
+    if cache_entry.response is not None:
+        return cache_entry.response
+    page = await db.run_sync(search_page, name=name, limit=limit, cursor=cursor)
+    return await cache_entry.store_json(page)
+
+
+# Комбинированный поиск организаций ---------------------------------------------------------------------------------------------------
+@router.get("/organizations/filter", response_model=OrganizationPageSchema)
+async def api_filter_organizations(
+    request: Request,
+    filters: Dict = Depends(search_filters),
+    limit: int = Depends(page_limit),
+    cursor: Optional[str] = Depends(page_cursor),
+    db: AsyncSession = Depends(get_async_db)
+) -> OrganizationPageSchema:
+    """
+        Организации, подходящие под все заданные фильтры (по названию), например
+        "продукты в радиусе 2 км. со словом Молоко в названии" - одним запросом.<br>
+        activity_id - деятельность и все вложенные,<br>
+        latitude, longitude, radius - в радиусе radius км. от точки (задаются вместе; с расстоянием до ближайшего здания),<br>
+        name - слова названия.
+    """
+    logger.info(f"api_filter_organizations() -> ...")
+    # Ответ из кэша (тело или 304 по ETag для текущей версии каталога)
+    cache_entry = await json_cache_entry(request, dict(filters, limit=limit, cursor=cursor))
+    if cache_entry.response is not None:
+        return cache_entry.response
+    page = await db.run_sync(filter_page, limit=limit, cursor=cursor, version=cache_entry.version, **filters)
+    return await cache_entry.store_json(page)
+
+
+# Комбинированный поиск организаций со счетчиками по деятельностям и зданиям ---------------------------------------------------------------
+@router.get("/organizations/filter/facets", response_model=OrganizationFacetPageSchema)
+async def api_filter_organizations_facets(
+    request: Request,
+    filters: Dict = Depends(search_filters),
+    limit: int = Depends(page_limit),
+    cursor: Optional[str] = Depends(page_cursor),
+    db: AsyncSession = Depends(get_async_db)
+) -> OrganizationFacetPageSchema:
+    """
+        Та же страница, что и /organizations/filter, и счетчики организаций всей выдачи (для фильтров интерфейса):<br>
+        facets.activities - по узлам дерева деятельностей (организация учитывается в узле, если у нее есть
+        эта деятельность или вложенная в нее),<br>
+        facets.buildings - по зданиям (при поиске по радиусу - только здания в радиусе), не более 50 с наибольшим числом,<br>
+        facets.total - организаций в выдаче, facets.complete=False - счетчики только по части выдачи (исчерпано время FACET_BUDGET_MS).
+    """
+    logger.info(f"api_filter_organizations_facets() -> ...")
+    # Ответ из кэша (тело или 304 по ETag для текущей версии каталога)
+    cache_entry = await json_cache_entry(request, dict(filters, limit=limit, cursor=cursor))
+    if cache_entry.response is not None:
+        return cache_entry.response
+    page = await db.run_sync(facets_page, limit=limit, cursor=cursor, version=cache_entry.version, **filters)
+    if not page.facets.complete:
+        # неполные счетчики не кэшируются: следующий запрос может успеть посчитать все
+        return page
+    return await cache_entry.store_json(page)
+
+
+# Организация по ID ----------------------------------------------------------------------------------------------------------------------
+@router.get("/organizations/{organization_id}", response_model=OrganizationCardSchema)
+async def api_organization_by_id(
+    request: Request,
+    organization_id: int,
+    db: AsyncSession = Depends(get_async_db)
+) -> OrganizationCardSchema:
+    """
+        Карточка организации: здание, телефоны, виды деятельности.<br>
+    """
+    logger.info(f"api_organization_by_id() -> ...")
+    # Ответ из кэша (тело или 304 по ETag для текущей версии каталога)
+    cache_entry = await json_cache_entry(request, {"organization_id": organization_id})
+    if cache_entry.response is not None:
+        return cache_entry.response
+    cards = await db.run_sync(get_organization_cards, organization_ids=[organization_id])
+    if len(cards) == 0:
+        raise HTTPException(status_code=404, detail="Организация не найдена")
+    return await cache_entry.store_json(cards[0])
+
+
+# Журнал изменений каталога для синхронизации клиентов ----------------------------------------------------------------------------------------
+@router.get("/changes", response_model=ChangePageSchema, response_model_exclude_none=True)
+async def api_changes(
+    since: Optional[str] = Query(None, description="курсор (next_cursor предыдущего ответа); без него - только курсор конца журнала"),
+    limit: int = Query(DEFAULT_CHANGES_LIMIT, ge=1, le=MAX_CHANGES_LIMIT, description="записей журнала на странице"),
+    db: AsyncSession = Depends(get_async_db)
+) -> ChangePageSchema:
+    """
+        Изменения организаций, зданий, деятельностей, телефонов и связей после курсора, по порядку:<br>
+        upsert - строка создана или изменена (data - ее текущие значения, у связей ключ - id и ref_id),
+        delete - строка удалена. По одному событию на строку на странице.<br>
+        Синхронизация: курсор без since, полная выгрузка, затем запросы с since=next_cursor (пока has_more - сразу).<br>
+        410 - курсор устарел (сжатие журнала или загрузка каталога): нужна полная выгрузка с новым курсором.
+        Ответ не кэшируется: журнал пополняется и изменениями в обход API (триггеры).
+    """
+    logger.info(f"api_changes() -> since={since}, limit={limit}")
+    if not await db.run_sync(has_change_log):
+        raise HTTPException(status_code=404, detail="Журнал изменений не ведется (alembic upgrade head)")
+    try:
+        return await db.run_sync(changes_page, since=since, limit=limit)
+    except CursorExpired as e:
+        raise HTTPException(status_code=410, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+# Пакетная запись деятельностей и организаций ----------------------------------------------------------------------------------------------
+@router.post("/batch", response_model=BatchResultSchema)
+def api_write_batch(
+    batch: BatchWriteSchema,
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db)
+) -> BatchResultSchema:
+    """
+        Создание и изменение деятельностей и организаций (телефоны, здания, деятельности) одной транзакцией.<br>
+        Элемент с id=None или с несуществующим id создается, с существующим - изменяются переданные поля
+        (phones, building_ids, activity_ids - полные списки). Деятельности записываются первыми:
+        родителем может быть деятельность того же пакета, уровни вычисляются по родителям.<br>
+        Ошибка в любом элементе (400) - не записывается ничего. Кэши и снимок каталога сбрасываются один раз на пакет.
+    """
+    logger.info(f"api_write_batch() -> activities={len(batch.activities)}, organizations={len(batch.organizations)}")
+    try:
+        activity_ids, organization_ids = write_batch(db=db, batch=batch)
+    except ValueError as e:
+        db.rollback()
+        raise HTTPException(status_code=400, detail=str(e))
+    activities = {
+        row.id: ActivitySchema.model_validate(row, from_attributes=True)
+        for row in fetch_all(db, repository.SELECT_ACTIVITIES_BY_IDS, {"activity_ids": activity_ids})
+    } if activity_ids else {}
+    db.commit()
+
+    version = catalog_changed(background_tasks=background_tasks, activities_changed=bool(activity_ids))
+    return BatchResultSchema(activities=[activities[id] for id in activity_ids], organizations=organization_ids, version=version)
+
+
+# Счетчики кэша ответов ------------------------------------------------------------------------------------------------------------------
+@router.get("/cache/stats")
+async def api_cache_stats() -> Dict:
+    """
+        Версия каталога, попадания / промахи / вытеснения кэша ответов и его размер.<br>
+    """
+    logger.info(f"api_cache_stats() -> ...")
+    return await run_in_threadpool(response_cache.stats)
@@ -0,0 +1,81 @@
+import logging
+from typing import AsyncIterator, Dict, Optional
+from fastapi import Request, Response
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from starlette.concurrency import run_in_threadpool
+from app.services.cache import ResponseCache, etag_matches, response_cache
+
+# Создание логгера
+logger = logging.getLogger(__name__)
+
+# Ответ с ETag перепроверяется клиентом при каждом обращении (If-None-Match)
+CACHE_CONTROL = "no-cache"
+
+
+# Запись кэша для запроса: готовый ответ (из кэша или 304) либо сохранение построенного ответа ---------------------------------------------
+class CacheEntry:
+    """
+        Ключ - путь запроса + параметры (без api_key) + версия каталога.<br>
+        version - версия каталога, прочитанная до данных: ответ строится по ней или более новой (снимок каталога -
+        только этой версии). None - кэш выключен или версия неизвестна, ответ не кэшируется.<br>
+        304 возвращается только для GET/HEAD: для POST If-None-Match не применяется, отдается тело из кэша.
+    """
+
+    def __init__(self, request: Request, params: Dict, media_type: Optional[str]):
+        self.response: Optional[Response] = None
+        self.version = response_cache.version()
+        if self.version is None:
+            return
+        self.key = ResponseCache.key(request.url.path, params, self.version)
+        self.headers = {"ETag": ResponseCache.etag(self.key), "Cache-Control": CACHE_CONTROL}
+        if request.method in ("GET", "HEAD") and etag_matches(request.headers.get("if-none-match"), self.headers["ETag"]):
+            response_cache.not_modified()
+            self.response = Response(status_code=304, headers=self.headers)
+            return
+        body = response_cache.get(self.key)
+        if body is not None:
+            logger.debug(f"CacheEntry: HIT {request.url.path}")
+            self.response = Response(body, media_type=media_type, headers={**self.headers, "X-Cache": "HIT"})
+
+    # сохранение построенного ответа (потоковый - по окончании выдачи)
+    def store(self, response: Response) -> Response:
+        if self.version is None:
+            return response
+        response.headers.update({**self.headers, "X-Cache": "MISS"})
+        if isinstance(response, StreamingResponse):
+            response.body_iterator = tee(response.body_iterator, self.key)
+        else:
+            response_cache.set(self.key, response.body)
+        return response
+
+    # сохранение модели ответа (JSON) - для асинхронных обработчиков
+    async def store_json(self, model: BaseModel) -> Response:
+        response = Response(model.model_dump_json(), media_type="application/json")
+        return await run_in_threadpool(self.store, response)
+
+
+# Тело потокового ответа с сохранением в кэш по окончании выдачи ---------------------------------------------------------------------------
+async def tee(body: AsyncIterator, key: str) -> AsyncIterator:
+    """
+        Части тела копируются, пока их размер не превысит CACHE_MAX_ENTRY_BYTES. В кэш попадает только
+        полностью отданный ответ (при обрыве соединения генератор не доходит до сохранения).
+    """
+    parts = []
+    size = 0
+    async for chunk in body:
+        if parts is not None:
+            data = chunk if isinstance(chunk, bytes) else chunk.encode("utf-8")
+            size += len(data)
+            if size <= response_cache.max_entry_bytes:
+                parts.append(data)
+            else:
+                parts = None
+        yield chunk
+    if parts is not None:
+        await run_in_threadpool(response_cache.set, key, b"".join(parts))
+
+
+# Запись кэша для JSON ответа (для асинхронных обработчиков /api/v1: обращения к бэкенду кэша - в пуле потоков) ----------------------------
+async def json_cache_entry(request: Request, params: Dict) -> CacheEntry:
+    return await run_in_threadpool(CacheEntry, request, params, "application/json")
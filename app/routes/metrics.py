@@ -0,0 +1,92 @@
+import logging
+import os
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from starlette.concurrency import run_in_threadpool
+from app.database.database import async_engine, engine, read_engine
+from app.services.cache import response_cache
+from app.server import process_memory
+from app.services.metrics import RequestStats, record_request, render_metrics, request_stats
+
+# Создание логгера
+logger = logging.getLogger(__name__)
+
+# Создание роутера
+router = APIRouter(tags=["Метрики"])
+
+
+# Счетчики SQL запросов на каждый HTTP запрос: заголовок Server-Timing и метрики /metrics ------------------------------------------------------
+class QueryMetricsMiddleware:
+    """
+        ASGI middleware (не BaseHTTPMiddleware: тот выполняет обработчик в другой задаче, и контекстная переменная
+        со счетчиками не доходила бы до обработчика).<br>
+        Server-Timing добавляется только к ответам, отданным одной частью: начало ответа задерживается до первой части тела,
+        и если за ней следуют другие (потоковый ответ - организации по частям, запросы выполняются при выдаче),
+        заголовок не добавляется - к началу выдачи запросы еще не выполнены. Запросы потоковых ответов
+        учитываются в метриках /metrics по окончании выдачи.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = request_stats.set(stats)
+        status = 500
+
+        start = None
+
+        async def send_with_timing(message):
+            nonlocal status, start
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                start = message
+                return
+            if start is not None:
+                if message["type"] == "http.response.body" and not message.get("more_body", False):
+                    timing = f'db;dur={stats.db_time * 1000:.1f};desc="{stats.queries} queries, {stats.rows} rows"'
+                    start["headers"] = list(start.get("headers", [])) + [(b"server-timing", timing.encode("latin-1"))]
+                await send(start)
+                start = None
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            request_stats.reset(token)
+            # шаблон пути маршрута (а не сам путь) - чтобы число меток не росло с числом ID
+            route = getattr(scope.get("route"), "path", None) or ("/static" if scope["path"].startswith("/static/") else "unmatched")
+            record_request(stats, scope["method"], route, status)
+
+
+# Метрики процесса (формат Prometheus) ----------------------------------------------------------------------------------------------------
+@router.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """
+        Счетчики HTTP и SQL запросов процесса, состояние пулов соединений и кэша ответов, память процесса.<br>
+        При запуске через gunicorn метрики относятся к воркеру, обработавшему запрос (pid в nebus_process_pid).<br>
+        Потоковые ответы (списки организаций HTML / NDJSON) отдаются без заголовка Server-Timing: SQL запросы
+        выполняются и после начала ответа, их число и время учитываются только здесь.
+    """
+    extra = {
+        "nebus_db_pool_checked_out": engine.pool.checkedout() if hasattr(engine.pool, "checkedout") else 0,
+        "nebus_db_read_pool_checked_out": read_engine.pool.checkedout() if hasattr(read_engine.pool, "checkedout") else 0,
+        "nebus_db_async_pool_checked_out": async_engine.pool.checkedout() if hasattr(async_engine.pool, "checkedout") else 0,
+    }
+    cache = await run_in_threadpool(response_cache.stats)
+    for name, value in cache.items():
+        if isinstance(value, (int, float)):
+            extra[f"nebus_response_cache_{name}"] = value
+    # память процесса (только Linux): shared - страницы, общие с главным процессом и другими воркерами
+    pid = os.getpid()
+    extra["nebus_process_pid"] = pid
+    try:
+        for name, value in process_memory(pid).items():
+            extra[f"nebus_process_{name}_bytes"] = value
+    except OSError:
+        pass
+    return PlainTextResponse(render_metrics(extra), media_type="text/plain; version=0.0.4")
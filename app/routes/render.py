@@ -0,0 +1,101 @@
+import itertools
+import logging
+from typing import Iterable, Iterator
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+from app.schemas.schemas import OrganizationCardSchema
+
+# Создание логгера
+logger = logging.getLogger(__name__)
+
+# Форматы выдачи списка организаций
+FORMAT_HTML = "html"
+FORMAT_NDJSON = "ndjson"
+MEDIA_TYPES = {
+    FORMAT_HTML: "text/html; charset=utf-8",
+    FORMAT_NDJSON: "application/x-ndjson",
+}
+
+TABLE_HEAD = """
+        <table class="table">
+            <thead class="thead-light">
+                <tr>
+                    <th scope="col">ID</th>
+                    <th scope="col">Название</th>
+                    <th scope="col">Адрес</th>
+                    <th scope="col">Телефоны</th>
+                    <th scope="col">Деятельности</th>
+                </tr>
+            </thead>
+            <tbody>
+    """
+
+TABLE_TAIL = """
+            </tbody>
+        </table>
+    """
+
+
+# Строка HTML таблицы по карточке организации ---------------------------------------------------------------------------------------------
+def render_organization_row(card: OrganizationCardSchema) -> str:
+    address = card.building.address if card.building is not None else ""
+    if card.distance is not None:
+        address += f" ({round(card.distance, 1)} км.)"
+    phones_list = "".join(f"{phone}<br>" for phone in card.phones)
+    activities_list = "".join(f"[{activity.level}] {activity.name}<br>" for activity in card.activities)
+    return f"""
+            <tr>
+                <td scope="row">{card.id}</td>
+                <td>{card.name}</td>
+                <td>{address}</td>
+                <td>{phones_list}</td>
+                <td>{activities_list}</td>
+            </tr>
+        """
+
+
+# HTML таблица по карточкам организаций - по частям -------------------------------------------------------------------------------------------
+def iter_organizations_table(cards: Iterable[OrganizationCardSchema]) -> Iterator[str]:
+    yield TABLE_HEAD
+    for card in cards:
+        yield render_organization_row(card)
+    yield TABLE_TAIL
+
+
+# NDJSON - одна карточка организации (JSON) на строку ------------------------------------------------------------------------------------------
+def iter_organizations_ndjson(cards: Iterable[OrganizationCardSchema]) -> Iterator[str]:
+    for card in cards:
+        yield card.model_dump_json() + "\n"
+
+
+# Потоковый ответ со списком организаций ------------------------------------------------------------------------------------------------------
+def stream_organizations(
+        db: Session,
+        cards: Iterable[OrganizationCardSchema],
+        output_format: str = FORMAT_HTML
+) -> StreamingResponse:
+    """
+        Возвращает StreamingResponse: строки отправляются клиенту по мере загрузки карточек,
+        поэтому время до первого байта и пиковая память не зависят от числа организаций.<br>
+        Остальные карточки читаются уже после выхода из обработчика, поэтому сессия закрывается
+        по окончании выдачи (а не только зависимостью get_db).<br>
+        Первая карточка загружается до ответа (запрос ID и первая пачка карточек): ошибка БД в них - 500,
+        а не 200 с пустым или обрезанным телом. Ошибка в следующих пачках обрывает уже начатый ответ.
+    """
+    if output_format not in MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail=f"Неизвестный формат: {output_format} (допустимо: {', '.join(MEDIA_TYPES)})")
+    render = iter_organizations_ndjson if output_format == FORMAT_NDJSON else iter_organizations_table
+
+    cards = iter(cards)
+    first = next(cards, None)
+    if first is not None:
+        cards = itertools.chain([first], cards)
+
+    def body():
+        try:
+            yield from render(cards)
+        finally:
+            db.close()
+
+    return StreamingResponse(body(), media_type=MEDIA_TYPES[output_format])
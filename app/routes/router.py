@@ -1,26 +1,34 @@
 import logging
-from fastapi import APIRouter, HTTPException, Depends, Request, Form
-from fastapi.responses import HTMLResponse, JSONResponse
+from fastapi import APIRouter, BackgroundTasks, HTTPException, Depends, Request, Form
+from fastapi.responses import HTMLResponse, JSONResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from sqlalchemy.orm import Session
-from typing import List, Optional
-from app.database.database import get_db
+from typing import Iterator, List, Optional
+from app.database.database import get_db, get_read_db
 from app.models.organization import Organization
 from app.models.building import Building
 from app.models.activity import Activity
 from app.models.organization_activity import OrganizationActivity
 from app.models.building_organization import BuildingOrganization
 from app.models.phones import Phones
-from app.schemas.schemas import OrganizationSchema, ActivitySchema, PhonesSchema, BuildingSchema
-from sqlalchemy import func, text
+from app.geo.nearby import get_buildings_nearby
+from app.geo.spatial import rectangle, get_buildings_in_box
+from app.routes.caching import CacheEntry
+from app.routes.render import FORMAT_HTML, MEDIA_TYPES, stream_organizations
+from app.services.activity_tree import activity_tree
+from app.services.batch import write_activities
+from app.services.cache import response_cache
+from app.services.cards import chunked, get_organization_cards, iter_organization_cards, iter_organization_ids
+from app.services.search import search_organizations, DEFAULT_SEARCH_LIMIT
+from app.services.snapshot import catalog_snapshot
+from app.services import repository
+from app.services.repository import fetch_all, fetch_one
+from app.schemas.schemas import OrganizationSchema, ActivitySchema, ActivityWriteSchema, PhonesSchema, BuildingSchema
+from app.settings import get_settings
+from sqlalchemy import func, text, bindparam
+from sqlalchemy.engine import Row
 from sqlalchemy.orm import Session
-import math
-import pandas as pd
-
-# Настройка логирования
-logging.basicConfig(level=logging.INFO)  # Установите уровень логирования
-#logging.basicConfig(level=logging.DEBUG)  # Установите уровень логирования
 
 # Создание логгера
 logger = logging.getLogger(__name__) 
@@ -28,27 +36,30 @@ logger = logging.getLogger(__name__)
 # Создание роутера
 router = APIRouter()
 
-# Загрузка переменных окружения
-def load_env(env_path='.env'):
-    env_vars = {}
-    with open(env_path) as f:
-        for line in f:
-            line = line.strip()
-            if line and not line.startswith('#'):
-                key, value = line.split('=', 1)
-                env_vars[key.strip()] = value.strip()
-    return env_vars
-
-# Проверка API ключа
+# Проверка API ключа (ключ - в настройках приложения: переменная окружения или файл ".env")
 def verify_api_key(api_key: str):
-    if api_key != API_KEY:
+    expected = get_settings().api_key
+    if expected is None or api_key != expected:
         raise HTTPException(status_code=403, detail="Invalid API Key")
 
-# Загрузка переменных окружения
-config = load_env()
 
-# В дальнейшем, необходимо заменить на ваш статический API ключ в файле ".env"
-API_KEY = config['API_KEY']  
+# Каталог изменен (после commit): кэши и производные индексы сбрасываются один раз на запись -------------------------------------------------
+def catalog_changed(background_tasks: BackgroundTasks, activities_changed: bool) -> int:
+    """
+        Новая версия каталога (конец журнала изменений) уже зафиксирована вместе с записью и видна всем процессам:
+        здесь только освобождаются кэши этого процесса - дерево деятельностей (если они менялись) и ответы прежних версий,
+        снимок каталога удаляется и перестраивается после ответа. До перестроения снимок прежней версии
+        обработчиками не используется (catalog_snapshot.get(version)).<br>
+        Возвращает новую версию каталога (0 - кэш ответов выключен).
+    """
+    logger.info(f"catalog_changed() -> ...")
+    if activities_changed:
+        activity_tree.invalidate()
+    catalog_snapshot.invalidate()
+    version = response_cache.invalidate()
+    if catalog_snapshot.enabled:
+        background_tasks.add_task(catalog_snapshot.rebuild)
+    return version
 
 
 # Настройка шаблонов Jinja2
@@ -56,47 +67,24 @@ templates = Jinja2Templates(directory="templates")
 
 
 # Возвращает список всех зданий из БД -----------------------------------------------------------------------------------------------------------------------
-def get_all_buildings(db: Session):
+def get_all_buildings(db: Session) -> List[Row]:
     logger.info(f"get_all_buildings() -> ...")
     logger.debug(f"Запрос на получение всех зданий.")
-    s = f"""
-        SELECT id, address, latitude, longitude
-        FROM buildings
-        order by address
-    """
-    query = text(s)
-    logger.debug(f"query: {query}")
-    result = db.execute(query)
     # Список всех зданий
-    buildings = result.fetchall()
+    buildings = fetch_all(db, repository.SELECT_ALL_BUILDINGS)
     logger.debug(f"buildings: {buildings}")
     logger.debug(f"End get_all_buildings() -> ...")
     return buildings
 
 
-# Возвращает список телефонов организации -----------------------------------------------------------------------------------------------------------------------
+# Возвращает список телефонов организации (строки organization_id, phone_number) -----------------------------------------------------------------
 def get_phones(
         db: Session, 
         organization_id: int
-):
+) -> List[Row]:
     logger.info(f"get_phones() -> ...")
     logger.debug(f"Запрос на получение телефонов организации: organization_id={organization_id} ...")
-    s = f"""
-        SELECT phone_number
-        FROM phones
-        WHERE organization_id = {organization_id}
-    """
-    query = text(s)
-    logger.debug(f"query: {query}")
-    result = db.execute(query)
-    recs = result.fetchall()
-    phones = []
-    for rec in recs:
-        phone = PhonesSchema(
-            organization_id=organization_id, 
-            phone_number=rec.phone_number
-        )
-        phones.append(phone)
+    phones = fetch_all(db, repository.SELECT_PHONES, {"organization_id": organization_id})
     logger.debug(f"phones: {phones}")
     logger.debug(f"End get_phones() -> ...")
     return phones
@@ -106,65 +94,34 @@ def get_phones(
 def get_building_by_organization_id(
         db: Session, 
         organization_id: int
-) -> BuildingSchema:
+) -> Optional[BuildingSchema]:
     logger.info(f"get_building_by_organization_id() -> ...")
     logger.debug(f"Запрос на получение адреса организации: organization_id={organization_id} ...")
-    s = f"""
-        SELECT c.id, c.address, c.latitude, c.longitude
-        FROM building_organization a
-        LEFT JOIN buildings c ON c.id = a.building_id
-        WHERE a.organization_id = {organization_id}
-    """
-    query = text(s)
-    logger.debug(f"query: {query}")
-    result = db.execute(query)
-    recs = result.fetchall()
-    if len(recs) == 0:
+    rec = fetch_one(db, repository.SELECT_BUILDING_BY_ORGANIZATION, {"organization_id": organization_id})
+    if rec is None:
         return None
-    rec = recs[0]
     building = BuildingSchema(
-        id=rec[0], 
-        address=rec[1], 
-        latitude=rec[2], 
-        longitude=rec[3]
+        id=rec.id, 
+        address=rec.address, 
+        latitude=rec.latitude, 
+        longitude=rec.longitude
     )
     logger.debug(f"BuildingSchema: {building}")
     logger.debug(f"End get_building_by_organization_id() -> ...")
     return building
 
 
-# Возвращает список деятельностей организации -----------------------------------------------------------------------------------------------------------------------
+# Возвращает список деятельностей организации (строки id, name, parent_id, level) ----------------------------------------------------------------
 def get_activities(
         db: Session, 
         organization_id: Optional[int] = None
-) -> List[ActivitySchema]:
+) -> List[Row]:
     logger.info(f"get_activities() -> ...")
     logger.debug(f"Запрос на получение деятельностей организации: organization_id={organization_id} ...")
     if organization_id is not None:
-        logger.debug(f"organization_id: {organization_id}")
-        s = f"""
-            SELECT c.id, c.name, c.parent_id, c.level
-            FROM organization_activity a 
-            LEFT JOIN activities c ON (a.activity_id = c.id)
-            WHERE a.organization_id = {organization_id}
-            ORDER BY c.level, c.parent_id
-        """
+        activities = fetch_all(db, repository.SELECT_ACTIVITIES_BY_ORGANIZATION, {"organization_id": organization_id})
     else:
-        s = f"""
-            SELECT c.id, c.name, c.parent_id, c.level
-            FROM activities c
-            ORDER BY c.level, c.parent_id
-        """
-    query = text(s)
-    logger.debug(f"query: {query}")
-    result = db.execute(query)
-    recs = result.fetchall()
-    #print(f"activities recs: {recs}")
-    activities = []
-    for rec in recs:
-        #print(f"rec: {rec}")
-        activity = ActivitySchema(id=rec.id, name=rec.name, parent_id=rec.parent_id, level=rec.level)
-        activities.append(activity)
+        activities = fetch_all(db, repository.SELECT_ACTIVITIES)
     logger.debug(f"activities: {activities}")
     logger.debug(f"End get_activities() -> ...")
     return activities
@@ -174,167 +131,85 @@ def get_activities(
 def get_activity_by_id(
         db: Session, 
         activity_id: int
-):
+) -> Optional[Row]:
     logger.info(f"get_activity_by_id() -> ...")
     logger.debug(f"Запрос на получение деятельности по ID: activity_id={activity_id} ...")
-    """Возвращает деятельность по ID."""
-    activity = db.query(Activity).filter(Activity.id == activity_id).first()
-    if activity is None:
-        return None
+    activity = fetch_one(db, repository.SELECT_ACTIVITY, {"activity_id": activity_id})
     logger.debug(f"activity: {activity}")
     logger.debug(f"End get_activity_by_id() -> ...")
     return activity 
 
 
-# расстояние между двумя точками (в метрах) по координатам широты и долготы (в градусах) ----------------------------------------------------
-def distance(lat1, lon1, lat2, lon2):
-    # параметры
-    # lat1, lon1 - координаты первой точки
-    # lat2, lon2 - координаты второй точки
-    # R - радиус Земли
-    # dLat - разница широт
-    # dLon - разница долгот
-    # a - промежуточная переменная
-    # c - промежуточная переменная
-
-    R = 6371000
-    dLat = (lat2 - lat1) * math.pi / 180.0
-    dLon = (lon2 - lon1) * math.pi / 180.0
-    
-    # формула Гаусса
-    a = math.sin(dLat / 2) * math.sin(dLat / 2) + math.cos(lat1 * math.pi / 180.0) * math.cos(lat2 * math.pi / 180.0) * math.sin(dLon / 2) * math.sin(dLon / 2)
-    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
-    return R * c
-
-
 # Возвращает список организаций по ID здания --------------------------------------------------------------------------------------------------
 def get_organizations_by_building(
         db: Session, 
         building_id: int
-):
+) -> List[Row]:
     logger.info(f"get_organizations_by_building() -> ...")
     logger.debug(f"Запрос на получение организаций по ID здания: building_id={building_id} ...")
-    s = f"""
-        SELECT b.id, b.name, c.address
-        FROM building_organization a 
-        LEFT JOIN organizations b ON b.id = a.organization_id 
-        LEFT JOIN buildings c ON c.id = a.building_id
-        WHERE a.building_id = {building_id} 
-        ORDER BY b.name
-    """
-    query = text(s)
-    logger.debug(f"query: {query}")
-    result = db.execute(query)
-    recs = result.fetchall()
+    recs = fetch_all(db, repository.SELECT_ORGANIZATIONS_BY_BUILDING, {"building_id": building_id})
     logger.debug(f"recs: {recs}")
     logger.debug(f"End get_organizations_by_building() -> ...")
     return recs
 
 
+# Возвращает список организаций по списку ID зданий --------------------------------------------------------------------------------------------
+def get_organizations_by_buildings(
+        db: Session,
+        building_ids: List[int]
+) -> List[Row]:
+    logger.info(f"get_organizations_by_buildings() -> ...")
+    logger.debug(f"Запрос на получение организаций по списку ID зданий: building_ids={building_ids} ...")
+    recs = fetch_all(db, repository.SELECT_ORGANIZATIONS_BY_BUILDINGS, {"building_ids": building_ids})
+    logger.debug(f"recs: {recs}")
+    logger.debug(f"End get_organizations_by_buildings() -> ...")
+    return recs
+
+
 # Возвращает организацию по ID -------------------------------------------------------------------------------------------
 def get_organization(
         db: Session, 
         organization_id: int
-) -> OrganizationSchema:
+) -> Optional[OrganizationSchema]:
     logger.info(f"get_organization() -> ...")
     logger.debug(f"Запрос на получение организации: organization_id={organization_id} ...")
-    rec = db.query(Organization).filter(Organization.id == organization_id).first()
+    rec = fetch_one(db, repository.SELECT_ORGANIZATION, {"organization_id": organization_id})
+    if rec is None:
+        return None
     
     building = get_building_by_organization_id(db=db, organization_id=rec.id)   
-    organization = OrganizationSchema(id=rec.id, name=rec.name, address=building.address)
+    organization = OrganizationSchema(id=rec.id, name=rec.name, address=building.address if building else None)
     
     logger.debug(f"organization: {organization}")
     logger.debug(f"End get_organization() -> ...")
     return organization
 
 
-# класс узла дерева Деятельностей ---------------------------------------------------------------------------------------------------------
-class TreeNode:
-    max_level = 3
-    current_id = 0
-    # функция инициализации узла
-    def __init__(self, id, name, level=0, parent_id=None):
-        if id is None:
-            self.current_id += 1
-            self.id = self.current_id
-        else:
-            self.id = id
-            if id > self.current_id:
-                self.current_id = id
-        self.name = name
-        self.level = level
-        self.parent_id = parent_id
-        self.childrens = []
-
-    # функция добавления потомка
-    def add_child(self, child_node):
-        # Контроль уровня
-        if child_node.level < self.max_level:
-            child_node.level = self.level + 1
-            self.childrens.append(child_node)
-        else:
-            logger.warning("Уровень больше 3 - не добавляем")
-            return
-
-    # функция вывода узла
-    def __repr__(self):
-        ret =  f"id={self.id}  {self.name}  level={self.level}  parent_id={self.parent_id}\n"
-        #for child in self.childrens:
-        #    ret += " - " + child.__repr__()
-        return ret
-
-# функция получения всех потомков узла
-def get_childrens(node: TreeNode):
-    logger.info(f"get_childrens() -> ...")
-    logger.debug(f"node = {node.id} - {node.name}")
-    node_list = [node]
-
-    # проходим по всем потомкам
-    for child in node.childrens:
-        logger.debug(f"child = {child.id} - {child.name}")
-        # если уровень потомка меньше или равен 3, то добавляем его потомков в список
-        if child.level <= 3:
-            a = get_childrens(child)
-            node_list += a
-        else:
-            break
-    logger.debug(f"node_list = {node_list}")
-    return node_list
+# Возвращает список организаций по ID деятельности с учетом всех вложенных деятельностей -----------------------------------------------------
+def get_organizations_by_activity_tree(
+        db: Session,
+        activity_id: int
+) -> List[Row]:
+    """
+        Один запрос по таблице замыкания activity_closure - не зависит от размера дерева деятельностей.<br>
+        Возвращает строки (id, name).
+    """
+    logger.info(f"get_organizations_by_activity_tree() -> ...")
+    logger.debug(f"Запрос на получение организаций по ID деятельности и всем вложенным: activity_id={activity_id} ...")
+    organizations = fetch_all(db, repository.SELECT_ORGANIZATIONS_BY_ACTIVITY_TREE, {"activity_id": activity_id})
+    logger.debug(f"organizations: {organizations}")
+    logger.debug(f"End get_organizations_by_activity_tree() -> ...")
+    return organizations
 
 
-# Возвращает список организаций по ID деятельности -----------------------------------------------------------------------------------------------------------------------
+# Возвращает список организаций по ID деятельности (строки id, name без повторов) -----------------------------------------------------------------
 def get_organizations_by_activity(
         db: Session, 
         activity_id: int
-) -> List[OrganizationSchema]:
+) -> List[Row]:
     logger.info(f"get_organizations_by_activity() -> ...")
     logger.debug(f"Запрос на получение организаций по ID деятельности: activity_id={activity_id} ...")
-
-    s = f"""
-        SELECT b.id, b.name
-        FROM organization_activity a
-        LEFT JOIN organizations b ON (a.organization_id = b.id)
-        WHERE a.activity_id = {activity_id}
-        ORDER BY b.name
-    """
-    query = text(s)
-    logger.debug(f"query: {query}")
-    result = db.execute(query)
-    recs = result.fetchall()
-    logger.debug(f"recs: {recs}")
-    organizations = []
-    for rec in recs:
-        logger.debug(f"rec: {rec}")
-        organization = OrganizationSchema(id=rec.id, name=rec.name)
-        logger.debug(f"organization: {organization}")
-        # проверка на дублирование
-        bSame = False
-        for org in organizations:
-            if org.id == organization.id:
-                bSame = True
-                break
-        if not bSame:
-            organizations.append(organization)
+    organizations = fetch_all(db, repository.SELECT_ORGANIZATIONS_BY_ACTIVITY, {"activity_id": activity_id})
     logger.debug(f"organizations: {organizations}")
     logger.debug(f"End get_organizations_by_activity() -> ...")
     return organizations
@@ -343,34 +218,35 @@ def get_organizations_by_activity(
 # Возвращает список организаций по названию -----------------------------------------------------------------------------------------------------------------------
 def get_organizations_by_name(
         db: Session, 
-        name: str
-) -> List[OrganizationSchema]:
+        name: str,
+        limit: int = DEFAULT_SEARCH_LIMIT,
+        offset: int = 0
+) -> List[Row]:
     logger.info(f"get_organizations_by_name() -> ...")
     logger.debug(f"Запрос на получение организаций по названию: name={name} ...")
-    s = f"""
-        SELECT b.id, b.name
-        FROM organizations b
-        WHERE UPPER(b.name) LIKE UPPER('%{name}%')
-        ORDER BY b.name
-    """
-    logger.debug(f"В SQLITE запрос использующий UPPER() - для кирилицы не работает, значит, что она не поддерживает символы за пределами диапазона ASCII")
-    query = text(s)
-    logger.debug(f"query: {query}")
-    result = db.execute(query)
-    recs = result.fetchall()
-    logger.debug(f"recs: {recs}")
-    organizations = []
-    for rec in recs:
-        organization = OrganizationSchema(id=rec.id, name=rec.name)
-        organizations.append(organization)
+    # Полнотекстовый поиск (FTS5 в SQLite, tsvector/pg_trgm в PostgreSQL) с ранжированием по релевантности
+    organizations = search_organizations(db=db, name=name, limit=limit, offset=offset)
     logger.debug(f"organizations: {organizations}")
     logger.debug(f"End get_organizations_by_name() -> ...")
     return organizations
 
+
+# Возвращает ID организаций, находящихся в зданиях из списка (по пачкам зданий) -------------------------------------------------------------
+def iter_organization_ids_by_buildings(
+        db: Session,
+        building_ids: List[int]
+) -> Iterator[int]:
+    for chunk in chunked(building_ids):
+        organizations = get_organizations_by_buildings(db=db, building_ids=chunk)
+        logger.debug(f"all organizations in buildings: {organizations}")
+        for organization in organizations:
+            yield organization.id
+
+
 # ==============================================================================================================================
 # Главная страница ------------------------------------------------------------------------------------------------------------
 @router.get("/", response_class=HTMLResponse)
-def read_root(request: Request, db: Session = Depends(get_db)):
+def read_root(request: Request, db: Session = Depends(get_read_db)):
     """
         Главная страница проекта Nebus. <br>
         запуск в браузере: http://localhost:8000/
@@ -379,7 +255,8 @@ def read_root(request: Request, db: Session = Depends(get_db)):
     # Список всех зданий
     buildings = get_all_buildings(db=db)
     logger.debug(f"buildings: {buildings}")
-    activities = get_activities(db=db)
+    # Дерево деятельностей из кэша процесса
+    activities = activity_tree.get(db).as_list()
     logger.debug(f"activities: {activities}")
     # Список зданий и деятельностей
     buildings_list = []
@@ -394,7 +271,7 @@ def read_root(request: Request, db: Session = Depends(get_db)):
             "level": activity.level
         })
     # Данные для шаблона
-    data = {"api_key": API_KEY, 
+    data = {"api_key": get_settings().api_key, 
             "request": request, 
             "buildings": buildings_list, 
             "activities": activities_list
@@ -415,14 +292,18 @@ def read_info(request: Request):
 # Возвращает список организаций по ID здания ---------------------------------------------------------------------------------
 @router.post("/organizations/building", response_class=HTMLResponse)
 def post_organizations_by_building(
+    request: Request,
     building_id: int = Form(...),
     api_key: str = Form(...),  # API ключ
-    db: Session = Depends(get_db)
-) -> HTMLResponse:
+    output_format: str = Form(FORMAT_HTML, alias="format"), 
+    db: Session = Depends(get_read_db)
+) -> StreamingResponse:
     """
         Возвращает список организаций по ID здания.<br>
         building_id - ID здания<br>
         api_key - API ключ<br>
+        format - формат ответа: html (по умолчанию) или ndjson<br>
+        Ответ потоковый (строки - по мере загрузки карточек): заголовка Server-Timing нет, SQL запросы учитываются в /metrics<br>
         db - сессия базы данных<br>
     """
     logger.info(f"post_organizations_by_building() -> ...")
@@ -431,74 +312,28 @@ def post_organizations_by_building(
     # Проверка API ключа
     verify_api_key(api_key)
 
-    # Получение списка организаций по ID здания
-    organizations = get_organizations_by_building(db=db, building_id=building_id)
-    logger.debug(f"organizations: {organizations}")
+    # Ответ из кэша (тело или 304 по ETag для текущей версии каталога)
+    cache_entry = CacheEntry(request, {"building_id": building_id, "format": output_format}, MEDIA_TYPES.get(output_format))
+    if cache_entry.response is not None:
+        return cache_entry.response
 
-    # Формирование таблицы в HTML формате
-    sTable = """
-        <table class="table">
-            <thead class="thead-light">
-                <tr>
-                    <th scope="col">ID</th>
-                    <th scope="col">Название</th>
-                    <th scope="col">Адрес</th>
-                    <th scope="col">Телефоны</th>
-                    <th scope="col">Деятельности</th>
-                </tr>
-            </thead>
-            <tbody>
-    """
-    # Цикл по всей выборке
-    for organization in organizations:
-        logger.debug(f"organization: {organization}")
-
-        # Получение телефонов организации
-        phones = get_phones(db, organization.id)
-        phones_list = ""
-        for phone in phones:
-            logger.debug(f"phone: {phone}")
-            phones_list += f"{phone.phone_number}<br>"
-        logger.debug(f"phones_list: {phones_list}")
-
-        # Получение деятельностей организации
-        activities = get_activities(db=db, organization_id = organization.id)
-        logger.debug(f"activities: {activities}")
-        # Список всех деятельностей организации
-        activities_names = ""
-        # Цикл по всем деятельностям
-        for activity in activities:
-            logger.debug(f"activity: {activity}")
-            activities_names += f"[{activity.level}] {activity.name}<br>"
-
-        # Получение адреса организации
-        building = get_building_by_organization_id(db=db, organization_id=organization.id)
-        logger.debug(f"building: {building}")
-
-        # Формирование строки таблицы
-        sRow = f"""
-            <tr>
-                <td scope="row">{organization.id}</td>
-                <td>{organization.name}</td>
-                <td>{building.address}</td>
-                <td>{phones_list}</td>
-                <td>{activities_names}</td>
-            </tr>
-        """
-        sTable += sRow
-
-    # Закрытие таблицы
-    sTable += """
-            </tbody>
-        </table>
-    """
-    # Возвращаем таблицу в HTML формате
-    return HTMLResponse(content=sTable)
+    snapshot = catalog_snapshot.get(cache_entry.version)
+    if snapshot is not None:
+        # Организации в здании и их карточки - из снимка каталога (без обращения к БД)
+        cards = snapshot.iter_cards(snapshot.organizations_by_buildings(snapshot.building_ordinals_of([building_id])))
+    else:
+        # Организации в здании - ID читаются серверным курсором, карточки загружаются пачками
+        organization_ids = iter_organization_ids(db, repository.SELECT_ORGANIZATION_IDS_BY_BUILDING, {"building_id": building_id})
+        cards = iter_organization_cards(db=db, organization_ids=organization_ids)
+
+    # Возвращаем таблицу (или NDJSON) потоком
+    return cache_entry.store(stream_organizations(db=db, cards=cards, output_format=output_format))
 
 
 # Добавление новой деятельности -----------------------------------------------------------------------------------------------------------------------
 @router.post("/add_activity/", response_model=ActivitySchema)
 def add_activity(
+    background_tasks: BackgroundTasks,
     parent_id: int = Form(...),
     name: str = Form(...),
     api_key: str = Form(...),
@@ -518,31 +353,33 @@ def add_activity(
     # Проверка API ключа
     verify_api_key(api_key)
 
-    # Проверка уровня родителя деятельности
-    if parent_id is not None:
-        activity = get_activity_by_id(db=db, activity_id=parent_id)
-        if (activity is not None) and (activity.level >= 3):
-            raise HTTPException(status_code=400, detail="ERROR: Уровень вложенности родителя деятельности не должен превышать 3!")
-
-    # Добавление новой деятельности
-    new_activity = Activity(name=name, parent_id=parent_id)
-    db.add(new_activity)
+    # Добавление деятельности: уровень и пары activity_closure вычисляются по родителю, проверка уровня вложенности (в одной транзакции)
+    try:
+        activity_ids = write_activities(db=db, items=[ActivityWriteSchema(name=name, parent_id=parent_id)])
+    except ValueError as e:
+        db.rollback()
+        raise HTTPException(status_code=400, detail=str(e))
     db.commit()
-    db.refresh(new_activity)
-    return new_activity
+
+    catalog_changed(background_tasks=background_tasks, activities_changed=True)
+    return ActivitySchema.model_validate(get_activity_by_id(db=db, activity_id=activity_ids[0]), from_attributes=True)
 
 
 # Возвращает список организаций по ID деятельности -----------------------------------------------------------------------------------------------------------------------
 @router.post("/organizations/activity", response_class=HTMLResponse)
 def post_organizations_by_activity(
+    request: Request,
     activity_id: int = Form(...), 
     api_key: str = Form(...), 
-    db: Session = Depends(get_db)
-) -> HTMLResponse:
+    output_format: str = Form(FORMAT_HTML, alias="format"), 
+    db: Session = Depends(get_read_db)
+) -> StreamingResponse:
     """
         Возвращает список организаций по ID деятельности.<br>
         activity_id - ID деятельности<br>
         api_key - API ключ<br>
+        format - формат ответа: html (по умолчанию) или ndjson<br>
+        Ответ потоковый (строки - по мере загрузки карточек): заголовка Server-Timing нет, SQL запросы учитываются в /metrics<br>
         db - сессия базы данных<br>
     """
     logger.info(f"post_organizations_by_activity() -> ...")
@@ -550,79 +387,43 @@ def post_organizations_by_activity(
     # Проверка API ключа
     verify_api_key(api_key)
 
-    # Получение списка организаций по ID деятельности
-    organizations = get_organizations_by_activity(db=db, activity_id=activity_id)
-    logger.debug(f"organizations: {organizations}")
-    # Формирование таблицы в HTML формате
-    sTable = """
-        <table class="table">
-            <thead class="thead-light">
-                <tr>
-                    <th scope="col">ID</th>
-                    <th scope="col">Название</th>
-                    <th scope="col">Адрес</th>
-                    <th scope="col">Телефоны</th>
-                    <th scope="col">Деятельности</th>
-                </tr>
-            </thead>
-            <tbody>
-    """    
-    # Цикл по всей выборке
-    for organization in organizations:
-        logger.debug(f"organization: {organization}")
-        # Получение телефонов организации
-        phoneSchemas = get_phones(db, organization.id)
-        logger.debug(f"phoneSchemas: {phoneSchemas}")
-        phones_list = ""
-        for phone in phoneSchemas:
-            phones_list += f"{phone.phone_number}<br>"
-
-        # Получение деятельностей организации
-        activitySchemas = get_activities(db=db, organization_id = organization.id)
-        logger.debug(f"activitySchemas: {activitySchemas}")    
-        activities_list = ""
-        for activity in activitySchemas:
-            activities_list += f"[{activity.level}] {activity.name}<br>"
-
-        # Получение здания организации
-        building = get_building_by_organization_id(db=db, organization_id=organization.id)
-        logger.debug(f"BuildingSchema: {building}")
-
-        sRow = f"""
-            <tr>
-                <td scope="row">{organization.id}</td>
-                <td>{organization.name}</td>
-                <td>{building.address}</td>
-                <td>{phones_list}</td>
-                <td>{activities_list}</td>
-            </tr>
-        """
-        sTable += sRow
-
-    # Закрытие таблицы
-    sTable += """
-            </tbody>
-        </table>
-    """
-    # Возвращаем таблицу в HTML формате
-    return HTMLResponse(content=sTable)
+    # Ответ из кэша (тело или 304 по ETag для текущей версии каталога)
+    cache_entry = CacheEntry(request, {"activity_id": activity_id, "format": output_format}, MEDIA_TYPES.get(output_format))
+    if cache_entry.response is not None:
+        return cache_entry.response
+
+    snapshot = catalog_snapshot.get(cache_entry.version)
+    if snapshot is not None:
+        # Организации по ID деятельности и их карточки - из снимка каталога
+        cards = snapshot.iter_cards(snapshot.organizations_by_activities(snapshot.activity_ordinals_of([activity_id])))
+    else:
+        # Организации по ID деятельности - ID читаются серверным курсором, карточки загружаются пачками
+        organization_ids = iter_organization_ids(db, repository.SELECT_ORGANIZATIONS_BY_ACTIVITY, {"activity_id": activity_id})
+        cards = iter_organization_cards(db=db, organization_ids=organization_ids)
+
+    # Возвращаем таблицу (или NDJSON) потоком
+    return cache_entry.store(stream_organizations(db=db, cards=cards, output_format=output_format))
 
 
 # Возвращает список организаций по координатам и радиусу -----------------------------------------------------------------------------------------------------------------------
 @router.post("/organizations/nearby", response_class=HTMLResponse)
 def post_organizations_nearby(
+    request: Request,
     latitude: float = Form(...), 
     longitude: float = Form(...), 
     radius: float = Form(...), 
     api_key: str = Form(...), 
-    db: Session = Depends(get_db)
-) -> HTMLResponse:
+    output_format: str = Form(FORMAT_HTML, alias="format"), 
+    db: Session = Depends(get_read_db)
+) -> StreamingResponse:
     """
         Возвращает список организаций по координатам (latitude, longitude) и радиусу (radius) в км.<br>
         latitude - широта<br>
         longitude - долгота<br>
         radius - радиус в км.<br>
         api_key - API ключ<br>
+        format - формат ответа: html (по умолчанию) или ndjson<br>
+        Ответ потоковый (строки - по мере загрузки карточек): заголовка Server-Timing нет, SQL запросы учитываются в /metrics<br>
         db - сессия базы данных<br>
     """
     logger.info(f"post_organizations_nearby() -> ...")
@@ -631,323 +432,221 @@ def post_organizations_nearby(
     # Проверка API ключа
     verify_api_key(api_key)
 
-    # Получение всех зданий
-    buildings = db.query(Building).all()
-    logger.debug(f"all buildings: {buildings}")
-
-    # Формирование таблицы в HTML формате
-    sTable = """
-        <table class="table">
-            <thead class="thead-light">
-                <tr>
-                    <th scope="col">ID</th>
-                    <th scope="col">Название</th>
-                    <th scope="col">Адрес</th>
-                    <th scope="col">Телефоны</th>
-                    <th scope="col">Деятельности</th>
-                </tr>
-            </thead>
-            <tbody>
-    """    
-    for building in buildings:
-        logger.debug(f"building: {building}")
-        # расстояние в километрах
-        d = distance(latitude, longitude, building.latitude, building.longitude)/1000
-        logger.debug(f"distance: {d}")
-        # если расстояние меньше радиуса, то добавляем в список
-        if d <= radius:
-            logger.debug(f"building: {building.id}, {building.address}, {round(d, 1)} км.")
-            organizations = get_organizations_by_building(db=db, building_id=building.id)
-            logger.debug(f"all organizations in building: {organizations}")
-            for organization in organizations:
-                logger.debug(f"organization: {organization}")
-                phoneSchemas = get_phones(db, organization.id)
-                logger.debug(f"phoneSchemas: {phoneSchemas}")
-                phones_list = ""
-                for phone in phoneSchemas:
-                    phones_list += f"{phone.phone_number}<br>"
-
-                activitySchemas = get_activities(db=db, organization_id = organization.id)
-                logger.debug(f"activitySchemas: {activitySchemas}")    
-                activities_list = ""
-                for activity in activitySchemas:
-                    activities_list += f"[{activity.level}] {activity.name}<br>"
-
-                sRow = f"""
-                    <tr>
-                        <td scope="row">{organization.id}</td>
-                        <td>{organization.name}</td>
-                        <td>{building.address} ({round(d, 1)} км.)</td>
-                        <td>{phones_list}</td>
-                        <td>{activities_list}</td>
-                    </tr>
-                """
-                sTable += sRow
-
-    # Закрытие таблицы
-    sTable += """
-            </tbody>
-        </table>
+    # Ответ из кэша (тело или 304 по ETag для текущей версии каталога)
+    cache_entry = CacheEntry(request, {"latitude": latitude, "longitude": longitude, "radius": radius, "format": output_format}, MEDIA_TYPES.get(output_format))
+    if cache_entry.response is not None:
+        return cache_entry.response
+
+    snapshot = catalog_snapshot.get(cache_entry.version)
+    if snapshot is not None:
+        # Организации в радиусе с ближайшим зданием и расстоянием до него - из снимка каталога
+        organization_ordinals, building_ordinals, building_distances = snapshot.organizations_nearby(latitude=latitude, longitude=longitude, radius=radius)
+        cards = snapshot.iter_cards(organization_ordinals, buildings=building_ordinals, distances=building_distances)
+        return cache_entry.store(stream_organizations(db=db, cards=cards, output_format=output_format))
+
+    # Здания в радиусе (отбор по пространственному индексу, точное расстояние - векторно), ближайшие - первыми
+    buildings_by_id, distances = get_buildings_nearby(db=db, latitude=latitude, longitude=longitude, radius=radius)
+
+    # Организации во всех найденных зданиях, ближайшие - первыми
+    organizations = []
+    for chunk in chunked(list(distances)):
+        organizations += get_organizations_by_buildings(db=db, building_ids=chunk)
+    organizations.sort(key=lambda organization: (distances[organization.building_id], organization.name))
+    # ближайшее найденное здание каждой организации
+    organization_buildings = {}
+    for organization in organizations:
+        organization_buildings.setdefault(organization.id, organization.building_id)
+
+    # Карточки организаций загружаются пачками, к каждой добавляются найденное здание и расстояние до него
+    def cards():
+        for card in iter_organization_cards(db=db, organization_ids=organization_buildings):
+            building = buildings_by_id[organization_buildings[card.id]]
+            card.building = BuildingSchema(id=building.id, address=building.address, latitude=building.latitude, longitude=building.longitude)
+            card.distance = distances[building.id]
+            yield card
+
+    # Возвращаем таблицу (или NDJSON) потоком
+    return cache_entry.store(stream_organizations(db=db, cards=cards(), output_format=output_format))
+
+
+# Возвращает список организаций в прямоугольной области вокруг точки -----------------------------------------------------------------------------------------------------------------------
+@router.post("/organizations/area", response_class=HTMLResponse)
+def post_organizations_in_area(
+    request: Request,
+    latitude: float = Form(...), 
+    longitude: float = Form(...), 
+    width: float = Form(...), 
+    height: float = Form(...), 
+    api_key: str = Form(...), 
+    output_format: str = Form(FORMAT_HTML, alias="format"), 
+    db: Session = Depends(get_read_db)
+) -> StreamingResponse:
+    """
+        Возвращает список организаций в прямоугольной области с центром в точке (latitude, longitude).<br>
+        latitude - широта<br>
+        longitude - долгота<br>
+        width - ширина области (по долготе) в км.<br>
+        height - высота области (по широте) в км.<br>
+        api_key - API ключ<br>
+        format - формат ответа: html (по умолчанию) или ndjson<br>
+        Ответ потоковый (строки - по мере загрузки карточек): заголовка Server-Timing нет, SQL запросы учитываются в /metrics<br>
+        db - сессия базы данных<br>
     """
-    # Возвращаем таблицу в HTML формате
-    return HTMLResponse(content=sTable)
+    logger.info(f"post_organizations_in_area() -> ...")
+    logger.debug(f"Запрос на получение организаций в прямоугольной области: latitude={latitude}, longitude={longitude}, width={width}, height={height} ...")
+
+    # Проверка API ключа
+    verify_api_key(api_key)
+
+    # Ответ из кэша (тело или 304 по ETag для текущей версии каталога)
+    cache_entry = CacheEntry(request, {"latitude": latitude, "longitude": longitude, "width": width, "height": height, "format": output_format}, MEDIA_TYPES.get(output_format))
+    if cache_entry.response is not None:
+        return cache_entry.response
+
+    # Здания внутри прямоугольника (отбор по пространственному индексу)
+    min_lat, max_lat, min_lon, max_lon = rectangle(latitude, longitude, width, height)
+    snapshot = catalog_snapshot.get(cache_entry.version)
+    if snapshot is not None:
+        # Организации во всех зданиях прямоугольника (без повторов, по названию) - из снимка каталога
+        cards = snapshot.iter_cards(snapshot.organizations_by_buildings(snapshot.buildings_in_box(min_lat, max_lat, min_lon, max_lon)))
+    else:
+        buildings = get_buildings_in_box(db=db, min_lat=min_lat, max_lat=max_lat, min_lon=min_lon, max_lon=max_lon)
+        logger.debug(f"buildings: {buildings}")
+
+        # Карточки организаций во всех найденных зданиях загружаются пачками
+        organization_ids = iter_organization_ids_by_buildings(db=db, building_ids=[building.id for building in buildings])
+        cards = iter_organization_cards(db=db, organization_ids=organization_ids)
+
+    # Возвращаем таблицу (или NDJSON) потоком
+    return cache_entry.store(stream_organizations(db=db, cards=cards, output_format=output_format))
 
 
 # Возвращает организацию по ID -----------------------------------------------------------------------------------------------------------------------
 @router.post("/organization/id", response_class=HTMLResponse)
 def post_organization_by_id(
+    request: Request,
     organization_id: int = Form(...), 
     api_key: str = Form(...), 
-    db: Session = Depends(get_db)
-) -> HTMLResponse:
+    output_format: str = Form(FORMAT_HTML, alias="format"), 
+    db: Session = Depends(get_read_db)
+) -> StreamingResponse:
     """
         Возвращает организацию по ID.<br>
         organization_id - ID организации<br>
         api_key - API ключ<br>
+        format - формат ответа: html (по умолчанию) или ndjson<br>
+        Ответ потоковый (строки - по мере загрузки карточек): заголовка Server-Timing нет, SQL запросы учитываются в /metrics<br>
         db - сессия базы данных<br>
     """
     logger.info(f"post_organization_by_id() -> ...")
     logger.debug(f"Запрос на получение организации по ID: organization_id={organization_id} ...")
     verify_api_key(api_key)
 
-    # Получение организации по ID
-    organization = get_organization(db=db, organization_id=organization_id)
-    logger.debug(f"organization: {organization}")
-
-    # Получение здания по ID организации
-    building = get_building_by_organization_id(db=db, organization_id=organization.id)
-    logger.debug(f"building: {building}")
-
-    # Получение телефонов организации
-    phones = get_phones(db, organization.id)
-    logger.debug(f"phones: {phones}")
-    phones_list = ""
-    for phone in phones:
-        phones_list += f"{phone.phone_number}<br>"
+    # Ответ из кэша (тело или 304 по ETag для текущей версии каталога)
+    cache_entry = CacheEntry(request, {"organization_id": organization_id, "format": output_format}, MEDIA_TYPES.get(output_format))
+    if cache_entry.response is not None:
+        return cache_entry.response
 
-    # Получение деятельностей организации
-    activities = get_activities(db=db, organization_id = organization.id)
-    logger.debug(f"activities: {activities}")
-    activities_list = ""
-    for activity in activities:
-        activities_list += f"[{activity.level}] {activity.name}<br>"
-
-    # Формирование таблицы в HTML формате
-    sTable = """
-        <table class="table">
-            <thead class="thead-light">
-                <tr>
-                    <th scope="col">ID</th>
-                    <th scope="col">Название</th>
-                    <th scope="col">Адрес</th>
-                    <th scope="col">Телефоны</th>
-                    <th scope="col">Деятельности</th>
-                </tr>
-            </thead>
-            <tbody>
-    """    
-
-    # Формирование строки таблицы
-    sRow = f"""
-        <tr>
-            <td scope="row">{organization.id}</td>
-            <td>{organization.name}</td>
-            <td>{building.address}</td>
-            <td>{phones_list}</td>
-            <td>{activities_list}</td>
-        </tr>
-    """
+    # Получение карточки организации по ID (из снимка каталога или из БД)
+    snapshot = catalog_snapshot.get(cache_entry.version)
+    if snapshot is not None:
+        cards = list(snapshot.iter_cards(snapshot.ordinals_of([organization_id])))
+    else:
+        cards = get_organization_cards(db=db, organization_ids=[organization_id])
+    logger.debug(f"cards: {cards}")
+    if len(cards) == 0:
+        raise HTTPException(status_code=404, detail="Организация не найдена")
 
-    sTable += sRow
-    # Закрытие таблицы
-    sTable += """
-            </tbody>
-        </table>
-    """
-    # Возвращаем таблицу в HTML формате
-    return HTMLResponse(content=sTable)
+    # Возвращаем таблицу (или NDJSON)
+    return cache_entry.store(stream_organizations(db=db, cards=cards, output_format=output_format))
 
 
 # Возвращает организации по названию деятельности ----------------------------------------------------------------------------------------------------
 @router.post("/activity/level", response_class=HTMLResponse)
 def activity_level(
+    request: Request,
     activity_id: int = Form(...), 
     api_key: str = Form(...), 
-    db: Session = Depends(get_db)
-) -> HTMLResponse:
+    output_format: str = Form(FORMAT_HTML, alias="format"), 
+    db: Session = Depends(get_read_db)
+) -> StreamingResponse:
     """
         Возвращает организацию по названию деятельности.<br>
         activity_id - ID деятельности<br>
         api_key - API ключ<br>
+        format - формат ответа: html (по умолчанию) или ndjson<br>
+        Ответ потоковый (строки - по мере загрузки карточек): заголовка Server-Timing нет, SQL запросы учитываются в /metrics<br>
         db - сессия базы данных<br>
     """
     logger.info(f"activity_level() -> ...")
     logger.debug(f"Запрос на получение организаций по названию деятельности: activity_id={activity_id} ...")
     verify_api_key(api_key)
 
-    # Получение всех деятельностей
-    all_activitys = get_activities(db=db)
-    #print(f"all_activitys: {all_activitys}")
-
-    # создаем словарь узлов
-    tree_nodes = {}
-    for item in all_activitys:
-        logger.debug(f"item: {item}")
-        # создаем узел
-        node = TreeNode(name=item.name, level=item.level, id=item.id, parent_id=item.parent_id)
-        logger.debug(f"node: {node}")
-        if node.level > 1:
-            #print("ищем родителя ...")
-            for key in tree_nodes:
-                p = tree_nodes[key]
-                #print(f"p: {p}")
-                if p.id == node.parent_id:
-                    #print("Нашли - добавляем в потомков ...")
-                    p.childrens.append(node)
-                    break
-        # добавляем в словарь узлов
-        tree_nodes[node.id] = node
-
-    logger.debug(f"Вывод словаря tree_nodes:")
-    logger.debug(f"{tree_nodes}")
-
-    logger.debug(f"Получить всех потомков узла [{tree_nodes[activity_id].name}]:")
-    aActivity_List = get_childrens(tree_nodes[activity_id])
-    logger.debug(aActivity_List)
-
-    # Формирование таблицы в HTML формате
-    sTable = """
-        <table class="table">
-            <thead class="thead-light">
-                <tr>
-                    <th scope="col">ID</th>
-                    <th scope="col">Название</th>
-                    <th scope="col">Адрес</th>
-                    <th scope="col">Телефоны</th>
-                    <th scope="col">Деятельности</th>
-                </tr>
-            </thead>
-            <tbody>
-    """    
-    organizations = []
-    for items in aActivity_List:
-        logger.debug(f"items: {items}")
-        orgs = get_organizations_by_activity(db=db, activity_id=items.id)
-        organizations += orgs
-    logger.debug(f"-1- organizations: {organizations}")
-
-
-    seen = set()
-    unique_organizations = []
-    for org in organizations:
-        logger.debug(f"org: {org}")
-        if org.id not in seen:
-            seen.add(org.id)
-            unique_organizations.append(org)
-    logger.debug(f"-2- unique_organizations: {unique_organizations}")
-
-    for org in unique_organizations:
-        logger.debug(f"org: {org}")
-        building = get_building_by_organization_id(db=db, organization_id=org.id)
-        logger.debug(f"BuildingSchema: {building}")
-
-        phones = get_phones(db, org.id)
-        logger.debug(f"phones: {phones}")
-        phones_list = ""
-        for phone in phones:
-            phones_list += f"{phone.phone_number}<br>"
-
-        activities = get_activities(db=db, organization_id = org.id)
-        logger.debug(f"activitySchemas: {activities}")    
-        activities_list = ""
-        for activity in activities:
-            activities_list += f"[{activity.level}] {activity.name}<br>"
-
-        sRow = f"""
-            <tr>
-                <td scope="row">{org.id}</td>
-                <td>{org.name}</td>
-                <td>{building.address}</td>
-                <td>{phones_list}</td>
-                <td>{activities_list}</td>
-            </tr>
-        """
-        sTable += sRow
-
-    # Закрытие таблицы
-    sTable += """
-            </tbody>
-        </table>
-    """
-    # Возвращаем таблицу в HTML формате
-    return HTMLResponse(content=sTable)
+    # Ответ из кэша (тело или 304 по ETag для текущей версии каталога)
+    cache_entry = CacheEntry(request, {"activity_id": activity_id, "format": output_format}, MEDIA_TYPES.get(output_format))
+    if cache_entry.response is not None:
+        return cache_entry.response
+
+    # Проверка существования деятельности по кэшированному дереву
+    tree = activity_tree.get(db)
+    if activity_id not in tree:
+        raise HTTPException(status_code=404, detail="Деятельность не найдена")
+    logger.debug(f"path: {tree.path(activity_id)}")
+
+    snapshot = catalog_snapshot.get(cache_entry.version)
+    if snapshot is not None:
+        # Организации с деятельностью activity_id и всеми вложенными (поддерево - по кэшированному дереву) - из снимка каталога
+        activity_ids = [node.id for node in tree.descendants(activity_id)]
+        cards = snapshot.iter_cards(snapshot.organizations_by_activities(snapshot.activity_ordinals_of(activity_ids)))
+    else:
+        # Организации с деятельностью activity_id и всеми вложенными - одним запросом по activity_closure,
+        # ID читаются серверным курсором, карточки загружаются пачками
+        organization_ids = iter_organization_ids(db, repository.SELECT_ORGANIZATIONS_BY_ACTIVITY_TREE, {"activity_id": activity_id})
+        cards = iter_organization_cards(db=db, organization_ids=organization_ids)
+
+    # Возвращаем таблицу (или NDJSON) потоком
+    return cache_entry.store(stream_organizations(db=db, cards=cards, output_format=output_format))
 
 
 # Возвращает организации по названию -----------------------------------------------------------------------------------------------------------------------
 @router.post("/organizations/search_by_name", response_class=HTMLResponse)
 def search_organizations_by_name(
+    request: Request,
     name: str = Form(...), 
     api_key: str = Form(...), 
-    db: Session = Depends(get_db)
-) -> HTMLResponse:
+    limit: int = Form(DEFAULT_SEARCH_LIMIT), 
+    offset: int = Form(0), 
+    output_format: str = Form(FORMAT_HTML, alias="format"), 
+    db: Session = Depends(get_read_db)
+) -> StreamingResponse:
     """
-        Возвращает организации по названию (можно кратко).<br>
+        Возвращает организации по названию (можно кратко - по началу слов), наиболее подходящие - первыми.<br>
         name - название организации<br>
         api_key - API ключ<br>
+        limit - размер страницы (не более MAX_SEARCH_LIMIT)<br>
+        offset - смещение страницы<br>
+        format - формат ответа: html (по умолчанию) или ndjson<br>
+        Ответ потоковый (строки - по мере загрузки карточек): заголовка Server-Timing нет, SQL запросы учитываются в /metrics<br>
         db - сессия базы данных<br>
     """
     logger.info(f"search_organizations_by_name() -> ...")
     logger.debug(f"Запрос на получение организаций по названию: name={name} ...")
     verify_api_key(api_key)
 
-    organizations = get_organizations_by_name(db=db, name=name)
+    # Ответ из кэша (тело или 304 по ETag для текущей версии каталога)
+    cache_entry = CacheEntry(request, {"name": name, "limit": limit, "offset": offset, "format": output_format}, MEDIA_TYPES.get(output_format))
+    if cache_entry.response is not None:
+        return cache_entry.response
+
+    organizations = get_organizations_by_name(db=db, name=name, limit=limit, offset=offset)
     logger.debug(f"organizations: {organizations}")
 
-    # Формирование таблицы в HTML формате
-    sTable = """
-        <table class="table">
-            <thead class="thead-light">
-                <tr>
-                    <th scope="col">ID</th>
-                    <th scope="col">Название</th>
-                    <th scope="col">Адрес</th>
-                    <th scope="col">Телефоны</th>
-                    <th scope="col">Деятельности</th>
-                </tr>
-            </thead>
-            <tbody>
-    """    
-    for organization in organizations:
-        building = get_building_by_organization_id(db=db, organization_id=organization.id)
-        logger.debug(f"BuildingSchema: {building}")
-
-        activities = get_activities(db=db, organization_id = organization.id)
-        logger.debug(f"activitySchemas: {activities}")    
-        activities_list = ""
-        for activity in activities:
-            activities_list += f"[{activity.level}] {activity.name}<br>"
-
-        phones = get_phones(db, organization.id)
-        logger.debug(f"phones: {phones}")
-        phones_list = ""
-        for phone in phones:
-            phones_list += f"{phone.phone_number}<br>"
-
-        sRow = f"""
-            <tr>
-                <td scope="row">{organization.id}</td>
-                <td>{organization.name}</td>
-                <td>{building.address}</td>
-                <td>{phones_list}</td>
-                <td>{activities_list}</td>
-            </tr>
-        """
-        sTable += sRow
-
-    # Закрытие таблицы
-    sTable += """
-            </tbody>
-        </table>
-    """
-    return HTMLResponse(content=sTable)
+    # Пакетная загрузка карточек организаций (поиск и ранжирование - полнотекстовым индексом БД, карточки - из снимка каталога, если он есть)
+    snapshot = catalog_snapshot.get(cache_entry.version)
+    if snapshot is not None:
+        cards = snapshot.iter_cards(snapshot.ordinals_of(organization.id for organization in organizations))
+    else:
+        cards = iter_organization_cards(db=db, organization_ids=[organization.id for organization in organizations])
+
+    return cache_entry.store(stream_organizations(db=db, cards=cards, output_format=output_format))
 
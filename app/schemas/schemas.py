@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional, List
+from typing import Any, Dict, Optional, List
 
 
 # Схема для зданий -----------------------------------------------
@@ -42,4 +42,88 @@ class OrganizationSchema(BaseModel):
 
 
 
+class OrganizationCardSchema(BaseModel):
+    id: int
+    name: str
+    building: Optional[BuildingSchema] = None
+    phones: List[str] = []
+    activities: List[ActivitySchema] = []
+    distance: Optional[float] = None  # расстояние до точки поиска в км. (для поиска по радиусу)
+    class Config:
+        orm_mode = True
+
+
+class OrganizationPageSchema(BaseModel):
+    items: List[OrganizationCardSchema] = []
+    next_cursor: Optional[str] = None  # курсор следующей страницы (None - страница последняя)
+
+
+# Счетчики организаций выдачи по деятельностям и зданиям (для фильтров в интерфейсе) -----------------------------------------------
+class ActivityFacetSchema(BaseModel):
+    id: int
+    name: str
+    level: Optional[int] = None
+    parent_id: Optional[int] = None
+    count: int  # организации выдачи с этой деятельностью или вложенной в нее
+
+
+class BuildingFacetSchema(BaseModel):
+    id: int
+    address: Optional[str] = None
+    count: int  # организации выдачи в здании (при поиске по радиусу - только здания в радиусе)
+
+
+class FacetsSchema(BaseModel):
+    total: int = 0  # организаций в выдаче
+    complete: bool = True  # False - время на подсчет исчерпано, счетчики только по части выдачи
+    activities: List[ActivityFacetSchema] = []
+    buildings: List[BuildingFacetSchema] = []
+
+
+class OrganizationFacetPageSchema(OrganizationPageSchema):
+    facets: FacetsSchema = FacetsSchema()
+
+
+# Пакетная запись в каталог (одна транзакция на пакет) -----------------------------------------------
+class ActivityWriteSchema(BaseModel):
+    id: Optional[int] = None  # None - новая деятельность, иначе создание или изменение с этим ID
+    name: Optional[str] = None  # обязательно для новой; не передано - не меняется
+    parent_id: Optional[int] = None  # не передано у существующей - не меняется (уровень вычисляется по родителю)
+
+
+class OrganizationWriteSchema(BaseModel):
+    id: Optional[int] = None  # None - новая организация, иначе создание или изменение с этим ID
+    name: Optional[str] = None  # обязательно для новой; не передано - не меняется
+    phones: Optional[List[str]] = None  # полный список телефонов (None - не меняется)
+    building_ids: Optional[List[int]] = None  # полный список зданий (None - не меняется)
+    activity_ids: Optional[List[int]] = None  # полный список деятельностей (None - не меняется)
+
+
+class BatchWriteSchema(BaseModel):
+    activities: List[ActivityWriteSchema] = []  # записываются первыми: на них могут ссылаться организации пакета
+    organizations: List[OrganizationWriteSchema] = []
+
+
+class BatchResultSchema(BaseModel):
+    activities: List[ActivitySchema] = []  # в порядке пакета, с вычисленным уровнем
+    organizations: List[int] = []  # ID в порядке пакета
+    version: int = 0  # версия каталога после записи (0 - кэш ответов выключен)
+
+
+# Журнал изменений каталога для синхронизации клиентов -----------------------------------------------
+class ChangeEventSchema(BaseModel):
+    seq: int  # номер изменения
+    op: str  # upsert / delete
+    entity: str  # organization / building / activity / phone / building_organization / organization_activity
+    id: int  # ID строки (у связей - organization_id)
+    ref_id: Optional[int] = None  # у связей - building_id / activity_id
+    data: Optional[Dict[str, Any]] = None  # upsert: текущие значения колонок строки (у связей нет)
+
+
+class ChangePageSchema(BaseModel):
+    events: List[ChangeEventSchema] = []  # по возрастанию seq, по одному (последнему) событию на строку
+    next_cursor: str  # since следующего запроса
+    has_more: bool = False  # есть следующая страница
+
+
 # Если у вас есть другие схемы, добавьте их здесь
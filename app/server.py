@@ -0,0 +1,127 @@
+import gc
+import logging
+import time
+from typing import Dict, List
+from sqlalchemy import Select
+from app.database.database import ReadSessionLocal, async_engine, engine, has_table, read_engine
+
+# Создание логгера
+logger = logging.getLogger(__name__)
+
+
+# Прогрев неизменяемых структур в главном процессе до запуска воркеров (общие страницы памяти после fork) ----------------------------------
+def warmup():
+    """
+        Загружает то, что иначе каждый воркер загрузил бы сам при первых запросах:<br>
+        дерево деятельностей, модуль расстояний (numpy), шаблон главной страницы,
+        скомпилированные запросы app.services.repository (кэш SQLAlchemy движков), наличие служебных таблиц.<br>
+        Координаты зданий (R*Tree) и индекс названий (FTS5) хранятся в SQLite - их страницы и так общие (кэш ОС, mmap),
+        снимок каталога (SNAPSHOT_PATH) строится, если его нет или он устарел, и отображается в память до fork.<br>
+        В конце соединения закрываются (воркеры не должны использовать соединения главного процесса),
+        а созданные объекты переносятся в постоянное поколение сборщика мусора (gc.freeze):
+        сборка мусора в воркерах не записывает в их страницы и не копирует их.
+    """
+    logger.info(f"warmup() -> ...")
+    start = time.perf_counter()
+    from app.geo.engine import GeoIndex  # noqa: F401 (numpy)
+    from app.routes.router import templates
+    from app.services import repository
+    from app.services.activity_tree import activity_tree
+    from app.services.changes import current_catalog_version
+    from app.services.snapshot import catalog_snapshot
+
+    templates.get_template("index.html")
+    statements = [value for name, value in vars(repository).items() if name.startswith(("SELECT_", "SUBQUERY_")) and isinstance(value, Select)]
+    with ReadSessionLocal() as db:
+        activity_tree.get(db)
+        for name in ("buildings_rtree", "organizations_fts", "organization_cards"):
+            has_table(db, name)
+        for bind in {engine, read_engine}:
+            with bind.connect() as conn:
+                for statement in statements:
+                    # выполнение с пустыми значениями параметров (строк не находит, но заполняет кэш компиляции)
+                    params = {param.key: [0] if param.expanding else 0 for param in statement.compile().binds.values() if param.required}
+                    try:
+                        conn.execute(statement, params).all()
+                    except Exception as e:
+                        # таблица только для SQLite (organization_cards) в другой БД
+                        logger.debug(f"warmup() -> запрос не выполнен: {e}")
+                        conn.rollback()
+
+    # снимок строится заново, если его нет или он построен по другой версии каталога
+    if catalog_snapshot.enabled and catalog_snapshot.get(current_catalog_version()) is None:
+        catalog_snapshot.rebuild()
+        catalog_snapshot.get()
+
+    dispose_engines()
+    gc.collect()
+    gc.freeze()
+    logger.info(f"warmup() -> {len(statements)} запросов, {gc.get_freeze_count()} объектов в постоянном поколении, {time.perf_counter() - start:.2f} сек.")
+
+
+# Несколько воркеров: кэши процессов согласуются только через версию каталога в БД ------------------------------------------------------------
+def check_shared_version(workers: int):
+    """
+        Кэш ответов в памяти и дерево деятельностей у каждого воркера свои: запись в одном воркере видна остальным
+        по версии каталога - концу журнала изменений (app.services.changes). Без журнала или без его триггеров
+        (SCHEMA_CHECK=create) остальные воркеры отдавали бы устаревшие ответы, поэтому запуск прерывается (RuntimeError).
+    """
+    if workers <= 1:
+        return
+    from app.services.changes import current_catalog_version
+    from app.settings import get_settings
+    if get_settings().schema_check == "create":
+        raise RuntimeError(f"SCHEMA_CHECK=create не создает триггеры журнала изменений: при {workers} воркерах нужны миграции (alembic upgrade head) или WEB_CONCURRENCY=1")
+    if current_catalog_version() is None:
+        raise RuntimeError(f"В БД нет журнала изменений: при {workers} воркерах нужны миграции (alembic upgrade head) или WEB_CONCURRENCY=1")
+
+
+# Соединения пулов не переходят через fork ----------------------------------------------------------------------------------------------------
+def dispose_engines(close: bool = True):
+    """
+        close=False - в дочернем процессе после fork: соединения главного процесса не закрываются
+        (их сокеты/файлы общие с родителем), а просто забываются пулом.
+    """
+    for bind in {engine, read_engine, async_engine.sync_engine}:
+        bind.dispose(close=close)
+
+
+# Память процесса по /proc/<pid>/smaps_rollup (Linux): байты -----------------------------------------------------------------------------------
+def process_memory(pid: int) -> Dict[str, int]:
+    """
+        rss - резидентная память,<br>
+        pss - доля процесса (общие страницы делятся поровну между процессами, которые их используют),<br>
+        shared - общие с другими процессами страницы, private - только страницы процесса.<br>
+        Сумма pss воркеров меньше суммы rss настолько, насколько память общая (прогрев до fork).
+    """
+    values = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                values[parts[0].rstrip(":")] = int(parts[1]) * 1024
+    return {
+        "rss": values.get("Rss", 0),
+        "pss": values.get("Pss", 0),
+        "shared": values.get("Shared_Clean", 0) + values.get("Shared_Dirty", 0),
+        "private": values.get("Private_Clean", 0) + values.get("Private_Dirty", 0),
+    }
+
+
+# Дочерние процессы (воркеры gunicorn) ---------------------------------------------------------------------------------------------------------
+def child_pids(pid: int) -> List[int]:
+    with open(f"/proc/{pid}/task/{pid}/children") as f:
+        return [int(child) for child in f.read().split()]
+
+
+# Память главного процесса и воркеров: [(pid, роль, память)] --------------------------------------------------------------------------------
+def workers_memory(master_pid: int) -> List[tuple]:
+    report = [(master_pid, "master", process_memory(master_pid))]
+    for pid in child_pids(master_pid):
+        try:
+            report.append((pid, "worker", process_memory(pid)))
+        except FileNotFoundError:
+            # воркер завершился между чтением списка и памяти
+            continue
+    return report
+
@@ -0,0 +1,131 @@
+import logging
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+from sqlalchemy.orm import Session
+from app.services import repository
+from app.services.changes import activities_version
+
+# Создание логгера
+logger = logging.getLogger(__name__)
+
+
+# Узел дерева деятельностей ---------------------------------------------------------------------------------------------------------------
+class ActivityNode:
+    __slots__ = ("id", "name", "level", "parent_id", "children")
+
+    def __init__(self, id: int, name: str, level: Optional[int] = None, parent_id: Optional[int] = None):
+        self.id = id
+        self.name = name
+        self.level = level
+        self.parent_id = parent_id
+        self.children: List["ActivityNode"] = []
+
+    def __repr__(self):
+        return f"<ActivityNode(id={self.id}, name={self.name}, level={self.level}, parent_id={self.parent_id})>"
+
+
+# Дерево деятельностей с индексами по id и parent_id --------------------------------------------------------------------------------------
+class ActivityTree:
+    """
+        Неизменяемое после построения дерево деятельностей.<br>
+        Построение - O(n), поиск узла - O(1), потомки - O(размер поддерева), предки и путь - O(глубина).
+    """
+
+    def __init__(self, rows: Iterable):
+        self.nodes: Dict[int, ActivityNode] = {}
+        for row in rows:
+            self.nodes[row.id] = ActivityNode(id=row.id, name=row.name, level=row.level, parent_id=row.parent_id)
+        self.roots: List[ActivityNode] = []
+        for node in self.nodes.values():
+            parent = self.nodes.get(node.parent_id) if node.parent_id is not None else None
+            if parent is None:
+                self.roots.append(node)
+            else:
+                parent.children.append(node)
+
+    def __contains__(self, activity_id: int) -> bool:
+        return activity_id in self.nodes
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def get(self, activity_id: int) -> Optional[ActivityNode]:
+        return self.nodes.get(activity_id)
+
+    # узел и все его потомки (обход в глубину без рекурсии)
+    def descendants(self, activity_id: int) -> List[ActivityNode]:
+        node = self.nodes.get(activity_id)
+        if node is None:
+            return []
+        result = []
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            result.append(node)
+            stack.extend(reversed(node.children))
+        return result
+
+    # предки узла - от родителя до корня
+    def ancestors(self, activity_id: int) -> List[ActivityNode]:
+        result = []
+        node = self.nodes.get(activity_id)
+        while node is not None and node.parent_id is not None:
+            node = self.nodes.get(node.parent_id)
+            if node is not None:
+                result.append(node)
+        return result
+
+    # путь от корня до узла включительно
+    def path(self, activity_id: int) -> List[ActivityNode]:
+        node = self.nodes.get(activity_id)
+        if node is None:
+            return []
+        return list(reversed(self.ancestors(activity_id))) + [node]
+
+    # все узлы в порядке get_activities(): по уровню, затем по родителю
+    def as_list(self) -> List[ActivityNode]:
+        return sorted(
+            self.nodes.values(),
+            key=lambda node: (node.level is not None, node.level or 0, node.parent_id is not None, node.parent_id or 0)
+        )
+
+
+# Кэш дерева деятельностей на процесс ----------------------------------------------------------------------------------------------------
+class ActivityTreeService:
+    """
+        Дерево загружается из БД один раз и переиспользуется всеми запросами.<br>
+        Вместе с деревом хранится версия деятельностей (app.services.changes.activities_version), по которой оно
+        построено: каждое обращение сверяет ее с БД, и дерево перечитывается после записи деятельностей в любом процессе.
+        Запись в этом процессе сбрасывает дерево сразу (catalog_changed).<br>
+        Дерево не изменяется после построения: новое подменяет ссылку целиком, поэтому читатели из пула потоков FastAPI
+        не требуют блокировки. Блокировка нужна только для загрузки и сброса.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # (версия деятельностей, дерево) - читается и подменяется одной ссылкой
+        self._state: Optional[Tuple[Optional[int], ActivityTree]] = None
+
+    # текущее дерево (загружается из БД при первом обращении, после сброса или после записи деятельностей)
+    def get(self, db: Session) -> ActivityTree:
+        # версия читается до строк: дерево не старше сохраненной с ним версии
+        version = activities_version(db)
+        state = self._state
+        if state is not None and state[0] == version:
+            return state[1]
+        with self._lock:
+            if self._state is None or self._state[0] != version:
+                logger.info(f"ActivityTreeService: загрузка дерева деятельностей (версия {version}) ...")
+                rows = repository.fetch_all(db, repository.SELECT_ACTIVITY_ROWS)
+                self._state = (version, ActivityTree(rows))
+                logger.info(f"ActivityTreeService: загружено {len(self._state[1])} деятельностей")
+            return self._state[1]
+
+    # сброс кэша - дерево будет перечитано при следующем обращении
+    def invalidate(self):
+        with self._lock:
+            self._state = None
+
+
+# Единственный экземпляр на процесс
+activity_tree = ActivityTreeService()
@@ -0,0 +1,280 @@
+import logging
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+from sqlalchemy import Table, and_, bindparam, delete, insert, select, text, update
+from sqlalchemy.orm import Session
+from app.schemas.schemas import ActivityWriteSchema, BatchWriteSchema, OrganizationWriteSchema
+from app.services.repository import (
+    activities, activity_closure, building_organization, buildings, connection_of, fetch_all, organization_activity, organizations, phones
+)
+
+# Создание логгера
+logger = logging.getLogger(__name__)
+
+# Наибольший уровень вложенности деятельностей (уровень корневой - 1)
+MAX_ACTIVITY_LEVEL = 3
+# Наибольшее число деятельностей и организаций в одном пакете (каждого списка)
+MAX_BATCH_SIZE = 5000
+
+# Деятельности и все их потомки по parent_id (UNION - без повторов, поэтому и при цикле в parent_id запрос конечен)
+SELECT_ACTIVITY_SUBTREES = text("""
+    WITH RECURSIVE subtree (id) AS (
+        SELECT id FROM activities WHERE id IN :activity_ids
+        UNION
+        SELECT a.id FROM activities a JOIN subtree s ON a.parent_id = s.id
+    )
+    SELECT a.id, a.parent_id, a.level
+    FROM activities a
+    JOIN subtree s ON s.id = a.id
+""").bindparams(bindparam("activity_ids", expanding=True))
+
+# Предки деятельностей по таблице замыкания (вместе с самой деятельностью, depth = 0)
+SELECT_ACTIVITY_ANCESTORS = (
+    select(activity_closure.c.descendant_id, activity_closure.c.ancestor_id, activity_closure.c.depth)
+    .where(activity_closure.c.descendant_id.in_(bindparam("activity_ids", expanding=True)))
+)
+
+# Изменения по ID (executemany: параметр b_id - ID строки)
+UPDATE_ACTIVITY_NAME = update(activities).where(activities.c.id == bindparam("b_id")).values(name=bindparam("name"))
+UPDATE_ACTIVITY_PARENT = update(activities).where(activities.c.id == bindparam("b_id")).values(parent_id=bindparam("parent_id"))
+UPDATE_ACTIVITY_LEVEL = update(activities).where(activities.c.id == bindparam("b_id")).values(level=bindparam("level"))
+UPDATE_ORGANIZATION_NAME = update(organizations).where(organizations.c.id == bindparam("b_id")).values(name=bindparam("name"))
+DELETE_BUILDING_LINK = delete(building_organization).where(and_(
+    building_organization.c.building_id == bindparam("building_id"),
+    building_organization.c.organization_id == bindparam("organization_id")
+))
+DELETE_ACTIVITY_LINK = delete(organization_activity).where(and_(
+    organization_activity.c.activity_id == bindparam("activity_id"),
+    organization_activity.c.organization_id == bindparam("organization_id")
+))
+
+
+# ID из списка, которые уже есть в таблице ----------------------------------------------------------------------------------------------
+def existing_ids(db: Session, table: Table, ids: Iterable[int]) -> Set[int]:
+    ids = list(set(ids))
+    if not ids:
+        return set()
+    return {row[0] for row in fetch_all(db, select(table.c.id).where(table.c.id.in_(ids)))}
+
+
+# Явные ID элементов пакета (повтор ID в пакете - ошибка) -----------------------------------------------------------------------------------
+def explicit_ids(items: List, what: str) -> List[int]:
+    ids = [item.id for item in items if item.id is not None]
+    if len(ids) != len(set(ids)):
+        repeated = sorted({id for id in ids if ids.count(id) > 1})
+        raise ValueError(f"ID {what} повторяются в пакете: {repeated}")
+    return ids
+
+
+# Название: без пробелов по краям, непустое -----------------------------------------------------------------------------------------------
+def clean_name(name: Optional[str], what: str) -> Optional[str]:
+    if name is None:
+        return None
+    name = name.strip()
+    if not name:
+        raise ValueError(f"Пустое название {what}")
+    return name
+
+
+# Вставка строк: явные ID - одним executemany, без ID - executemany с RETURNING (ID в порядке строк) ------------------------------------------------
+def insert_rows(db: Session, table: Table, rows: List[Dict]) -> List[int]:
+    conn = connection_of(db)
+    explicit = [row for row in rows if row.get("id") is not None]
+    generated = [{name: value for name, value in row.items() if name != "id"} for row in rows if row.get("id") is None]
+    if explicit:
+        conn.execute(insert(table), explicit)
+        if conn.dialect.name == "postgresql":
+            # ID заданы явно - последовательность сдвигается за максимальный ID (как после загрузки каталога)
+            conn.exec_driver_sql(f"SELECT setval(pg_get_serial_sequence('{table.name}', 'id'), COALESCE(MAX(id), 1)) FROM {table.name}")
+    ids = iter(conn.execute(insert(table).returning(table.c.id, sort_by_parameter_order=True), generated).scalars().all() if generated else [])
+    return [row["id"] if row.get("id") is not None else next(ids) for row in rows]
+
+
+# Запись деятельностей пакета: создание и изменение, уровни и таблица замыкания - одним проходом ----------------------------------------------------
+def write_activities(db: Session, items: List[ActivityWriteSchema]) -> List[int]:
+    """
+        Возвращает ID деятельностей в порядке items. Выполняется в транзакции вызывающего кода (без commit).<br>
+        Новые деятельности вставляются без родителя, затем родители всех деятельностей пакета задаются одним
+        executemany - родителем может быть деятельность того же пакета, в любом порядке.
+        Уровни и activity_closure пересчитываются для деятельностей, у которых появился или изменился родитель,
+        и всех их потомков (update_activity_tree).
+    """
+    logger.info(f"write_activities() -> ...")
+    found = existing_ids(db, activities, explicit_ids(items, "деятельностей"))
+    conn = connection_of(db)
+
+    new_rows = []
+    renamed = []
+    for item in items:
+        name = clean_name(item.name, "деятельности")
+        if item.id is None or item.id not in found:
+            if name is None:
+                raise ValueError(f"Не задано название новой деятельности (id={item.id})")
+            new_rows.append({"id": item.id, "name": name, "parent_id": None})
+        elif name is not None:
+            renamed.append({"b_id": item.id, "name": name})
+    new_ids = iter(insert_rows(db, activities, new_rows))
+    ids = [next(new_ids) if item.id is None or item.id not in found else item.id for item in items]
+
+    if renamed:
+        conn.execute(UPDATE_ACTIVITY_NAME, renamed)
+    # родитель задается у новых и у существующих, для которых parent_id передан явно
+    moved = [
+        {"b_id": id, "parent_id": item.parent_id}
+        for id, item in zip(ids, items)
+        if item.id is None or item.id not in found or "parent_id" in item.model_fields_set
+    ]
+    if moved:
+        conn.execute(UPDATE_ACTIVITY_PARENT, moved)
+        update_activity_tree(db, [row["b_id"] for row in moved])
+    logger.debug(f"activities: новых {len(new_rows)}, переименовано {len(renamed)}, с новым родителем {len(moved)}")
+    return ids
+
+
+# Уровни и пары activity_closure деятельностей и всех их потомков по parent_id -----------------------------------------------------------------
+def update_activity_tree(db: Session, activity_ids: List[int]):
+    """
+        Поддеревья читаются одним запросом, предки их корней (деятельностей вне поддеревьев) - из activity_closure,
+        уровни и предки считаются спуском от корней (уровень - число предков вместе с самой деятельностью).<br>
+        Проверки - для всего набора сразу: родитель существует, нет циклов, уровень не больше MAX_ACTIVITY_LEVEL.
+        Изменившиеся уровни записываются одним executemany, пары activity_closure поддеревьев - заменяются.
+    """
+    logger.info(f"update_activity_tree() -> ...")
+    rows = fetch_all(db, SELECT_ACTIVITY_SUBTREES, {"activity_ids": activity_ids})
+    nodes = {row.id: row for row in rows}
+    children: Dict[int, List[int]] = {}
+    for row in rows:
+        children.setdefault(row.parent_id, []).append(row.id)
+
+    # предки родителей вне поддеревьев (их пары не меняются)
+    outside = {row.parent_id for row in rows if row.parent_id is not None and row.parent_id not in nodes}
+    ancestors: Dict[int, List[Tuple[int, int]]] = {}
+    if outside:
+        for rec in fetch_all(db, SELECT_ACTIVITY_ANCESTORS, {"activity_ids": list(outside)}):
+            ancestors.setdefault(rec.descendant_id, []).append((rec.ancestor_id, rec.depth))
+    missing = sorted(outside - ancestors.keys())
+    if missing:
+        raise ValueError(f"Нет деятельностей-родителей: {missing}")
+
+    # спуск от корней поддеревьев: предки деятельности - она сама и предки родителя на единицу дальше
+    stack = [row.id for row in rows if row.parent_id is None or row.parent_id not in nodes]
+    while stack:
+        id = stack.pop()
+        ancestors[id] = [(id, 0)] + [(ancestor, depth + 1) for ancestor, depth in ancestors.get(nodes[id].parent_id, [])]
+        stack.extend(children.get(id, []))
+    cyclic = sorted(nodes.keys() - ancestors.keys())
+    if cyclic:
+        raise ValueError(f"Цикл в дереве деятельностей: {cyclic}")
+    too_deep = sorted(id for id in nodes if len(ancestors[id]) > MAX_ACTIVITY_LEVEL)
+    if too_deep:
+        raise ValueError(f"ERROR: Уровень вложенности деятельности не должен превышать {MAX_ACTIVITY_LEVEL}! ID: {too_deep}")
+
+    conn = connection_of(db)
+    levels = [{"b_id": id, "level": len(ancestors[id])} for id, row in nodes.items() if row.level != len(ancestors[id])]
+    if levels:
+        conn.execute(UPDATE_ACTIVITY_LEVEL, levels)
+    conn.execute(
+        delete(activity_closure).where(activity_closure.c.descendant_id.in_(bindparam("activity_ids", expanding=True))),
+        {"activity_ids": list(nodes)}
+    )
+    conn.execute(
+        insert(activity_closure),
+        [{"ancestor_id": ancestor, "descendant_id": id, "depth": depth} for id in nodes for ancestor, depth in ancestors[id]]
+    )
+    logger.debug(f"update_activity_tree() -> {len(nodes)} деятельностей, изменено уровней {len(levels)}")
+
+
+# Запись организаций пакета: создание и изменение, телефоны и связи со зданиями и деятельностями -----------------------------------------------
+def write_organizations(db: Session, items: List[OrganizationWriteSchema]) -> List[int]:
+    """
+        Возвращает ID организаций в порядке items. Выполняется в транзакции вызывающего кода (без commit).<br>
+        Ссылки на здания и деятельности проверяются для всего пакета двумя запросами.
+        Списки phones, building_ids, activity_ids заменяют текущие; записываются только отличия
+        (телефоны - целиком, если список или его порядок изменился), чтобы триггеры производных
+        таблиц не срабатывали на неизмененные строки.
+    """
+    logger.info(f"write_organizations() -> ...")
+    found = existing_ids(db, organizations, explicit_ids(items, "организаций"))
+    for ids, table, what in (
+        ({id for item in items for id in item.building_ids or []}, buildings, "зданий"),
+        ({id for item in items for id in item.activity_ids or []}, activities, "деятельностей")
+    ):
+        missing = sorted(ids - existing_ids(db, table, ids))
+        if missing:
+            raise ValueError(f"Нет {what}: {missing}")
+
+    new_rows = []
+    renamed = []
+    for item in items:
+        name = clean_name(item.name, "организации")
+        if item.id is None or item.id not in found:
+            if name is None:
+                raise ValueError(f"Не задано название новой организации (id={item.id})")
+            new_rows.append({"id": item.id, "name": name})
+        elif name is not None:
+            renamed.append({"b_id": item.id, "name": name})
+    new_ids = iter(insert_rows(db, organizations, new_rows))
+    ids = [next(new_ids) if item.id is None or item.id not in found else item.id for item in items]
+    conn = connection_of(db)
+    if renamed:
+        conn.execute(UPDATE_ORGANIZATION_NAME, renamed)
+
+    # телефоны: список без пустых и повторов в порядке пакета
+    wanted = {
+        id: list(dict.fromkeys(phone.strip() for phone in item.phones if phone and phone.strip()))
+        for id, item in zip(ids, items) if item.phones is not None
+    }
+    if wanted:
+        current: Dict[int, List[str]] = {id: [] for id in wanted}
+        for rec in fetch_all(
+            db,
+            select(phones.c.organization_id, phones.c.phone_number)
+            .where(phones.c.organization_id.in_(list(wanted)))
+            .order_by(phones.c.organization_id, phones.c.id)
+        ):
+            current[rec.organization_id].append(rec.phone_number)
+        changed = [id for id in wanted if wanted[id] != current[id]]
+        if changed:
+            conn.execute(delete(phones).where(phones.c.organization_id.in_(changed)))
+            rows = [{"organization_id": id, "phone_number": phone} for id in changed for phone in wanted[id]]
+            if rows:
+                conn.execute(insert(phones), rows)
+
+    replace_links(db, building_organization, building_organization.c.building_id, DELETE_BUILDING_LINK,
+                  {id: item.building_ids for id, item in zip(ids, items) if item.building_ids is not None})
+    replace_links(db, organization_activity, organization_activity.c.activity_id, DELETE_ACTIVITY_LINK,
+                  {id: item.activity_ids for id, item in zip(ids, items) if item.activity_ids is not None})
+    logger.debug(f"organizations: новых {len(new_rows)}, переименовано {len(renamed)}, телефоны {len(wanted)}")
+    return ids
+
+
+# Замена связей организаций (organization_id -> полный список ID): удаляются лишние, вставляются недостающие ---------------------------------------
+def replace_links(db: Session, table: Table, column, delete_statement, wanted: Dict[int, List[int]]):
+    if not wanted:
+        return
+    current = {
+        (rec[0], rec[1])
+        for rec in fetch_all(db, select(table.c.organization_id, column).where(table.c.organization_id.in_(list(wanted))))
+    }
+    wanted_pairs = {(organization_id, id) for organization_id, ids in wanted.items() for id in ids}
+    conn = connection_of(db)
+    removed = [{"organization_id": organization_id, column.name: id} for organization_id, id in current - wanted_pairs]
+    added = [{"organization_id": organization_id, column.name: id} for organization_id, id in wanted_pairs - current]
+    if removed:
+        conn.execute(delete_statement, removed)
+    if added:
+        conn.execute(insert(table), added)
+
+
+# Запись пакета: деятельности, затем организации (в транзакции вызывающего кода, commit - один на пакет) ------------------------------------------
+def write_batch(db: Session, batch: BatchWriteSchema) -> Tuple[List[int], List[int]]:
+    """
+        Возвращает (ID деятельностей, ID организаций) в порядке пакета.<br>
+        ValueError - пакет некорректен (вызывающий код откатывает транзакцию: не записывается ничего).
+    """
+    logger.info(f"write_batch() -> ...")
+    for name, items in (("activities", batch.activities), ("organizations", batch.organizations)):
+        if len(items) > MAX_BATCH_SIZE:
+            raise ValueError(f"{name}: не более {MAX_BATCH_SIZE} элементов в пакете")
+    activity_ids = write_activities(db, batch.activities) if batch.activities else []
+    organization_ids = write_organizations(db, batch.organizations) if batch.organizations else []
+    return activity_ids, organization_ids
@@ -0,0 +1,148 @@
+import logging
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+# Создание логгера
+logger = logging.getLogger(__name__)
+
+# Плотный контейнер (биты) выгоднее массива номеров (uint32), если в множестве больше size / DENSE_RATIO элементов
+DENSE_RATIO = 32
+
+
+# Сжатое множество порядковых номеров организаций (0..size-1) -------------------------------------------------------------------------------------
+class Bitmap:
+    """
+        Контейнер выбирается по плотности, как в roaring bitmap: разреженное множество - отсортированный массив номеров
+        (4 байта на элемент), плотное - биты (size / 8 байт).<br>
+        Пересечение начинается с меньшего множества: элементы разреженного проверяются по другому
+        (двоичный поиск или чтение бита), два плотных - побитовым И.
+    """
+    __slots__ = ("size", "array", "bits")
+
+    def __init__(self, size: int, array: Optional[np.ndarray] = None, bits: Optional[np.ndarray] = None):
+        self.size = size
+        self.array = array
+        self.bits = bits
+
+    # по отсортированному массиву номеров без повторов
+    @classmethod
+    def from_array(cls, size: int, ordinals: np.ndarray) -> "Bitmap":
+        if len(ordinals) * DENSE_RATIO > size:
+            bits = np.zeros(size, dtype=bool)
+            bits[ordinals] = True
+            return cls(size, bits=np.packbits(bits, bitorder="little"))
+        return cls(size, array=np.asarray(ordinals, dtype=np.uint32))
+
+    @classmethod
+    def empty(cls, size: int) -> "Bitmap":
+        return cls(size, array=np.zeros(0, dtype=np.uint32))
+
+    @property
+    def dense(self) -> bool:
+        return self.bits is not None
+
+    def __len__(self):
+        return int(np.bitwise_count(self.bits).sum()) if self.dense else len(self.array)
+
+    # номера по возрастанию (порядок выдачи)
+    def to_array(self) -> np.ndarray:
+        if self.dense:
+            return np.flatnonzero(np.unpackbits(self.bits, count=self.size, bitorder="little")).astype(np.uint32)
+        return self.array
+
+    # маска принадлежности номеров множеству
+    def contains(self, ordinals: np.ndarray) -> np.ndarray:
+        ordinals = np.asarray(ordinals, dtype=np.int64)
+        if self.dense:
+            return ((self.bits[ordinals >> 3] >> (ordinals & 7).astype(np.uint8)) & 1).astype(bool)
+        positions = np.searchsorted(self.array, ordinals)
+        found = positions < len(self.array)
+        found[found] = self.array[positions[found]] == ordinals[found]
+        return found
+
+    def __and__(self, other: "Bitmap") -> "Bitmap":
+        if self.dense and other.dense:
+            return Bitmap.from_array(self.size, Bitmap(self.size, bits=self.bits & other.bits).to_array())
+        if self.dense or other.dense:
+            small, large = (other, self) if self.dense else (self, other)
+        else:
+            small, large = (self, other) if len(self.array) <= len(other.array) else (other, self)
+        return Bitmap(self.size, array=small.array[large.contains(small.array)])
+
+    # объединение нескольких множеств (например, ячеек сетки в прямоугольнике)
+    @classmethod
+    def union(cls, size: int, bitmaps: List["Bitmap"]) -> "Bitmap":
+        if not bitmaps:
+            return cls.empty(size)
+        if len(bitmaps) == 1:
+            return bitmaps[0]
+        dense = [bitmap.bits for bitmap in bitmaps if bitmap.dense]
+        sparse = [bitmap.array for bitmap in bitmaps if not bitmap.dense]
+        if dense:
+            bits = np.bitwise_or.reduce(dense)
+            if sparse:
+                extra = np.zeros(size, dtype=bool)
+                extra[np.concatenate(sparse)] = True
+                bits = bits | np.packbits(extra, bitorder="little")
+            return cls.from_array(size, cls(size, bits=bits).to_array())
+        return cls.from_array(size, np.unique(np.concatenate(sparse)))
+
+
+# Индекс битовых множеств по ключам (ключ - порядковый номер деятельности, ячейки сетки и т.п.) ---------------------------------------------
+def pack_bitmap_index(prefix: str, keys: np.ndarray, ordinals: np.ndarray, key_count: int, size: int) -> Dict[str, np.ndarray]:
+    """
+        Пары (ключ, номер организации) без повторов -> массивы снимка каталога с префиксом prefix:<br>
+        _counts - число элементов множества ключа,<br>
+        _offsets/_values - разреженные множества (отсортированные номера), у плотных - пустой диапазон,<br>
+        _dense - строка плотного множества в _bits (-1 - множество разреженное), _bits - плотные множества по строкам.
+    """
+    order = np.lexsort((ordinals, keys))
+    keys, ordinals = keys[order], ordinals[order]
+    counts = np.bincount(keys, minlength=key_count).astype(np.int64)
+    starts = np.zeros(key_count + 1, dtype=np.int64)
+    np.cumsum(counts, out=starts[1:])
+
+    dense_keys = np.flatnonzero(counts * DENSE_RATIO > size)
+    dense = np.full(key_count, -1, dtype=np.int32)
+    dense[dense_keys] = np.arange(len(dense_keys), dtype=np.int32)
+    bits = np.zeros((len(dense_keys), (size + 7) // 8), dtype=np.uint8)
+    for row, key in enumerate(dense_keys.tolist()):
+        members = np.zeros(size, dtype=bool)
+        members[ordinals[starts[key]:starts[key + 1]]] = True
+        bits[row] = np.packbits(members, bitorder="little")
+
+    sparse = dense[keys] < 0
+    sparse_counts = np.where(dense < 0, counts, 0)
+    offsets = np.zeros(key_count + 1, dtype=np.int64)
+    np.cumsum(sparse_counts, out=offsets[1:])
+    return {
+        f"{prefix}_counts": counts,
+        f"{prefix}_offsets": offsets,
+        f"{prefix}_values": ordinals[sparse].astype(np.uint32),
+        f"{prefix}_dense": dense,
+        f"{prefix}_bits": bits,
+    }
+
+
+# Индекс битовых множеств из массивов снимка каталога ----------------------------------------------------------------------------------------
+class BitmapIndex:
+
+    def __init__(self, arrays: Dict[str, np.ndarray], prefix: str, size: int):
+        self.size = size
+        self.counts = arrays[f"{prefix}_counts"]
+        self.offsets = arrays[f"{prefix}_offsets"]
+        self.values = arrays[f"{prefix}_values"]
+        self.dense = arrays[f"{prefix}_dense"]
+        self.bits = arrays[f"{prefix}_bits"]
+
+    # число элементов множеств ключей (оценка для планировщика без чтения множеств)
+    def cardinality(self, keys: Iterable[int]) -> int:
+        keys = np.asarray(list(keys), dtype=np.int64)
+        return int(self.counts[keys].sum()) if len(keys) else 0
+
+    def get(self, key: int) -> Bitmap:
+        row = int(self.dense[key])
+        if row >= 0:
+            return Bitmap(self.size, bits=self.bits[row])
+        return Bitmap(self.size, array=self.values[self.offsets[key]:self.offsets[key + 1]])
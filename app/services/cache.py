@@ -0,0 +1,232 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional
+
+# Создание логгера
+logger = logging.getLogger(__name__)
+
+# Настройки кэша ответов (переменные окружения)
+# CACHE_BACKEND: memory - LRU в памяти процесса, redis - общий для всех процессов (REDIS_URL), none - без кэша
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory")
+CACHE_MAX_BYTES = int(os.getenv("CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+# ответы больше этого размера не кэшируются (большие выборки отдаются потоком)
+CACHE_MAX_ENTRY_BYTES = int(os.getenv("CACHE_MAX_ENTRY_BYTES", str(1024 * 1024)))
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+# время жизни ключей в Redis (сек.): ключи прежних версий каталога удаляются по истечении
+CACHE_TTL = int(os.getenv("CACHE_TTL", "3600"))
+
+
+# Счетчики кэша ---------------------------------------------------------------------------------------------------------------------------
+class CacheStats:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self.not_modified = 0
+
+    def incr(self, name: str, value: int = 1):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + value)
+
+    def as_dict(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "stores": self.stores,
+                "evictions": self.evictions,
+                "not_modified": self.not_modified,
+            }
+
+
+# LRU кэш в памяти процесса, ограниченный суммарным размером тел ответов -------------------------------------------------------------------
+class MemoryCacheBackend:
+    """
+        Кэш у каждого процесса свой, версия каталога - общая (в БД): после записи в любом воркере ключи
+        прежней версии не совпадают ни в одном процессе и вытесняются как давно не использованные.
+    """
+
+    def __init__(self, max_bytes: int = CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.stats = CacheStats()
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, bytes]" = OrderedDict()
+        self._size = 0
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: bytes):
+        if len(value) > self.max_bytes:
+            return
+        evicted = 0
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._size -= len(previous)
+            self._entries[key] = value
+            self._size += len(value)
+            while self._size > self.max_bytes:
+                _, old = self._entries.popitem(last=False)
+                self._size -= len(old)
+                evicted += 1
+        if evicted:
+            self.stats.incr("evictions", evicted)
+
+    # новая версия каталога - ответы прежних версий больше не нужны
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def info(self) -> Dict[str, int]:
+        with self._lock:
+            return {"entries": len(self._entries), "bytes": self._size, "max_bytes": self.max_bytes}
+
+
+# Кэш в Redis (или совместимом сервере), общий для всех процессов ----------------------------------------------------------------------------
+class RedisCacheBackend:
+    """
+        client - клиент с методами get/set (redis.Redis или совместимая заглушка, например fakeredis).<br>
+        Объем памяти ограничивается настройками сервера (maxmemory + allkeys-lru) и временем жизни ключей;
+        вытеснения считает сервер (INFO stats: evicted_keys).
+    """
+
+    KEY_PREFIX = "nebus:response:"
+
+    def __init__(self, client, ttl: int = CACHE_TTL):
+        self.client = client
+        self.ttl = ttl
+        self.stats = CacheStats()
+
+    @classmethod
+    def from_url(cls, url: str = REDIS_URL, ttl: int = CACHE_TTL) -> "RedisCacheBackend":
+        import redis
+        return cls(redis.Redis.from_url(url), ttl=ttl)
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self.client.get(self.KEY_PREFIX + key)
+
+    def set(self, key: str, value: bytes):
+        self.client.set(self.KEY_PREFIX + key, value, ex=self.ttl)
+
+    # ключи прежних версий каталога удаляются сервером по истечении времени жизни
+    def clear(self):
+        pass
+
+    def info(self) -> Dict[str, int]:
+        try:
+            stats = self.client.info("stats")
+        except Exception as e:
+            # совместимые заглушки могут не поддерживать INFO
+            logger.debug(f"RedisCacheBackend: INFO недоступен: {e}")
+            return {}
+        return {"evictions": int(stats.get("evicted_keys", 0))}
+
+
+# Кэш ответов: ключ - эндпоинт + нормализованные параметры + версия каталога --------------------------------------------------------------
+class ResponseCache:
+    """
+        Тело ответа однозначно определяется эндпоинтом, параметрами и версией каталога, поэтому ETag
+        строится из них без чтения тела: If-None-Match проверяется до чтения данных каталога.<br>
+        Версия каталога - конец журнала изменений в БД (app.services.changes.catalog_version): его сдвигает любая
+        запись из любого процесса, поэтому ключи и ETag прежней версии перестают совпадать во всех воркерах сразу.
+        Нет журнала изменений (version() - None) - ответы не кэшируются.
+    """
+
+    def __init__(self, backend=None, max_entry_bytes: int = CACHE_MAX_ENTRY_BYTES):
+        self.backend = backend
+        self.max_entry_bytes = max_entry_bytes
+
+    @property
+    def enabled(self) -> bool:
+        return self.backend is not None
+
+    # текущая версия каталога (один запрос к БД) или None - кэш выключен или нет журнала изменений
+    def version(self) -> Optional[int]:
+        if not self.enabled:
+            return None
+        from app.services.changes import current_catalog_version
+        return current_catalog_version()
+
+    # после записи в каталог (этим процессом): ответы прежних версий удаляются из кэша процесса
+    def invalidate(self) -> int:
+        if not self.enabled:
+            return 0
+        self.backend.clear()
+        version = self.version()
+        logger.info(f"ResponseCache: версия каталога {version}")
+        return version or 0
+
+    # ключ кэша: параметры сортируются, строки очищаются от пробелов по краям
+    @staticmethod
+    def key(endpoint: str, params: Dict, version: int) -> str:
+        normalized = {name: value.strip() if isinstance(value, str) else value for name, value in params.items()}
+        digest = hashlib.sha1(json.dumps(normalized, sort_keys=True, ensure_ascii=False).encode("utf-8")).hexdigest()
+        return f"{version}:{endpoint}:{digest}"
+
+    @staticmethod
+    def etag(key: str) -> str:
+        return '"' + hashlib.sha1(key.encode("utf-8")).hexdigest()[:20] + '"'
+
+    def get(self, key: str) -> Optional[bytes]:
+        if not self.enabled:
+            return None
+        value = self.backend.get(key)
+        self.backend.stats.incr("hits" if value is not None else "misses")
+        return value
+
+    def set(self, key: str, value: bytes):
+        if not self.enabled or len(value) > self.max_entry_bytes:
+            return
+        self.backend.set(key, value)
+        self.backend.stats.incr("stores")
+
+    def not_modified(self):
+        if self.enabled:
+            self.backend.stats.incr("not_modified")
+
+    def stats(self) -> Dict:
+        if not self.enabled:
+            return {"backend": "none"}
+        return {
+            "backend": type(self.backend).__name__,
+            "version": self.version(),
+            **self.backend.stats.as_dict(),
+            **self.backend.info(),
+        }
+
+
+# Проверка If-None-Match (список ETag через запятую, слабые W/"..." или *) -------------------------------------------------------------------
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag == "*" or tag.removeprefix("W/") == etag:
+            return True
+    return False
+
+
+# Создание кэша по настройкам окружения
+def create_response_cache(backend_name: str = CACHE_BACKEND) -> ResponseCache:
+    if backend_name == "redis":
+        return ResponseCache(RedisCacheBackend.from_url())
+    if backend_name == "memory":
+        return ResponseCache(MemoryCacheBackend())
+    return ResponseCache()
+
+
+# Единственный экземпляр на процесс
+response_cache = create_response_cache()
@@ -0,0 +1,164 @@
+import json
+import logging
+from typing import Any, Dict, Iterable, Iterator, List
+from sqlalchemy.orm import Session
+from app.database.database import has_table
+from app.schemas.schemas import ActivitySchema, BuildingSchema, OrganizationCardSchema
+from app.services import repository
+from app.services.repository import connection_of, fetch_all
+
+# Создание логгера
+logger = logging.getLogger(__name__)
+
+
+# Размер пачки ID для запросов вида IN (...) - SQLite ограничивает число параметров в одном запросе
+IN_CHUNK_SIZE = 500
+
+# Разбивает список на пачки по size элементов
+def chunked(items: List, size: int = IN_CHUNK_SIZE):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+# Есть ли таблица карточек organization_cards (SQLite, поддерживается триггерами) ------------------------------------------------------------
+def has_card_table(db: Session) -> bool:
+    return db.get_bind().dialect.name == "sqlite" and has_table(db, "organization_cards")
+
+
+# Возвращает карточки организаций (здание, телефоны, деятельности) по списку ID ------------------------------------------------------------------
+def get_organization_cards(
+        db: Session,
+        organization_ids: List[int]
+) -> List[OrganizationCardSchema]:
+    """
+        Пакетная загрузка карточек организаций.<br>
+        Если есть таблица organization_cards - по одному запросу (одна строка на организацию) на каждую пачку
+        из IN_CHUNK_SIZE организаций, иначе - по три запроса к нормализованным таблицам на пачку
+        (вместо трех запросов на каждую организацию: get_phones, get_activities, get_building_by_organization_id).<br>
+        Порядок карточек совпадает с порядком organization_ids, дубликаты отбрасываются.
+    """
+    logger.info(f"get_organization_cards() -> ...")
+    logger.debug(f"Запрос на получение карточек организаций: organization_ids={organization_ids} ...")
+    # уникальные ID с сохранением порядка
+    ids = list(dict.fromkeys(organization_ids))
+
+    if has_card_table(db):
+        cards = load_stored_cards(db, ids)
+    else:
+        cards = load_joined_cards(db, ids)
+
+    result = [cards[id] for id in ids if id in cards]
+    logger.debug(f"cards: {result}")
+    logger.debug(f"End get_organization_cards() -> ...")
+    return result
+
+
+# Карточки из таблицы organization_cards: {ID организации: карточка} ---------------------------------------------------------------------------
+def load_stored_cards(db: Session, ids: List[int]) -> Dict[int, OrganizationCardSchema]:
+    cards = {}
+    # одинаковые здания и деятельности разных организаций - один объект схемы
+    buildings = {}
+    activities = {}
+    for chunk in chunked(ids):
+        for rec in fetch_all(db, repository.SELECT_ORGANIZATION_CARDS, {"ids": chunk}):
+            building = None
+            if rec.building_id is not None:
+                building = buildings.get(rec.building_id)
+                if building is None:
+                    building = buildings[rec.building_id] = BuildingSchema(
+                        id=rec.building_id,
+                        address=rec.address,
+                        latitude=rec.latitude,
+                        longitude=rec.longitude
+                    )
+            card_activities = []
+            for item in json.loads(rec.activities):
+                activity = activities.get(item["id"])
+                if activity is None:
+                    activity = activities[item["id"]] = ActivitySchema(**item)
+                card_activities.append(activity)
+            cards[rec.id] = OrganizationCardSchema(
+                id=rec.id,
+                name=rec.name,
+                building=building,
+                phones=json.loads(rec.phones),
+                activities=card_activities
+            )
+    return cards
+
+
+# Карточки по нормализованным таблицам (организации со зданиями, телефоны, деятельности): {ID организации: карточка} -----------------------------
+def load_joined_cards(db: Session, ids: List[int]) -> Dict[int, OrganizationCardSchema]:
+    cards = {}
+    buildings = {}
+    activities = {}
+    for chunk in chunked(ids):
+        # организации и их здания
+        for rec in fetch_all(db, repository.SELECT_CARD_ORGANIZATIONS, {"ids": chunk}):
+            if rec.id in cards:
+                continue
+            building = None
+            if rec.building_id is not None:
+                building = buildings.get(rec.building_id)
+                if building is None:
+                    building = buildings[rec.building_id] = BuildingSchema(
+                        id=rec.building_id,
+                        address=rec.address,
+                        latitude=rec.latitude,
+                        longitude=rec.longitude
+                    )
+            cards[rec.id] = OrganizationCardSchema(id=rec.id, name=rec.name, building=building)
+        # телефоны
+        for rec in fetch_all(db, repository.SELECT_CARD_PHONES, {"ids": chunk}):
+            cards[rec.organization_id].phones.append(rec.phone_number)
+        # деятельности
+        for rec in fetch_all(db, repository.SELECT_CARD_ACTIVITIES, {"ids": chunk}):
+            activity = activities.get(rec.id)
+            if activity is None:
+                activity = activities[rec.id] = ActivitySchema(id=rec.id, name=rec.name, parent_id=rec.parent_id, level=rec.level)
+            cards[rec.organization_id].activities.append(activity)
+    return cards
+
+
+# Потоковое чтение ID организаций серверным курсором -----------------------------------------------------------------------------------------
+def iter_organization_ids(
+        db: Session,
+        query,
+        params: Dict[str, Any],
+        chunk_size: int = IN_CHUNK_SIZE
+) -> Iterator[int]:
+    """
+        Выполняет запрос, первая колонка которого - ID организации, и отдает ID по мере чтения.<br>
+        stream_results/yield_per - строки читаются из курсора порциями по chunk_size,
+        а не загружаются в память все сразу.
+    """
+    logger.info(f"iter_organization_ids() -> ...")
+    result = connection_of(db).execute(query, params, execution_options={"stream_results": True, "yield_per": chunk_size})
+    for partition in result.partitions():
+        for rec in partition:
+            yield rec[0]
+
+
+# Потоковая загрузка карточек организаций -----------------------------------------------------------------------------------------------------
+def iter_organization_cards(
+        db: Session,
+        organization_ids: Iterable[int],
+        chunk_size: int = IN_CHUNK_SIZE
+) -> Iterator[OrganizationCardSchema]:
+    """
+        Читает ID пачками по chunk_size, загружает карточки пачки через get_organization_cards
+        и отдает их по одной. В памяти одновременно находится не более одной пачки.
+        Дубликаты (в т.ч. между пачками) отбрасываются.
+    """
+    seen = set()
+    chunk = []
+    for id in organization_ids:
+        if id in seen:
+            continue
+        seen.add(id)
+        chunk.append(id)
+        if len(chunk) >= chunk_size:
+            yield from get_organization_cards(db=db, organization_ids=chunk)
+            chunk = []
+    if chunk:
+        yield from get_organization_cards(db=db, organization_ids=chunk)
@@ -0,0 +1,202 @@
+import logging
+from typing import Dict, List, Optional, Tuple, Union
+from sqlalchemy import bindparam, func, insert, select, text, update
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+from app.database.database import has_table, read_engine
+from app.schemas.schemas import ChangeEventSchema, ChangePageSchema
+from app.services.repository import activities, buildings, change_log, change_log_state, fetch_all, fetch_one, organizations, phones
+
+# Создание логгера
+logger = logging.getLogger(__name__)
+
+# Размер страницы журнала изменений по умолчанию и жесткое ограничение сверху
+DEFAULT_CHANGES_LIMIT = 1000
+MAX_CHANGES_LIMIT = 10000
+
+# Сущности со значениями в событии upsert: сущность -> (таблица, колонки); у связей ключ - это вся строка
+ENTITY_COLUMNS = {
+    "organization": (organizations, ("name",)),
+    "building": (buildings, ("address", "latitude", "longitude")),
+    "activity": (activities, ("name", "parent_id", "level")),
+    "phone": (phones, ("organization_id", "phone_number")),
+}
+LINK_ENTITIES = ("building_organization", "organization_activity")
+
+SELECT_CHANGES = (
+    select(change_log.c.seq, change_log.c.entity, change_log.c.entity_id, change_log.c.ref_id, change_log.c.op)
+    .where(change_log.c.seq > bindparam("since"))
+    .order_by(change_log.c.seq)
+    .limit(bindparam("page_limit"))
+)
+SELECT_CHANGE_HEAD = select(func.max(change_log.c.seq))
+SELECT_CHANGE_HORIZON = select(change_log_state.c.horizon).where(change_log_state.c.id == 1)
+# Версия каталога: конец журнала, а если журнал пуст после сжатия - граница (seq не используются повторно)
+SELECT_CATALOG_VERSION = select(func.coalesce(SELECT_CHANGE_HEAD.scalar_subquery(), SELECT_CHANGE_HORIZON.scalar_subquery(), 0))
+# Версия дерева деятельностей: последняя запись о деятельностях или сброс журнала (загрузка каталога)
+SELECT_ACTIVITIES_VERSION = select(func.coalesce(
+    select(func.max(change_log.c.seq)).where(change_log.c.entity.in_(("activity", "catalog"))).scalar_subquery(),
+    SELECT_CHANGE_HORIZON.scalar_subquery(),
+    0
+))
+
+# Удаление записей, после которых в журнале есть запись о той же строке (по индексу (entity, entity_id, ref_id, seq))
+DELETE_SUPERSEDED_CHANGES = text("""
+    DELETE FROM change_log
+    WHERE EXISTS (
+        SELECT 1 FROM change_log newer
+        WHERE newer.entity = change_log.entity
+          AND newer.entity_id = change_log.entity_id
+          AND newer.ref_id = change_log.ref_id
+          AND newer.seq > change_log.seq
+    )
+""")
+# Последняя запись старше срока хранения (changed_at - время сервера БД)
+SELECT_EXPIRED_SEQ = {
+    "sqlite": text("SELECT MAX(seq) FROM change_log WHERE changed_at < datetime('now', :modifier)"),
+    "postgresql": text("SELECT MAX(seq) FROM change_log WHERE changed_at < CURRENT_TIMESTAMP - make_interval(secs => :seconds)"),
+}
+
+
+# Курсор журнала изменений устарел: записи после него удалены сжатием или журнал сброшен (нужна полная выгрузка) ------------------------------
+class CursorExpired(ValueError):
+    pass
+
+
+# Курсор журнала - seq последнего полученного изменения (десятичное число) ------------------------------------------------------------------------
+def decode_change_cursor(cursor: str) -> int:
+    """ValueError - курсор поврежден."""
+    if not cursor.isdigit():
+        raise ValueError(f"Некорректный курсор: {cursor}")
+    return int(cursor)
+
+
+# Есть ли журнал изменений (таблица и триггеры создаются миграцией e1d4b7a9c360) ------------------------------------------------------------------
+def has_change_log(db: Union[Session, Connection]) -> bool:
+    return has_table(db, "change_log")
+
+
+# Версия каталога - общая для всех процессов: ее сдвигает любая фиксированная запись в каталог (триггеры журнала) ------------------------------
+def catalog_version(db: Union[Session, Connection]) -> Optional[int]:
+    """
+        Не убывает: сжатие журнала не удаляет последнюю запись, сброс (reset_changes) добавляет запись с новым seq.<br>
+        None - журнала изменений нет (таблицы созданы без миграций): версия каталога неизвестна.
+    """
+    if not has_change_log(db):
+        return None
+    return db.execute(SELECT_CATALOG_VERSION).scalar()
+
+
+# Версия деятельностей: меняется при записи деятельностей из любого процесса (None - журнала изменений нет) ---------------------------------
+def activities_version(db: Union[Session, Connection]) -> Optional[int]:
+    if not has_change_log(db):
+        return None
+    return db.execute(SELECT_ACTIVITIES_VERSION).scalar()
+
+
+# Текущая версия каталога (отдельное соединение движка чтения)
+def current_catalog_version() -> Optional[int]:
+    with read_engine.connect() as conn:
+        return catalog_version(conn)
+
+
+# Граница журнала: курсоры меньше нее устарели (строки нет, если таблицы созданы без миграции - create_all) ------------------------------------
+def change_horizon(db: Session) -> int:
+    rec = fetch_one(db, SELECT_CHANGE_HORIZON)
+    return rec[0] if rec is not None else 0
+
+
+# Страница журнала изменений после курсора since ----------------------------------------------------------------------------------------------
+def changes_page(db: Session, since: Optional[str], limit: int = DEFAULT_CHANGES_LIMIT) -> ChangePageSchema:
+    """
+        since=None - пустая страница с курсором текущего конца журнала: клиент берет его до полной выгрузки
+        и дальше запрашивает только изменения.<br>
+        Несколько записей об одной строке на странице сворачиваются в последнюю (по ее seq), значения upsert читаются
+        из таблиц одним запросом на сущность. Строки, удаленные после записи upsert, пропускаются: их удаление - дальше в журнале.<br>
+        CursorExpired - курсор меньше границы журнала или больше его конца (журнал другой БД).
+    """
+    logger.info(f"changes_page() -> since={since}, limit={limit}")
+    cursor = decode_change_cursor(since) if since is not None else None
+    rows = fetch_all(db, SELECT_CHANGES, {"since": cursor, "page_limit": limit + 1}) if cursor is not None else []
+    # граница читается после записей: если сжатие удалило часть прочитанного, граница уже сдвинута
+    horizon = change_horizon(db)
+    head = max(fetch_one(db, SELECT_CHANGE_HEAD)[0] or 0, horizon)
+    if cursor is None:
+        return ChangePageSchema(next_cursor=str(head))
+    if cursor < horizon or cursor > head:
+        raise CursorExpired(f"Курсор {cursor} устарел (журнал изменений: {horizon}..{head}), нужна полная выгрузка")
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    latest: Dict[Tuple[str, int, int], object] = {}
+    for row in rows:
+        key = (row.entity, row.entity_id, row.ref_id)
+        latest.pop(key, None)
+        latest[key] = row
+
+    values: Dict[str, Dict[int, Dict]] = {}
+    for entity, (table, columns) in ENTITY_COLUMNS.items():
+        ids = [row.entity_id for row in latest.values() if row.entity == entity and row.op == "upsert"]
+        if ids:
+            query = select(table.c.id, *[table.c[name] for name in columns]).where(table.c.id.in_(ids))
+            values[entity] = {rec.id: {name: rec._mapping[name] for name in columns} for rec in fetch_all(db, query)}
+
+    events: List[ChangeEventSchema] = []
+    for row in latest.values():
+        if row.op == "upsert" and row.entity in ENTITY_COLUMNS:
+            data = values[row.entity].get(row.entity_id)
+            if data is None:
+                continue
+            events.append(ChangeEventSchema(seq=row.seq, op=row.op, entity=row.entity, id=row.entity_id, data=data))
+        elif row.op in ("upsert", "delete"):
+            ref_id = row.ref_id if row.entity in LINK_ENTITIES else None
+            events.append(ChangeEventSchema(seq=row.seq, op=row.op, entity=row.entity, id=row.entity_id, ref_id=ref_id))
+    next_cursor = str(rows[-1].seq) if rows else str(cursor)
+    logger.debug(f"changes: записей {len(rows)}, событий {len(events)}, next_cursor={next_cursor}, has_more={has_more}")
+    return ChangePageSchema(events=events, next_cursor=next_cursor, has_more=has_more)
+
+
+# Сдвиг границы журнала (в транзакции вызывающего кода) ----------------------------------------------------------------------------------
+def set_change_horizon(conn: Connection, horizon: int):
+    if conn.execute(update(change_log_state).where(change_log_state.c.id == 1).values(horizon=horizon)).rowcount == 0:
+        conn.execute(insert(change_log_state).values(id=1, horizon=horizon))
+
+
+# Сброс журнала после изменений без триггеров (загрузка каталога): все выданные курсоры устаревают ---------------------------------------------
+def reset_changes(conn: Connection) -> int:
+    """
+        Запись-отметка reset получает новый seq (больше всех выданных курсоров), он становится границей журнала.
+        Клиентам она не выдается: запрашиваются только записи после курсора, а курсор не меньше границы.
+    """
+    seq = conn.execute(
+        insert(change_log).values(entity="catalog", entity_id=0, ref_id=0, op="reset").returning(change_log.c.seq)
+    ).scalar_one()
+    set_change_horizon(conn, seq)
+    logger.info(f"reset_changes() -> граница журнала изменений {seq}")
+    return seq
+
+
+# Сжатие журнала изменений ------------------------------------------------------------------------------------------------------------------
+def compact_changes(conn: Connection, retention_seconds: Optional[float] = None) -> Dict[str, int]:
+    """
+        1. Удаляются записи, после которых есть запись о той же строке: клиент с любым курсором получит последнюю,
+           поэтому курсоры не устаревают, а в журнале остается не больше одной записи на строку.<br>
+        2. retention_seconds - записи старше срока удаляются все (в т.ч. удаления строк), граница журнала
+           сдвигается на последнюю из них: клиентам с курсором меньше границы нужна полная выгрузка.<br>
+        Выполняется в транзакции вызывающего кода.
+    """
+    logger.info(f"compact_changes() -> retention_seconds={retention_seconds}")
+    result = {"superseded": conn.execute(DELETE_SUPERSEDED_CHANGES).rowcount, "expired": 0}
+    horizon = conn.execute(SELECT_CHANGE_HORIZON).scalar() or 0
+    if retention_seconds is not None:
+        query = SELECT_EXPIRED_SEQ.get(conn.dialect.name)
+        if query is None:
+            raise ValueError(f"Срок хранения журнала не поддерживается для {conn.dialect.name}")
+        expired = conn.execute(query, {"modifier": f"-{int(retention_seconds)} seconds", "seconds": retention_seconds}).scalar()
+        if expired is not None and expired > horizon:
+            result["expired"] = conn.execute(change_log.delete().where(change_log.c.seq <= expired)).rowcount
+            horizon = expired
+            set_change_horizon(conn, horizon)
+    result["horizon"] = horizon
+    logger.info(f"compact_changes() -> {result}")
+    return result
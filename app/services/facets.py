@@ -0,0 +1,137 @@
+import functools
+import logging
+import os
+import time
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import Select, bindparam, distinct, func, select
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+from app.database.database import statement_deadline
+from app.schemas.schemas import ActivityFacetSchema, BuildingFacetSchema, FacetsSchema
+from app.services.repository import activities, activity_closure, building_organization, buildings, fetch_all, fetch_one, organization_activity, organizations
+
+# Создание логгера
+logger = logging.getLogger(__name__)
+
+# Время на подсчет счетчиков выдачи вместе с поиском (мс.): по его истечении счетчики возвращаются по части выдачи
+FACET_BUDGET_MS = float(os.getenv("FACET_BUDGET_MS", "50"))
+# Сколько зданий с наибольшим числом организаций возвращать
+MAX_FACET_BUILDINGS = 50
+
+
+# Срок окончания подсчета (time.perf_counter()) для поиска, начатого в start -------------------------------------------------------------------
+def facet_deadline(start: float) -> float:
+    return start + FACET_BUDGET_MS / 1000
+
+
+# Счетчики по выдаче из снимка каталога (порядковые номера организаций, app.services.snapshot_file) ----------------------------------------------
+def snapshot_facets(snapshot, organization_ordinals, point: Optional[Tuple[float, float, float]], deadline: float) -> FacetsSchema:
+    """
+        Один проход по выдаче: деятельности организаций уже развернуты до всех предков в снимке
+        (organization_activity_tree), поэтому организация учитывается в каждом узле дерева над своими деятельностями
+        один раз. point - (latitude, longitude, radius км.): учитываются только здания в радиусе.
+    """
+    logger.info(f"snapshot_facets() -> ...")
+    activity_counts, building_counts, counted = snapshot.facet_counts(organization_ordinals, point=point, deadline=deadline)
+    facets = FacetsSchema(total=len(organization_ordinals), complete=counted == len(organization_ordinals))
+    for activity in activity_counts.nonzero()[0].tolist():
+        level = int(snapshot.activity_levels[activity])
+        parent_id = int(snapshot.activity_parent_ids[activity])
+        facets.activities.append(ActivityFacetSchema(
+            id=int(snapshot.activity_ids[activity]),
+            name=snapshot.text(snapshot.activity_name_offsets, snapshot.activity_names, activity),
+            level=None if level < 0 else level,
+            parent_id=None if parent_id < 0 else parent_id,
+            count=int(activity_counts[activity])
+        ))
+    # здания с наибольшим числом организаций, при равенстве - по ID (порядковые номера зданий - в порядке ID)
+    found = building_counts.nonzero()[0]
+    found = found[(-building_counts[found]).argsort(kind="stable")[:MAX_FACET_BUILDINGS]]
+    for building in found.tolist():
+        facets.buildings.append(BuildingFacetSchema(
+            id=int(snapshot.building_ids[building]),
+            address=snapshot.text(snapshot.building_address_offsets, snapshot.building_addresses, building),
+            count=int(building_counts[building])
+        ))
+    logger.debug(f"facets: total={facets.total}, counted={counted}, activities={len(facets.activities)}, buildings={len(facets.buildings)}")
+    return facets
+
+
+# Запросы счетчиков по подзапросу ID организаций (собираются один раз на подзапрос) -----------------------------------------------------------
+@functools.lru_cache(maxsize=32)
+def facet_queries(subquery: Select, nearby: bool) -> Tuple[Select, Select, Select]:
+    """
+        Возвращает (число организаций, счетчики по деятельностям с вложенными, счетчики по зданиям).<br>
+        nearby - здания ограничены списком :facet_building_ids (здания в радиусе).
+    """
+    total = select(func.count()).select_from(organizations).where(organizations.c.id.in_(subquery))
+    by_activity = (
+        select(activities.c.id, activities.c.name, activities.c.level, activities.c.parent_id, func.count(distinct(organization_activity.c.organization_id)).label("count"))
+        .select_from(
+            organization_activity
+            .join(activity_closure, activity_closure.c.descendant_id == organization_activity.c.activity_id)
+            .join(activities, activities.c.id == activity_closure.c.ancestor_id)
+        )
+        .where(organization_activity.c.organization_id.in_(subquery))
+        .group_by(activities.c.id, activities.c.name, activities.c.level, activities.c.parent_id)
+        .order_by(activities.c.id)
+    )
+    by_building = (
+        select(buildings.c.id, buildings.c.address, func.count().label("count"))
+        .select_from(building_organization.join(buildings, buildings.c.id == building_organization.c.building_id))
+        .where(building_organization.c.organization_id.in_(subquery))
+    )
+    if nearby:
+        by_building = by_building.where(building_organization.c.building_id.in_(bindparam("facet_building_ids", expanding=True)))
+    by_building = by_building.group_by(buildings.c.id, buildings.c.address).order_by(func.count().desc(), buildings.c.id).limit(MAX_FACET_BUILDINGS)
+    return total, by_activity, by_building
+
+
+# Строки запроса счетчиков, выполненного до срока deadline (None - срок истек до запроса или запрос прерван) -----------------------------------
+def fetch_until(db: Session, query: Select, params: Dict, deadline: float) -> Optional[List]:
+    if time.perf_counter() > deadline:
+        return None
+    try:
+        with statement_deadline(db, deadline):
+            return fetch_all(db, query, params)
+    except OperationalError:
+        # ошибка до срока - не прерывание запроса
+        if time.perf_counter() <= deadline:
+            raise
+        logger.info(f"fetch_until() -> запрос прерван по сроку")
+        return None
+
+
+# Счетчики по выдаче запросами к БД (без снимка каталога) ----------------------------------------------------------------------------------
+def db_facets(
+        db: Session,
+        subquery: Select,
+        params: Dict,
+        building_ids: Optional[List[int]],
+        deadline: float
+) -> FacetsSchema:
+    """
+        Три запроса с группировкой по всей выдаче (а не запрос на каждый узел дерева).
+        Счетчики по деятельностям и зданиям запрашиваются со сроком deadline (fetch_until): по его истечении
+        запрос прерывается, оставшиеся счетчики не считаются (complete=False). Число организаций - без срока.<br>
+        building_ids - здания в радиусе (поиск по радиусу).
+    """
+    logger.info(f"db_facets() -> ...")
+    total, by_activity, by_building = facet_queries(subquery, building_ids is not None)
+    params = dict(params, facet_building_ids=building_ids) if building_ids is not None else params
+    facets = FacetsSchema(total=fetch_one(db, total, params)[0])
+    rows = fetch_until(db, by_activity, params, deadline)
+    if rows is None:
+        facets.complete = False
+        return facets
+    facets.activities = [
+        ActivityFacetSchema(id=rec.id, name=rec.name, level=rec.level, parent_id=rec.parent_id, count=rec.count)
+        for rec in rows
+    ]
+    rows = fetch_until(db, by_building, params, deadline)
+    if rows is None:
+        facets.complete = False
+        return facets
+    facets.buildings = [BuildingFacetSchema(id=rec.id, address=rec.address, count=rec.count) for rec in rows]
+    logger.debug(f"facets: total={facets.total}, activities={len(facets.activities)}, buildings={len(facets.buildings)}")
+    return facets
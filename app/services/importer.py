@@ -0,0 +1,346 @@
+import io
+import logging
+import os
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import bindparam, text
+from sqlalchemy.engine import Connection, Engine
+from app.services.changes import reset_changes
+from app.services.read_model import rebuild_organization_cards
+
+# Создание логгера
+logger = logging.getLogger(__name__)
+
+# Размер пачки строк (одна транзакция на пачку)
+IMPORT_CHUNK_SIZE = 50_000
+
+# Колонки входных файлов по таблицам (в порядке загрузки: сначала справочники, затем ссылки на них)
+TABLE_COLUMNS = {
+    "buildings": {"id": "int", "address": "str", "latitude": "float", "longitude": "float"},
+    "organizations": {"id": "int", "name": "str"},
+    "phones": {"organization_id": "int", "phone_number": "str"},
+    "building_organization": {"building_id": "int", "organization_id": "int"},
+    "organization_activity": {"organization_id": "int", "activity_id": "int"},
+}
+
+# Уникальный ключ строки: дубликаты внутри пачки отбрасываются, уже загруженные строки пропускаются при вставке
+# по первичному ключу или уникальному индексу (у phones - ux_phones_organization_id_phone_number, миграция f7a2c5d8e913)
+TABLE_KEYS = {
+    "buildings": ["id"],
+    "organizations": ["id"],
+    "phones": ["organization_id", "phone_number"],
+    "building_organization": ["building_id", "organization_id"],
+    "organization_activity": ["organization_id", "activity_id"],
+}
+
+# Ссылки на другие таблицы: колонка -> таблица (строки с несуществующими ID отклоняются)
+TABLE_REFERENCES = {
+    "phones": {"organization_id": "organizations"},
+    "building_organization": {"building_id": "buildings", "organization_id": "organizations"},
+    "organization_activity": {"organization_id": "organizations", "activity_id": "activities"},
+}
+
+# Таблицы с автоинкрементным ID (в PostgreSQL последовательность сдвигается после загрузки явных ID)
+SERIAL_TABLES = ["buildings", "organizations", "phones"]
+
+# Форматы входных файлов по расширению
+SOURCE_FORMATS = {".csv": "csv", ".parquet": "parquet", ".ndjson": "ndjson", ".jsonl": "ndjson"}
+
+
+# Входные файлы в каталоге: <таблица>.<csv|parquet|ndjson|jsonl>, в порядке загрузки -------------------------------------------------------
+def find_sources(directory: str) -> List[Tuple[str, str]]:
+    sources = []
+    for table in TABLE_COLUMNS:
+        for extension in SOURCE_FORMATS:
+            path = os.path.join(directory, table + extension)
+            if os.path.exists(path):
+                sources.append((table, os.path.abspath(path)))
+    return sources
+
+
+# Чтение файла пачками (DataFrame по chunk_size строк) -------------------------------------------------------------------------------------
+def read_chunks(path: str, chunk_size: int = IMPORT_CHUNK_SIZE) -> Iterator[pd.DataFrame]:
+    source_format = SOURCE_FORMATS[os.path.splitext(path)[1].lower()]
+    if source_format == "csv":
+        # все колонки читаются строками - типы приводятся при проверке
+        with pd.read_csv(path, chunksize=chunk_size, dtype=str, keep_default_na=False) as reader:
+            yield from reader
+    elif source_format == "ndjson":
+        with pd.read_json(path, lines=True, chunksize=chunk_size, dtype=False) as reader:
+            yield from reader
+    else:
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size):
+            yield batch.to_pandas()
+
+
+# Проверка и приведение типов: (корректные строки, отклоненные строки) ---------------------------------------------------------------------
+def validate_chunk(
+        table: str,
+        frame: pd.DataFrame,
+        known_ids: Optional[Dict[str, np.ndarray]] = None
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+        ID - целые > 0, строки - непустые (пробелы по краям убираются), координаты - в допустимых пределах,
+        ссылки - на существующие ID (known_ids: таблица -> массив ID).
+    """
+    columns = TABLE_COLUMNS[table]
+    missing = [column for column in columns if column not in frame.columns]
+    if missing:
+        raise ValueError(f"{table}: нет колонок {', '.join(missing)}")
+
+    clean = pd.DataFrame(index=frame.index)
+    valid = pd.Series(True, index=frame.index)
+    for column, kind in columns.items():
+        if kind == "str":
+            values = frame[column].astype("string").str.strip()
+            valid &= values.notna() & (values != "")
+        else:
+            values = pd.to_numeric(frame[column], errors="coerce")
+            valid &= values.notna() & np.isfinite(values)
+            if kind == "int":
+                valid &= (values == values.round()) & (values > 0)
+        clean[column] = values
+
+    if table == "buildings":
+        valid &= clean["latitude"].between(-90, 90) & clean["longitude"].between(-180, 180)
+    for column, reference in TABLE_REFERENCES.get(table, {}).items():
+        valid &= clean[column].isin(known_ids[reference])
+
+    good = clean[valid].drop_duplicates(subset=TABLE_KEYS[table])
+    for column, kind in columns.items():
+        if kind == "int":
+            good[column] = good[column].astype("int64")
+    return good, frame[~valid]
+
+
+# ID существующих строк таблицы (для проверки ссылок) -------------------------------------------------------------------------------------
+def existing_ids(conn: Connection, table: str) -> np.ndarray:
+    return np.fromiter((row[0] for row in conn.exec_driver_sql(f"SELECT id FROM {table}")), dtype="int64")
+
+
+# Вставка пачки: COPY в PostgreSQL, executemany в SQLite; уже существующие строки пропускаются -----------------------------------------------
+def insert_chunk(conn: Connection, table: str, frame: pd.DataFrame) -> int:
+    """
+        Возвращает число вставленных строк. В PostgreSQL пачка копируется (COPY) во временную таблицу
+        и переносится INSERT ... ON CONFLICT DO NOTHING, в SQLite - INSERT OR IGNORE пачкой параметров.
+    """
+    if frame.empty:
+        return 0
+    columns = ", ".join(frame.columns)
+    dialect = conn.dialect.name
+    if dialect == "postgresql":
+        stage = f"import_stage_{table}"
+        conn.exec_driver_sql(f"CREATE TEMP TABLE IF NOT EXISTS {stage} (LIKE {table} INCLUDING DEFAULTS) ON COMMIT DELETE ROWS")
+        buffer = io.StringIO()
+        frame.to_csv(buffer, index=False, header=False)
+        buffer.seek(0)
+        cursor = conn.connection.cursor()
+        cursor.copy_expert(f"COPY {stage} ({columns}) FROM STDIN WITH (FORMAT csv)", buffer)
+        result = conn.exec_driver_sql(f"INSERT INTO {table} ({columns}) SELECT {columns} FROM {stage} ON CONFLICT DO NOTHING")
+        return result.rowcount
+    rows = list(frame.astype(object).itertuples(index=False, name=None))
+    if dialect == "sqlite":
+        placeholders = ", ".join("?" for _ in frame.columns)
+        result = conn.exec_driver_sql(f"INSERT OR IGNORE INTO {table} ({columns}) VALUES ({placeholders})", rows)
+        return result.rowcount
+    placeholders = ", ".join(f":{column}" for column in frame.columns)
+    conn.execute(text(f"INSERT INTO {table} ({columns}) VALUES ({placeholders})"), [dict(zip(frame.columns, row)) for row in rows])
+    return len(rows)
+
+
+# Транзакция загрузки (в PostgreSQL - без ограничения времени выполнения запросов) --------------------------------------------------------
+@contextmanager
+def import_transaction(engine: Engine) -> Iterator[Connection]:
+    with engine.begin() as conn:
+        if conn.dialect.name == "postgresql":
+            conn.exec_driver_sql("SET LOCAL statement_timeout = 0")
+        yield conn
+
+
+# Отложенное обслуживание индексов: удаление вторичных индексов и триггеров (FTS5, R*Tree, карточки) на время загрузки --------------------------------
+def defer_maintenance(engine: Engine):
+    """
+        Определения сохраняются в import_deferred в той же транзакции, что и удаление, поэтому
+        после сбоя restore_maintenance() восстанавливает их при повторном запуске.<br>
+        Уникальные индексы не откладываются: по ним вставка пропускает уже загруженные строки (TABLE_KEYS).
+    """
+    with import_transaction(engine) as conn:
+        if conn.dialect.name == "sqlite":
+            query = text("""
+                SELECT type, name, sql
+                FROM sqlite_master
+                WHERE type IN ('index', 'trigger') AND tbl_name IN :tables AND sql IS NOT NULL
+                  AND sql NOT LIKE 'CREATE UNIQUE INDEX%'
+            """)
+        elif conn.dialect.name == "postgresql":
+            query = text("""
+                SELECT 'index' AS type, indexname AS name, indexdef AS sql
+                FROM pg_indexes
+                WHERE schemaname = current_schema() AND tablename IN :tables
+                  AND indexname NOT IN (SELECT conname FROM pg_constraint)
+                  AND indexdef NOT LIKE 'CREATE UNIQUE INDEX%'
+            """)
+        else:
+            return
+        query = query.bindparams(bindparam("tables", expanding=True))
+        for row in conn.execute(query, {"tables": list(TABLE_COLUMNS)}).fetchall():
+            logger.info(f"defer_maintenance() -> {row.type} {row.name} отложен до окончания загрузки")
+            conn.execute(
+                text("INSERT INTO import_deferred (name, kind, sql) VALUES (:name, :kind, :sql)"),
+                {"name": row.name, "kind": row.type, "sql": row.sql}
+            )
+            conn.exec_driver_sql(f"DROP {row.type.upper()} {row.name}")
+
+
+# Восстановление отложенных индексов и триггеров, перестроение FTS5 / R*Tree / карточек, сброс журнала изменений, сдвиг последовательностей ---------------
+def restore_maintenance(engine: Engine):
+    with import_transaction(engine) as conn:
+        deferred = conn.execute(text("SELECT name, kind, sql FROM import_deferred ORDER BY kind, name")).fetchall()
+        for row in deferred:
+            start = time.perf_counter()
+            conn.exec_driver_sql(row.sql)
+            conn.execute(text("DELETE FROM import_deferred WHERE name = :name"), {"name": row.name})
+            logger.info(f"restore_maintenance() -> {row.kind} {row.name} восстановлен за {time.perf_counter() - start:.1f} сек.")
+
+        if conn.dialect.name == "sqlite" and any(row.kind == "trigger" for row in deferred):
+            # триггеры не обновляли FTS5, R*Tree и карточки во время загрузки - перестраиваем целиком
+            tables = {row[0] for row in conn.exec_driver_sql("SELECT name FROM sqlite_master WHERE type = 'table'")}
+            if "organizations_fts" in tables:
+                conn.exec_driver_sql("INSERT INTO organizations_fts (organizations_fts) VALUES ('rebuild')")
+                logger.info(f"restore_maintenance() -> organizations_fts перестроен")
+            if "buildings_rtree" in tables:
+                conn.exec_driver_sql("DELETE FROM buildings_rtree")
+                conn.exec_driver_sql("""
+                    INSERT INTO buildings_rtree (id, min_lat, max_lat, min_lon, max_lon)
+                    SELECT id, latitude, latitude, longitude, longitude
+                    FROM buildings
+                """)
+                logger.info(f"restore_maintenance() -> buildings_rtree перестроен")
+            if "organization_cards" in tables:
+                rebuild_organization_cards(conn)
+            if any(row.name.startswith("change_log_") for row in deferred):
+                # загруженные строки не записаны в журнал изменений - клиенты синхронизируются заново полной выгрузкой
+                reset_changes(conn)
+
+        if conn.dialect.name == "postgresql":
+            # ID загружены явно - последовательности сдвигаются за максимальный ID
+            for table in SERIAL_TABLES:
+                conn.exec_driver_sql(f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), COALESCE(MAX(id), 1)) FROM {table}")
+        conn.exec_driver_sql("ANALYZE")
+
+
+# Отпечаток файла: при изменении файла продолжение загрузки невозможно ----------------------------------------------------------------------
+def file_fingerprint(path: str) -> str:
+    stat = os.stat(path)
+    return f"{stat.st_size}:{int(stat.st_mtime)}"
+
+
+# Загрузка одного файла пачками с продолжением с последней зафиксированной пачки ----------------------------------------------------------
+def import_source(
+        engine: Engine,
+        table: str,
+        path: str,
+        chunk_size: int = IMPORT_CHUNK_SIZE,
+        rejected_path: Optional[str] = None
+) -> Dict[str, int]:
+    """
+        Каждая пачка вставляется в своей транзакции вместе с обновлением import_progress, поэтому
+        после сбоя загрузка продолжается ровно с первой незафиксированной пачки.<br>
+        Отклоненные строки дописываются в rejected_path (CSV).
+    """
+    source = f"{table}:{path}"
+    fingerprint = file_fingerprint(path)
+    with engine.connect() as conn:
+        progress = conn.execute(text("SELECT * FROM import_progress WHERE source = :source"), {"source": source}).fetchone()
+        known_ids = {reference: existing_ids(conn, reference) for reference in set(TABLE_REFERENCES.get(table, {}).values())}
+
+    if progress is not None:
+        if progress.fingerprint != fingerprint or progress.chunk_size != chunk_size:
+            raise ValueError(f"{path}: файл или размер пачки изменились после прерванной загрузки (удалите строку {source} из import_progress)")
+        if progress.finished:
+            logger.info(f"import_source() -> {table}: {path} уже загружен ({progress.inserted} строк)")
+            return {"rows": progress.rows, "inserted": progress.inserted, "rejected": progress.rejected}
+        logger.info(f"import_source() -> {table}: продолжение с пачки {progress.chunks + 1} ({progress.rows} строк загружено)")
+        stats = {"chunks": progress.chunks, "rows": progress.rows, "inserted": progress.inserted, "rejected": progress.rejected}
+    else:
+        stats = {"chunks": 0, "rows": 0, "inserted": 0, "rejected": 0}
+        with import_transaction(engine) as conn:
+            conn.execute(
+                text("""
+                    INSERT INTO import_progress (source, fingerprint, chunk_size, chunks, rows, inserted, rejected, finished)
+                    VALUES (:source, :fingerprint, :chunk_size, 0, 0, 0, 0, :finished)
+                """),
+                {"source": source, "fingerprint": fingerprint, "chunk_size": chunk_size, "finished": False}
+            )
+
+    start = time.perf_counter()
+    rows_done = 0
+    for number, frame in enumerate(read_chunks(path, chunk_size)):
+        if number < stats["chunks"]:
+            continue
+        good, rejected = validate_chunk(table, frame, known_ids)
+        with import_transaction(engine) as conn:
+            inserted = insert_chunk(conn, table, good)
+            stats["chunks"] += 1
+            stats["rows"] += len(frame)
+            stats["inserted"] += inserted
+            stats["rejected"] += len(rejected)
+            conn.execute(
+                text("""
+                    UPDATE import_progress
+                    SET chunks = :chunks, rows = :rows, inserted = :inserted, rejected = :rejected
+                    WHERE source = :source
+                """),
+                {"source": source, **stats}
+            )
+        if len(rejected) and rejected_path is not None:
+            rejected.to_csv(rejected_path, mode="a", index=False, header=not os.path.exists(rejected_path))
+        rows_done += len(frame)
+        elapsed = time.perf_counter() - start
+        logger.info(
+            f"import_source() -> {table}: пачка {stats['chunks']}, строк {stats['rows']} "
+            f"(вставлено {stats['inserted']}, отклонено {stats['rejected']}), {rows_done / elapsed:.0f} строк/сек."
+        )
+
+    with import_transaction(engine) as conn:
+        conn.execute(text("UPDATE import_progress SET finished = :finished WHERE source = :source"), {"source": source, "finished": True})
+    return stats
+
+
+# Загрузка каталога из каталога файлов -------------------------------------------------------------------------------------------------
+def import_catalog(
+        engine: Engine,
+        directory: str,
+        chunk_size: int = IMPORT_CHUNK_SIZE,
+        defer_indexes: bool = True,
+        rejected_dir: Optional[str] = None
+) -> Dict[str, Dict[str, int]]:
+    """
+        Файлы <таблица>.<csv|parquet|ndjson|jsonl> загружаются в порядке TABLE_COLUMNS.<br>
+        defer_indexes - вторичные индексы и триггеры FTS5 / R*Tree / карточек удаляются на время загрузки
+        и восстанавливаются одним проходом в конце (выгодно при загрузке большого объема).
+    """
+    sources = find_sources(directory)
+    if not sources:
+        raise ValueError(f"{directory}: нет файлов {', '.join(TABLE_COLUMNS)} ({', '.join(SOURCE_FORMATS)})")
+    if rejected_dir is not None:
+        os.makedirs(rejected_dir, exist_ok=True)
+
+    start = time.perf_counter()
+    if defer_indexes:
+        defer_maintenance(engine)
+    results = {}
+    for table, path in sources:
+        rejected_path = os.path.join(rejected_dir, f"{table}.rejected.csv") if rejected_dir is not None else None
+        results[table] = import_source(engine, table, path, chunk_size=chunk_size, rejected_path=rejected_path)
+    # отложенные индексы восстанавливаются и после прерванного ранее запуска с defer_indexes
+    restore_maintenance(engine)
+
+    total = sum(stats["rows"] for stats in results.values())
+    logger.info(f"import_catalog() -> {total} строк за {time.perf_counter() - start:.1f} сек.")
+    return results
@@ -0,0 +1,249 @@
+import logging
+import os
+import re
+import threading
+import time
+from collections import Counter
+from contextvars import ContextVar
+from typing import Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Создание логгера
+logger = logging.getLogger(__name__)
+
+# Предупреждение о повторяющихся запросах (N+1): один и тот же запрос (с точностью до параметров) выполнен
+# в одном HTTP запросе больше SQL_REPEAT_THRESHOLD раз. Запросы по списку значений (IN с расширяемым параметром)
+# не учитываются: это загрузка пачками (карточки по IN_CHUNK_SIZE ID), их число растет со строками в N / размер пачки раз
+SQL_REPEAT_THRESHOLD = int(os.getenv("SQL_REPEAT_THRESHOLD", "10"))
+
+# Границы интервалов гистограмм
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+
+# Счетчики SQL запросов одного HTTP запроса ---------------------------------------------------------------------------------------------------
+class RequestStats:
+    """
+        Хранится в контекстной переменной: обработчики в пуле потоков Starlette и run_sync асинхронной
+        сессии получают копию контекста со ссылкой на тот же объект.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.rows = 0
+        self.shapes: Counter = Counter()
+
+    # запросы, повторенные больше threshold раз: [(запрос, число выполнений)]
+    def repeated(self, threshold: int = SQL_REPEAT_THRESHOLD) -> List[Tuple[str, int]]:
+        return [(shape, count) for shape, count in self.shapes.most_common() if count > threshold]
+
+
+# Счетчики текущего HTTP запроса (None - вне запроса)
+request_stats: ContextVar[Optional[RequestStats]] = ContextVar("request_stats", default=None)
+
+
+# Вид запроса без значений параметров: литералы и плейсхолдеры -> ?, списки IN (?, ?, ...) -> (?) -----------------------------------------
+PATTERN_SPACES = re.compile(r"\s+")
+PATTERN_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b|%\([^)]+\)s|%s|\$\d+")
+PATTERN_LISTS = re.compile(r"\?(?:\s*,\s*\?)+")
+
+
+def statement_shape(statement: str) -> str:
+    shape = PATTERN_LITERALS.sub("?", statement)
+    shape = PATTERN_LISTS.sub("?", shape)
+    return PATTERN_SPACES.sub(" ", shape).strip()
+
+
+# Запрос по пачке значений: в скомпилированном запросе есть расширяемый параметр (IN :ids) --------------------------------------------------
+def is_batch(context) -> bool:
+    compiled = context.compiled if context is not None else None
+    return compiled is not None and any(param.expanding for param in compiled.binds.values())
+
+
+# Курсор DB-API с подсчетом выбранных строк -----------------------------------------------------------------------------------------------
+class CountingCursor:
+    """
+        У SQLAlchemy нет события чтения строк: курсор запроса, возвращающего строки, подменяется
+        в контексте выполнения этой оберткой (остальные атрибуты - у исходного курсора).
+    """
+
+    def __init__(self, cursor, stats: RequestStats):
+        self._cursor = cursor
+        self._stats = stats
+
+    def fetchone(self):
+        row = self._cursor.fetchone()
+        if row is not None:
+            self._stats.rows += 1
+        return row
+
+    def fetchmany(self, *args, **kwargs):
+        rows = self._cursor.fetchmany(*args, **kwargs)
+        self._stats.rows += len(rows)
+        return rows
+
+    def fetchall(self):
+        rows = self._cursor.fetchall()
+        self._stats.rows += len(rows)
+        return rows
+
+    def __iter__(self):
+        for row in self._cursor:
+            self._stats.rows += 1
+            yield row
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+# Метрики процесса в текстовом формате Prometheus ------------------------------------------------------------------------------------------
+class Metric:
+
+    def __init__(self, name: str, kind: str, description: str):
+        self.name = name
+        self.kind = kind
+        self.description = description
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def labels_text(labels: Dict[str, str]) -> str:
+        if not labels:
+            return ""
+        escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for value in labels.values())
+        return "{" + ",".join(f'{name}="{value}"' for name, value in zip(labels, escaped)) + "}"
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} {self.kind}"]
+
+
+class CounterMetric(Metric):
+
+    def __init__(self, name: str, description: str):
+        super().__init__(name, "counter", description)
+        self._values: Dict[Tuple, float] = {}
+
+    def inc(self, value: float = 1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + value
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = list(self._values.items())
+        return self.header() + [f"{self.name}{self.labels_text(dict(key))} {value}" for key, value in values]
+
+
+class HistogramMetric(Metric):
+
+    def __init__(self, name: str, description: str, buckets: Iterable[float]):
+        super().__init__(name, "histogram", description)
+        self.buckets = tuple(buckets)
+        # метки -> [счетчики по интервалам, сумма, количество]
+        self._values: Dict[Tuple, list] = {}
+
+    def observe(self, value: float, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            counts, total, count = self._values.get(key) or ([0] * len(self.buckets), 0.0, 0)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            self._values[key] = [counts, total + value, count + 1]
+
+    def render(self) -> List[str]:
+        with self._lock:
+            values = [(key, list(counts), total, count) for key, (counts, total, count) in self._values.items()]
+        lines = self.header()
+        for key, counts, total, count in values:
+            labels = dict(key)
+            for bound, bucket_count in zip(self.buckets, counts):
+                lines.append(f"{self.name}_bucket{self.labels_text({**labels, 'le': str(bound)})} {bucket_count}")
+            lines.append(f"{self.name}_bucket{self.labels_text({**labels, 'le': '+Inf'})} {count}")
+            lines.append(f"{self.name}_sum{self.labels_text(labels)} {total}")
+            lines.append(f"{self.name}_count{self.labels_text(labels)} {count}")
+        return lines
+
+
+# Метрики HTTP запросов и SQL (значения - на процесс: при нескольких воркерах Prometheus суммирует по экземплярам)
+http_requests = CounterMetric("nebus_http_requests_total", "HTTP запросы")
+http_request_duration = HistogramMetric("nebus_http_request_duration_seconds", "Время обработки HTTP запроса", DURATION_BUCKETS)
+http_request_queries = HistogramMetric("nebus_http_request_db_queries", "Число SQL запросов на HTTP запрос", QUERY_COUNT_BUCKETS)
+http_request_db_duration = HistogramMetric("nebus_http_request_db_duration_seconds", "Время SQL запросов на HTTP запрос", DURATION_BUCKETS)
+db_queries = CounterMetric("nebus_db_queries_total", "SQL запросы")
+db_query_duration = CounterMetric("nebus_db_query_duration_seconds_total", "Суммарное время SQL запросов")
+db_rows = CounterMetric("nebus_db_rows_fetched_total", "Строки, выбранные из БД в HTTP запросах")
+repeated_statements = CounterMetric("nebus_db_repeated_statements_total", f"HTTP запросы с SQL запросом, повторенным больше {SQL_REPEAT_THRESHOLD} раз")
+
+METRICS = [
+    http_requests, http_request_duration, http_request_queries, http_request_db_duration,
+    db_queries, db_query_duration, db_rows, repeated_statements,
+]
+
+
+# Движки с подключенными счетчиками (повторный create_app() не должен удваивать счет)
+instrumented_engines = set()
+
+
+# Подключение счетчиков к движку (для асинхронного движка - к async_engine.sync_engine) ----------------------------------------------------
+def instrument_engine(engine: Engine, name: str):
+    """
+        name - метка engine в метриках (sync / async).
+    """
+    if engine in instrumented_engines:
+        return
+    instrumented_engines.add(engine)
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_start_time", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_start_time"].pop()
+        db_queries.inc(engine=name)
+        db_query_duration.inc(elapsed, engine=name)
+        stats = request_stats.get()
+        if stats is None:
+            return
+        stats.queries += 1
+        stats.db_time += elapsed
+        if not is_batch(context):
+            stats.shapes[statement_shape(statement)] += 1
+        if context is not None and cursor.description is not None:
+            context.cursor = CountingCursor(cursor, stats)
+
+    # ошибка выполнения: время начала запроса снимается со стека
+    @event.listens_for(engine, "handle_error")
+    def handle_error(exception_context):
+        connection = exception_context.connection
+        if connection is not None and connection.info.get("query_start_time"):
+            connection.info["query_start_time"].pop()
+
+
+# Учет завершенного HTTP запроса: метрики и предупреждение о повторяющихся SQL запросах ---------------------------------------------------
+def record_request(stats: RequestStats, method: str, route: str, status: int):
+    elapsed = time.perf_counter() - stats.started
+    http_requests.inc(method=method, route=route, status=str(status))
+    http_request_duration.observe(elapsed, method=method, route=route)
+    http_request_queries.observe(stats.queries, method=method, route=route)
+    http_request_db_duration.observe(stats.db_time, method=method, route=route)
+    db_rows.inc(stats.rows, route=route)
+    repeated = stats.repeated()
+    if repeated:
+        repeated_statements.inc(route=route)
+        for shape, count in repeated:
+            logger.warning(f"record_request() -> {method} {route}: запрос выполнен {count} раз (возможно N+1): {shape[:300]}")
+
+
+# Текст метрик (формат Prometheus 0.0.4); extra - дополнительные значения {имя: значение} -----------------------------------------------------
+def render_metrics(extra: Optional[Dict[str, float]] = None) -> str:
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+    for name, value in (extra or {}).items():
+        lines.append(f"# TYPE {name} gauge")
+        lines.append(f"{name} {value}")
+    return "\n".join(lines) + "\n"
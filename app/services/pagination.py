@@ -0,0 +1,80 @@
+import base64
+import binascii
+import functools
+import json
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+from sqlalchemy import Select, bindparam, select, tuple_
+from sqlalchemy.orm import Session
+from app.services.repository import fetch_all, organizations
+
+# Создание логгера
+logger = logging.getLogger(__name__)
+
+# Размер страницы по умолчанию и жесткое ограничение сверху
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+
+# Курсор страницы - (name, id) последней организации предыдущей страницы в base64url(JSON) -----------------------------------------------------
+def encode_cursor(name: str, id: int) -> str:
+    data = json.dumps([name, id], ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(data).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, int]:
+    """ValueError - курсор поврежден."""
+    try:
+        data = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        name, id = json.loads(data.decode("utf-8"))
+    except (binascii.Error, UnicodeDecodeError, ValueError, TypeError) as e:
+        raise ValueError(f"Некорректный курсор: {cursor}") from e
+    if not isinstance(name, str) or not isinstance(id, int):
+        raise ValueError(f"Некорректный курсор: {cursor}")
+    return name, id
+
+
+# Запрос страницы организаций по подзапросу ID (собирается один раз на подзапрос) ---------------------------------------------------------------
+@functools.lru_cache(maxsize=64)
+def keyset_query(subquery: Select, after: bool) -> Select:
+    """
+        subquery - подзапрос ID организаций из app.services.repository (SUBQUERY_*) или собранный из них.
+    """
+    query = select(organizations.c.id, organizations.c.name).where(organizations.c.id.in_(subquery))
+    if after:
+        query = query.where(tuple_(organizations.c.name, organizations.c.id) > tuple_(bindparam("after_name"), bindparam("after_id")))
+    return query.order_by(organizations.c.name, organizations.c.id).limit(bindparam("page_limit"))
+
+
+# Страница организаций по (name, id) с отбором по подзапросу ID -----------------------------------------------------------------------------
+def keyset_page(
+        db: Session,
+        subquery: Select,
+        params: Dict[str, Any],
+        limit: int = DEFAULT_PAGE_SIZE,
+        cursor: Optional[str] = None
+) -> Tuple[List, Optional[str]]:
+    """
+        Возвращает (строки (id, name), курсор следующей страницы или None).<br>
+        subquery - подзапрос ID организаций (select(), значения - через params).<br>
+        Страница выбирается условием (name, id) > курсора по индексу на name, поэтому
+        любая страница стоит столько же, сколько первая (в отличие от OFFSET).
+    """
+    logger.info(f"keyset_page() -> ...")
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    after = decode_cursor(cursor) if cursor else None
+
+    query = keyset_query(subquery, after is not None)
+    query_params = dict(params, page_limit=limit + 1)
+    if after:
+        query_params.update(after_name=after[0], after_id=after[1])
+    logger.debug(f"query: {query}")
+    rows = fetch_all(db, query, query_params)
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].name, rows[-1].id)
+    logger.debug(f"rows: {rows}, next_cursor: {next_cursor}")
+    logger.debug(f"End keyset_page() -> ...")
+    return rows, next_cursor
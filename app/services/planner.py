@@ -0,0 +1,85 @@
+import logging
+import time
+from typing import Callable, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy.orm import Session
+from app.geo.spatial import bounding_box
+from app.services.bitmaps import Bitmap
+from app.services.repository import fetch_all
+from app.services.search import name_filter
+from app.services.snapshot_file import CatalogSnapshot
+
+# Создание логгера
+logger = logging.getLogger(__name__)
+
+
+# Комбинированный поиск организаций по снимку каталога: деятельность (с вложенными) И радиус И название ------------------------------------------
+def plan_search(
+        db: Session,
+        snapshot: CatalogSnapshot,
+        activity_id: Optional[int] = None,
+        point: Optional[Tuple[float, float, float]] = None,
+        name: Optional[str] = None
+) -> Tuple[np.ndarray, Optional[np.ndarray], Optional[np.ndarray]]:
+    """
+        Возвращает (организации, ближайшее здание каждой, расстояние до него) - порядковые номера организаций
+        по возрастанию (порядок выдачи по (name, id)), здания и расстояния - только при отборе по радиусу.<br>
+        point - (latitude, longitude, radius км.).<br>
+        Фильтры по снимку пересекаются от самого селективного по числу элементов множеств без их чтения:
+        деятельность - точное число (activity_tree), радиус - сумма по ячейкам сетки описанного прямоугольника (оценка сверху).
+        Множество ячеек читается, только если радиус - самый селективный фильтр, иначе кандидаты проверяются
+        по расстоянию сразу. Точное расстояние считается только для оставшихся кандидатов (по всем их зданиям).<br>
+        Название проверяется в БД (полнотекстовый индекс) последним и не проверяется, если кандидатов уже не осталось.
+    """
+    logger.info(f"plan_search() -> ...")
+    start = time.perf_counter()
+    size = len(snapshot)
+    steps: List[Tuple[str, int, Callable[[], Bitmap]]] = []
+    if activity_id is not None:
+        activity = snapshot.activity_ordinals_of([activity_id])
+        if not len(activity):
+            return np.zeros(0, dtype=np.uint32), None, None
+        activity = int(activity[0])
+        steps.append(("activity", int(snapshot.activity_tree_counts[activity]), lambda: snapshot.activity_tree_index.get(activity)))
+    if point is not None:
+        latitude, longitude, radius = point
+        cells = snapshot.geo_cells_in_box(*bounding_box(latitude, longitude, radius))
+        steps.append(("geo", snapshot.geo_cell_index.cardinality(cells), lambda: snapshot.geo_bitmap(cells)))
+    steps.sort(key=lambda step: step[1])
+
+    plan = []
+    result = None
+    for label, estimate, load in steps:
+        if result is not None and label == "geo":
+            plan.append((label, estimate, "по расстоянию"))
+            continue
+        result = load() if result is None else result & load()
+        plan.append((label, estimate, len(result)))
+        if not len(result):
+            break
+
+    ordinals = result.to_array() if result is not None else np.zeros(0, dtype=np.uint32)
+    buildings = distances = None
+    if point is not None:
+        buildings, distances = snapshot.nearest_buildings(ordinals.astype(np.int64), latitude, longitude)
+        inside = distances <= radius
+        ordinals, buildings, distances = ordinals[inside], buildings[inside], distances[inside]
+        plan.append(("radius", len(inside), len(ordinals)))
+
+    if name is not None and (result is None or len(ordinals)):
+        condition = name_filter(db=db, name=name)
+        found = np.zeros(0, dtype=np.int32)
+        if condition is not None:
+            subquery, params = condition
+            found = np.unique(snapshot.ordinals_of(row[0] for row in fetch_all(db, subquery, params)))
+        if result is None:
+            ordinals = found.astype(np.uint32)
+        else:
+            inside = Bitmap.from_array(size, found).contains(ordinals)
+            ordinals = ordinals[inside]
+            if point is not None:
+                buildings, distances = buildings[inside], distances[inside]
+        plan.append(("name", len(found), len(ordinals)))
+    logger.debug(f"plan: {plan} (фильтр, оценка, осталось), {(time.perf_counter() - start) * 1000:.2f} мс.")
+    return ordinals, buildings, distances
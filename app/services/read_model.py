@@ -0,0 +1,77 @@
+import logging
+import time
+from typing import Dict, List
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+from app.services.cards import chunked, load_joined_cards, load_stored_cards
+from app.services.repository import connection_of
+
+# Создание логгера
+logger = logging.getLogger(__name__)
+
+# Карточки всех организаций (тот же запрос, что в триггерах миграции a9c4e7d2f318): здание с наименьшим ID,
+# телефоны в порядке добавления, деятельности в порядке (level, parent_id, id) - в JSON
+INSERT_ALL_CARDS = text("""
+    INSERT INTO organization_cards (id, name, building_id, address, latitude, longitude, phones, activities)
+    SELECT
+        o.id, o.name, b.id, b.address, b.latitude, b.longitude,
+        (
+            SELECT json_group_array(p.phone_number)
+            FROM (SELECT phone_number FROM phones WHERE organization_id = o.id ORDER BY id) p
+        ),
+        (
+            SELECT json_group_array(json_object('id', a.id, 'level', a.level, 'name', a.name, 'parent_id', a.parent_id))
+            FROM (
+                SELECT c.id, c.level, c.name, c.parent_id
+                FROM organization_activity oa
+                JOIN activities c ON c.id = oa.activity_id
+                WHERE oa.organization_id = o.id
+                ORDER BY c.level, c.parent_id, c.id
+            ) a
+        )
+    FROM organizations o
+    LEFT JOIN buildings b ON b.id = (SELECT MIN(building_id) FROM building_organization WHERE organization_id = o.id)
+""")
+
+
+# Полное перестроение таблицы organization_cards (после загрузки без триггеров или при расхождении) ------------------------------------------
+def rebuild_organization_cards(conn: Connection) -> int:
+    """
+        Выполняется в транзакции вызывающего кода: читатели видят прежние карточки до commit.<br>
+        Возвращает число карточек.
+    """
+    logger.info(f"rebuild_organization_cards() -> ...")
+    start = time.perf_counter()
+    conn.execute(text("DELETE FROM organization_cards"))
+    count = conn.execute(INSERT_ALL_CARDS).rowcount
+    logger.info(f"rebuild_organization_cards() -> перестроено {count} карточек за {time.perf_counter() - start:.1f} сек.")
+    return count
+
+
+# Сверка organization_cards с нормализованными таблицами -------------------------------------------------------------------------------------
+def check_organization_cards(db: Session) -> Dict[str, List[int]]:
+    """
+        Возвращает ID организаций с расхождениями:<br>
+        missing - организации без карточки,<br>
+        stale - карточки удаленных организаций,<br>
+        different - карточка не совпадает с собранной по нормализованным таблицам.
+    """
+    logger.info(f"check_organization_cards() -> ...")
+    conn = connection_of(db)
+    organization_ids = {row[0] for row in conn.execute(text("SELECT id FROM organizations"))}
+    card_ids = {row[0] for row in conn.execute(text("SELECT id FROM organization_cards"))}
+
+    different = []
+    for chunk in chunked(sorted(organization_ids & card_ids)):
+        stored = load_stored_cards(db, chunk)
+        joined = load_joined_cards(db, chunk)
+        different += [id for id in chunk if stored[id].model_dump() != joined[id].model_dump()]
+
+    result = {
+        "missing": sorted(organization_ids - card_ids),
+        "stale": sorted(card_ids - organization_ids),
+        "different": different,
+    }
+    logger.debug(f"End check_organization_cards() -> {({name: len(ids) for name, ids in result.items()})}")
+    return result
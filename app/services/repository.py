@@ -0,0 +1,247 @@
+import logging
+from typing import Any, Dict, List
+from sqlalchemy import bindparam, column, func, literal_column, or_, select, table, tuple_
+from sqlalchemy.engine import Connection, Row
+from sqlalchemy.orm import Session
+from app.models.activity import Activity
+from app.models.activity_closure import ActivityClosure
+from app.models.building import Building
+from app.models.building_organization import BuildingOrganization
+from app.models.change_log import ChangeLog, ChangeLogState
+from app.models.organization import Organization
+from app.models.organization_activity import OrganizationActivity
+from app.models.phones import Phones
+
+# Создание логгера
+logger = logging.getLogger(__name__)
+
+# Таблицы моделей (запросы строятся на уровне Core: строки возвращаются без ORM объектов)
+activities = Activity.__table__
+activity_closure = ActivityClosure.__table__
+buildings = Building.__table__
+building_organization = BuildingOrganization.__table__
+organizations = Organization.__table__
+organization_activity = OrganizationActivity.__table__
+phones = Phones.__table__
+change_log = ChangeLog.__table__
+change_log_state = ChangeLogState.__table__
+# Карточки организаций одной строкой (только SQLite, таблица и триггеры создаются миграцией - модели нет)
+organization_cards = table(
+    "organization_cards",
+    column("id"), column("name"), column("building_id"), column("address"), column("latitude"), column("longitude"),
+    column("phones"), column("activities")
+)
+
+# Полнотекстовый индекс названий (только SQLite, виртуальная таблица FTS5 создается миграцией - модели нет):
+# скрытая колонка с именем таблицы - левая часть MATCH, rank - релевантность bm25
+organizations_fts = table("organizations_fts", column("rowid"), column("rank"), column("organizations_fts"))
+
+# Запросы собираются один раз при импорте, значения передаются только через параметры: SQL текст каждого запроса
+# постоянен, поэтому он компилируется один раз (кэш SQLAlchemy) и переиспользуется подготовленным в драйвере.
+
+# Здания ------------------------------------------------------------------------------------------------------------------------------------
+SELECT_ALL_BUILDINGS = (
+    select(buildings.c.id, buildings.c.address, buildings.c.latitude, buildings.c.longitude)
+    .order_by(buildings.c.address, buildings.c.id)
+)
+SELECT_BUILDING_BY_ORGANIZATION = (
+    select(buildings.c.id, buildings.c.address, buildings.c.latitude, buildings.c.longitude)
+    .select_from(building_organization.join(buildings, buildings.c.id == building_organization.c.building_id))
+    .where(building_organization.c.organization_id == bindparam("organization_id"))
+    .order_by(buildings.c.id)
+    .limit(1)
+)
+
+# Телефоны ----------------------------------------------------------------------------------------------------------------------------------
+SELECT_PHONES = (
+    select(phones.c.organization_id, phones.c.phone_number)
+    .where(phones.c.organization_id == bindparam("organization_id"))
+    .order_by(phones.c.id)
+)
+
+# Деятельности ------------------------------------------------------------------------------------------------------------------------------
+ACTIVITY_COLUMNS = (activities.c.id, activities.c.name, activities.c.parent_id, activities.c.level)
+SELECT_ACTIVITIES = select(*ACTIVITY_COLUMNS).order_by(activities.c.level, activities.c.parent_id, activities.c.id)
+SELECT_ACTIVITIES_BY_ORGANIZATION = (
+    select(*ACTIVITY_COLUMNS)
+    .select_from(organization_activity.join(activities, activities.c.id == organization_activity.c.activity_id))
+    .where(organization_activity.c.organization_id == bindparam("organization_id"))
+    .order_by(activities.c.level, activities.c.parent_id, activities.c.id)
+)
+SELECT_ACTIVITY = select(*ACTIVITY_COLUMNS).where(activities.c.id == bindparam("activity_id"))
+SELECT_ACTIVITIES_BY_IDS = select(*ACTIVITY_COLUMNS).where(activities.c.id.in_(bindparam("activity_ids", expanding=True)))
+# все деятельности без сортировки (для дерева деятельностей в памяти)
+SELECT_ACTIVITY_ROWS = select(*ACTIVITY_COLUMNS)
+
+# Организации -------------------------------------------------------------------------------------------------------------------------------
+SELECT_ORGANIZATION = select(organizations.c.id, organizations.c.name).where(organizations.c.id == bindparam("organization_id"))
+# организации после курсора (name, id) в порядке выдачи - по правилам сравнения строк БД
+SELECT_ORGANIZATION_IDS_AFTER = (
+    select(organizations.c.id)
+    .where(tuple_(organizations.c.name, organizations.c.id) > tuple_(bindparam("after_name"), bindparam("after_id")))
+    .order_by(organizations.c.name, organizations.c.id)
+    .limit(bindparam("page_limit"))
+)
+SELECT_ORGANIZATIONS_BY_BUILDING = (
+    select(organizations.c.id, organizations.c.name, buildings.c.address)
+    .select_from(
+        building_organization
+        .join(organizations, organizations.c.id == building_organization.c.organization_id)
+        .join(buildings, buildings.c.id == building_organization.c.building_id)
+    )
+    .where(building_organization.c.building_id == bindparam("building_id"))
+    .order_by(organizations.c.name, organizations.c.id)
+)
+SELECT_ORGANIZATIONS_BY_BUILDINGS = (
+    select(organizations.c.id, organizations.c.name, building_organization.c.building_id)
+    .select_from(building_organization.join(organizations, organizations.c.id == building_organization.c.organization_id))
+    .where(building_organization.c.building_id.in_(bindparam("building_ids", expanding=True)))
+    .order_by(organizations.c.name, organizations.c.id)
+)
+SELECT_ORGANIZATIONS_BY_ACTIVITY = (
+    select(organizations.c.id, organizations.c.name)
+    .distinct()
+    .select_from(organization_activity.join(organizations, organizations.c.id == organization_activity.c.organization_id))
+    .where(organization_activity.c.activity_id == bindparam("activity_id"))
+    .order_by(organizations.c.name, organizations.c.id)
+)
+SELECT_ORGANIZATIONS_BY_ACTIVITY_TREE = (
+    select(organizations.c.id, organizations.c.name)
+    .distinct()
+    .select_from(
+        activity_closure
+        .join(organization_activity, organization_activity.c.activity_id == activity_closure.c.descendant_id)
+        .join(organizations, organizations.c.id == organization_activity.c.organization_id)
+    )
+    .where(activity_closure.c.ancestor_id == bindparam("activity_id"))
+    .order_by(organizations.c.name, organizations.c.id)
+)
+
+# Подзапросы ID организаций (постраничная выдача и потоковое чтение ID) --------------------------------------------------------------------
+SUBQUERY_ORGANIZATIONS_BY_BUILDING = (
+    select(building_organization.c.organization_id)
+    .where(building_organization.c.building_id == bindparam("building_id"))
+)
+SUBQUERY_ORGANIZATIONS_BY_BUILDINGS = (
+    select(building_organization.c.organization_id)
+    .where(building_organization.c.building_id.in_(bindparam("building_ids", expanding=True)))
+)
+SUBQUERY_ORGANIZATIONS_BY_ACTIVITY = (
+    select(organization_activity.c.organization_id)
+    .where(organization_activity.c.activity_id == bindparam("activity_id"))
+)
+SUBQUERY_ORGANIZATIONS_BY_ACTIVITY_TREE = (
+    select(organization_activity.c.organization_id)
+    .select_from(activity_closure.join(organization_activity, organization_activity.c.activity_id == activity_closure.c.descendant_id))
+    .where(activity_closure.c.ancestor_id == bindparam("activity_id"))
+)
+# ID организаций в здании по названию (для потоковой выдачи; по деятельности - SELECT_ORGANIZATIONS_BY_ACTIVITY*, первая колонка - ID)
+SELECT_ORGANIZATION_IDS_BY_BUILDING = (
+    select(organizations.c.id)
+    .select_from(building_organization.join(organizations, organizations.c.id == building_organization.c.organization_id))
+    .where(building_organization.c.building_id == bindparam("building_id"))
+    .order_by(organizations.c.name, organizations.c.id)
+)
+
+# Поиск организаций по названию (значения параметров - app.services.search) ----------------------------------------------------------------
+# SQLite: FTS5, :match - слова запроса как префиксы
+NAME_MATCH_FTS = organizations_fts.c.organizations_fts.op("MATCH")(bindparam("match"))
+# PostgreSQL: tsvector (:ts - tsquery) или подстрока (:pattern); конфигурация - константой, как в индексе по to_tsvector
+TS_CONFIG = literal_column("'simple'")
+NAME_TSVECTOR = func.to_tsvector(TS_CONFIG, organizations.c.name)
+NAME_TSQUERY = func.to_tsquery(TS_CONFIG, bindparam("ts"))
+NAME_MATCH_POSTGRESQL = or_(
+    NAME_TSVECTOR.op("@@")(NAME_TSQUERY),
+    func.lower(organizations.c.name).like(func.lower(bindparam("pattern")), escape="\\")
+)
+# без полнотекстового индекса: подстрока (:pattern) без учета регистра (в SQLite - только для ASCII)
+NAME_MATCH_LIKE = func.upper(organizations.c.name).like(func.upper(bindparam("pattern")), escape="\\")
+
+# страница найденных организаций (id, name), наиболее релевантные - первыми
+SEARCH_ORGANIZATIONS_FTS = (
+    select(organizations.c.id, organizations.c.name)
+    .select_from(organizations_fts.join(organizations, organizations.c.id == organizations_fts.c.rowid))
+    .where(NAME_MATCH_FTS)
+    .order_by(organizations_fts.c.rank, organizations.c.name)
+    .limit(bindparam("page_limit"))
+    .offset(bindparam("page_offset"))
+)
+SEARCH_ORGANIZATIONS_POSTGRESQL = (
+    select(organizations.c.id, organizations.c.name)
+    .where(NAME_MATCH_POSTGRESQL)
+    .order_by(
+        func.ts_rank(NAME_TSVECTOR, NAME_TSQUERY).desc(),
+        func.similarity(func.lower(organizations.c.name), func.lower(bindparam("name"))).desc(),
+        organizations.c.name
+    )
+    .limit(bindparam("page_limit"))
+    .offset(bindparam("page_offset"))
+)
+SEARCH_ORGANIZATIONS_LIKE = (
+    select(organizations.c.id, organizations.c.name)
+    .where(NAME_MATCH_LIKE)
+    .order_by(organizations.c.name)
+    .limit(bindparam("page_limit"))
+    .offset(bindparam("page_offset"))
+)
+# подзапросы ID организаций с тем же отбором, без ранжирования (постраничная выдача по (name, id))
+SUBQUERY_ORGANIZATIONS_BY_NAME_FTS = select(organizations_fts.c.rowid).where(NAME_MATCH_FTS)
+SUBQUERY_ORGANIZATIONS_BY_NAME_POSTGRESQL = select(organizations.c.id).where(NAME_MATCH_POSTGRESQL)
+SUBQUERY_ORGANIZATIONS_BY_NAME_LIKE = select(organizations.c.id).where(NAME_MATCH_LIKE)
+
+# Здания организаций из списка (для выбора ближайшего здания)
+SELECT_BUILDINGS_OF_ORGANIZATIONS = (
+    select(building_organization.c.organization_id, building_organization.c.building_id)
+    .where(building_organization.c.organization_id.in_(bindparam("organization_ids", expanding=True)))
+)
+
+# Карточки организаций по пачке ID ---------------------------------------------------------------------------------------------------------
+SELECT_CARD_ORGANIZATIONS = (
+    select(
+        organizations.c.id,
+        organizations.c.name,
+        buildings.c.id.label("building_id"),
+        buildings.c.address,
+        buildings.c.latitude,
+        buildings.c.longitude
+    )
+    .select_from(
+        organizations
+        .outerjoin(building_organization, building_organization.c.organization_id == organizations.c.id)
+        .outerjoin(buildings, buildings.c.id == building_organization.c.building_id)
+    )
+    .where(organizations.c.id.in_(bindparam("ids", expanding=True)))
+    # первое здание организации - с наименьшим ID (как в SELECT_BUILDING_BY_ORGANIZATION)
+    .order_by(organizations.c.id, building_organization.c.building_id)
+)
+SELECT_CARD_PHONES = (
+    select(phones.c.organization_id, phones.c.phone_number)
+    .where(phones.c.organization_id.in_(bindparam("ids", expanding=True)))
+    .order_by(phones.c.id)
+)
+SELECT_CARD_ACTIVITIES = (
+    select(organization_activity.c.organization_id, *ACTIVITY_COLUMNS)
+    .select_from(organization_activity.join(activities, activities.c.id == organization_activity.c.activity_id))
+    .where(organization_activity.c.organization_id.in_(bindparam("ids", expanding=True)))
+    .order_by(activities.c.level, activities.c.parent_id, activities.c.id)
+)
+# карточки из таблицы organization_cards (одна строка на организацию)
+SELECT_ORGANIZATION_CARDS = (
+    select(organization_cards)
+    .where(organization_cards.c.id.in_(bindparam("ids", expanding=True)))
+)
+
+
+# Соединение сессии: запрос Core выполняется мимо ORM (без компиляции ORM контекста и событий сессии) ----------------------------------------
+def connection_of(db) -> Connection:
+    return db.connection() if isinstance(db, Session) else db
+
+
+# Строки запроса (Row: доступ к колонкам по имени и индексу) ----------------------------------------------------------------------------------
+def fetch_all(db, statement, params: Dict[str, Any] = None) -> List[Row]:
+    return connection_of(db).execute(statement, params or {}).all()
+
+
+# Первая строка запроса или None
+def fetch_one(db, statement, params: Dict[str, Any] = None) -> Row:
+    return connection_of(db).execute(statement, params or {}).first()
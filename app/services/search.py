@@ -0,0 +1,106 @@
+import logging
+import re
+from typing import Any, Dict, List, Optional, Tuple
+from sqlalchemy import Select
+from sqlalchemy.engine import Row
+from sqlalchemy.orm import Session
+from app.database.database import has_table
+from app.services import repository
+
+# Создание логгера
+logger = logging.getLogger(__name__)
+
+# Размер страницы результатов поиска по названию
+DEFAULT_SEARCH_LIMIT = 100
+MAX_SEARCH_LIMIT = 500
+
+# Слова запроса (буквы/цифры в любом алфавите) - все остальные символы отбрасываются,
+# поэтому синтаксис FTS5/tsquery из пользовательского ввода не попадает в запрос
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+
+# Слова поискового запроса ---------------------------------------------------------------------------------------------------------------
+def query_words(name: str) -> List[str]:
+    return _WORD_RE.findall(name or "")
+
+
+# Запрос FTS5: все слова как префиксы ("мол"* "зав"*) ---------------------------------------------------------------------------------------
+def fts5_query(name: str) -> Optional[str]:
+    words = query_words(name)
+    if not words:
+        return None
+    return " ".join(f'"{word}"*' for word in words)
+
+
+# Запрос tsquery PostgreSQL: все слова как префиксы (мол:* & зав:*) ------------------------------------------------------------------------
+def tsquery(name: str) -> Optional[str]:
+    words = query_words(name)
+    if not words:
+        return None
+    return " & ".join(f"{word}:*" for word in words)
+
+
+# Поиск организаций по названию ------------------------------------------------------------------------------------------------------------
+def search_organizations(
+        db: Session,
+        name: str,
+        limit: int = DEFAULT_SEARCH_LIMIT,
+        offset: int = 0
+) -> List[Row]:
+    """
+        Поиск организаций по словам названия (каждое слово запроса - префикс слова названия),
+        наиболее релевантные - первыми. Возвращает не более limit строк (id, name) начиная с offset.<br>
+        SQLite - FTS5 индекс organizations_fts (ранжирование bm25),<br>
+        PostgreSQL - tsvector + pg_trgm (ранжирование ts_rank, затем similarity),<br>
+        иначе (индекс не создан) - LIKE по подстроке.<br>
+        Запросы - app.services.repository.SEARCH_ORGANIZATIONS_*.
+    """
+    logger.info(f"search_organizations() -> ...")
+    logger.debug(f"Поиск организаций по названию: name={name}, limit={limit}, offset={offset} ...")
+    page = {"page_limit": max(1, min(limit, MAX_SEARCH_LIMIT)), "page_offset": max(0, offset)}
+    dialect = db.get_bind().dialect.name
+
+    if dialect == "sqlite" and has_table(db, "organizations_fts"):
+        match = fts5_query(name)
+        if match is None:
+            return []
+        query, params = repository.SEARCH_ORGANIZATIONS_FTS, {"match": match}
+    elif dialect == "postgresql":
+        ts = tsquery(name)
+        if ts is None:
+            return []
+        query, params = repository.SEARCH_ORGANIZATIONS_POSTGRESQL, {"ts": ts, "pattern": like_pattern(name), "name": name}
+    else:
+        logger.warning(f"Полнотекстовый индекс не найден - поиск по LIKE (в SQLite без учета регистра только для ASCII)")
+        query, params = repository.SEARCH_ORGANIZATIONS_LIKE, {"pattern": like_pattern(name)}
+
+    organizations = repository.fetch_all(db, query, {**params, **page})
+    logger.debug(f"organizations: {organizations}")
+    logger.debug(f"End search_organizations() -> ...")
+    return organizations
+
+
+# Шаблон LIKE для поиска по подстроке (с экранированием % и _) ----------------------------------------------------------------------------
+def like_pattern(name: str) -> str:
+    escaped = (name or "").replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+# Подзапрос ID организаций, подходящих под название (для постраничной выдачи по (name, id)) ----------------------------------------------------
+def name_filter(db: Session, name: str) -> Optional[Tuple[Select, Dict[str, Any]]]:
+    """
+        Возвращает (подзапрос app.services.repository.SUBQUERY_ORGANIZATIONS_BY_NAME_*, параметры) с тем же условием
+        отбора, что и search_organizations, но без ранжирования. None - в запросе нет ни одного слова.
+    """
+    dialect = db.get_bind().dialect.name
+    if dialect == "sqlite" and has_table(db, "organizations_fts"):
+        match = fts5_query(name)
+        if match is None:
+            return None
+        return repository.SUBQUERY_ORGANIZATIONS_BY_NAME_FTS, {"match": match}
+    if dialect == "postgresql":
+        ts = tsquery(name)
+        if ts is None:
+            return None
+        return repository.SUBQUERY_ORGANIZATIONS_BY_NAME_POSTGRESQL, {"ts": ts, "pattern": like_pattern(name)}
+    return repository.SUBQUERY_ORGANIZATIONS_BY_NAME_LIKE, {"pattern": like_pattern(name)}
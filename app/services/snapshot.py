@@ -0,0 +1,125 @@
+import logging
+import os
+import threading
+from typing import Dict, Optional
+from sqlalchemy.engine import Connection, Engine
+
+try:
+    import fcntl
+except ImportError:  # Windows - построение снимка без блокировки файла
+    fcntl = None
+
+# Создание логгера
+logger = logging.getLogger(__name__)
+
+# Файл снимка каталога (пусто - снимок не используется, обработчики читают из БД)
+SNAPSHOT_PATH = os.getenv("SNAPSHOT_PATH", "")
+
+
+# Снимок каталога на процесс: открытие файла и переоткрытие после подмены ------------------------------------------------------------------------
+class SnapshotService:
+    """
+        Снимок (app.services.snapshot_file) строится по БД и подменяется атомарно (os.replace), поэтому
+        при каждом обращении сверяется файл по пути (os.stat): новый файл открывается, открытый прежний
+        остается у запросов, которые его уже читают. Нет файла - обработчики читают из БД.<br>
+        В снимке хранится версия каталога, по которой он построен: get(version) отдает снимок только этой версии,
+        поэтому после записи ответ новой версии не строится по прежнему снимку, даже если файл еще не удален.<br>
+        numpy и модуль снимка импортируются только при наличии файла.
+    """
+
+    def __init__(self, path: str = SNAPSHOT_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._key = None
+        self._snapshot = None
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.path)
+
+    # текущий снимок или None (снимок не настроен, не построен, поврежден или построен не для версии version)
+    def get(self, version: Optional[int] = None):
+        snapshot = self.open()
+        if snapshot is not None and version is not None and snapshot.meta.get("catalog_version") != version:
+            return None
+        return snapshot
+
+    # снимок по пути (переоткрывается после подмены файла)
+    def open(self):
+        if not self.enabled:
+            return None
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            self._key = self._snapshot = None
+            return None
+        key = (stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns)
+        if key == self._key:
+            return self._snapshot
+        with self._lock:
+            if key != self._key:
+                from app.services.snapshot_file import CatalogSnapshot
+                try:
+                    self._snapshot = CatalogSnapshot(self.path)
+                    logger.info(f"SnapshotService: открыт снимок {self.path} ({self._snapshot.meta})")
+                except (OSError, ValueError) as e:
+                    logger.error(f"SnapshotService: снимок {self.path} не открыт: {e}")
+                    self._snapshot = None
+                self._key = key
+            return self._snapshot
+
+    # построение снимка по БД и подмена файла (построения из разных процессов выполняются по очереди)
+    def rebuild(self, bind: Engine = None) -> Optional[Dict]:
+        """
+            Все запросы построения выполняются в одной транзакции чтения (begin_read), первым из них читается
+            версия каталога (app.services.changes.catalog_version), она записывается в снимок. Если к подмене файла
+            версия изменилась, файл не подменяется: записавший обработчик уже удалил снимок и запланировал новое построение.
+        """
+        if not self.enabled:
+            return None
+        from app.services.changes import catalog_version
+        from app.services.snapshot_file import build_snapshot
+        if bind is None:
+            from app.database.database import read_engine as bind
+        with open(self.path + ".lock", "w") as lock:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            with bind.connect() as conn:
+                begin_read(conn)
+                version = catalog_version(conn)
+
+                # версия после построения - на том же соединении после завершения транзакции чтения
+                def is_current() -> bool:
+                    conn.rollback()
+                    return catalog_version(conn) == version
+
+                result = build_snapshot(conn, self.path, is_current=is_current, version=version)
+                # запись, зафиксированная между проверкой и подменой, удалила прежний файл раньше, чем подменен этот
+                if result is not None and not is_current():
+                    self.invalidate()
+                    return None
+            return result
+
+    # удаление снимка после записи в каталог: до перестроения все процессы читают из БД
+    def invalidate(self):
+        if not self.enabled:
+            return
+        try:
+            os.unlink(self.path)
+            logger.info(f"SnapshotService: снимок {self.path} удален до перестроения")
+        except FileNotFoundError:
+            pass
+
+
+# Транзакция чтения: все запросы соединения видят одно состояние БД -------------------------------------------------------------------------
+def begin_read(conn: Connection):
+    if conn.dialect.name == "sqlite":
+        # pysqlite не начинает транзакцию перед SELECT: без BEGIN каждый запрос читает последнее зафиксированное состояние
+        conn.exec_driver_sql("BEGIN")
+    elif conn.dialect.name == "postgresql":
+        # в READ COMMITTED у каждого запроса свой снимок данных
+        conn.execution_options(isolation_level="REPEATABLE READ")
+
+
+# Единственный экземпляр на процесс
+catalog_snapshot = SnapshotService()
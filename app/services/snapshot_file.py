@@ -0,0 +1,485 @@
+import json
+import logging
+import os
+import struct
+import tempfile
+import time
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.engine import Connection
+from app.geo.engine import GeoIndex
+from app.geo.spatial import bounding_box
+from app.schemas.schemas import ActivitySchema, BuildingSchema, OrganizationCardSchema
+from app.services import repository
+from app.services.bitmaps import Bitmap, BitmapIndex, pack_bitmap_index
+
+# Создание логгера
+logger = logging.getLogger(__name__)
+
+# Формат файла: заголовок (сигнатура, версия, длина JSON описания), JSON описание массивов, массивы с выравниванием
+SNAPSHOT_MAGIC = b"NEBUSNAP"
+SNAPSHOT_VERSION = 3
+HEADER = struct.Struct("<8sII")
+ALIGNMENT = 64
+
+# Сторона ячейки сетки координат для индекса организаций по ячейкам (градусы, около 1 км. по широте)
+GEO_CELL_DEGREES = 0.01
+# Число столбцов сетки (ключ ячейки - строка * GEO_CELL_COLUMNS + столбец)
+GEO_CELL_COLUMNS = int(np.ceil(360 / GEO_CELL_DEGREES)) + 1
+# Организаций за один шаг подсчета счетчиков выдачи (между шагами проверяется отведенное время)
+FACET_CHUNK = 4096
+
+
+# Смещение, выровненное вверх до ALIGNMENT
+def aligned(offset: int) -> int:
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+# Строка и столбец ячейки сетки по координатам (монотонно: точка внутри прямоугольника - в ячейках его углов и между ними)
+def geo_cells(latitudes, longitudes) -> Tuple[np.ndarray, np.ndarray]:
+    rows = np.floor((np.asarray(latitudes, dtype=np.float64) + 90) / GEO_CELL_DEGREES).astype(np.int64)
+    columns = np.floor((np.asarray(longitudes, dtype=np.float64) + 180) / GEO_CELL_DEGREES).astype(np.int64)
+    return rows, columns
+
+
+# Строки в один блок UTF-8 и смещения (n + 1): строка i - blob[offsets[i]:offsets[i + 1]] ---------------------------------------------------------
+def pack_strings(values: Iterable[Optional[str]]) -> Tuple[np.ndarray, np.ndarray]:
+    encoded = [(value or "").encode("utf-8") for value in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum(np.array([len(value) for value in encoded], dtype=np.int64), out=offsets[1:])
+    return offsets, np.frombuffer(b"".join(encoded), dtype=np.uint8).copy()
+
+
+# Разреженная матрица смежности в формате CSR: строки rows (0..size-1), значения values -----------------------------------------------------
+def csr(rows: np.ndarray, values: np.ndarray, size: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+        Значения одной строки - values[offsets[i]:offsets[i + 1]] в исходном порядке (сортировка устойчивая).
+    """
+    order = np.argsort(rows, kind="stable")
+    offsets = np.zeros(size + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=size), out=offsets[1:])
+    return offsets, values[order]
+
+
+# Значения нескольких строк CSR подряд (без цикла по строкам) -------------------------------------------------------------------------------------
+def csr_gather(offsets: np.ndarray, values: np.ndarray, rows: np.ndarray) -> np.ndarray:
+    starts = offsets[rows]
+    lengths = offsets[rows + 1] - starts
+    total = int(lengths.sum())
+    if total == 0:
+        return values[:0]
+    # позиция каждого элемента результата в values: начало его строки + номер внутри строки
+    shifts = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+    return values[shifts + np.arange(total)]
+
+
+# Массивы снимка каталога по данным БД ---------------------------------------------------------------------------------------------------
+def build_arrays(conn: Connection) -> Dict[str, np.ndarray]:
+    """
+        Порядковый номер организации - позиция в порядке (name, id), как в выдаче списков организаций:
+        списки организаций по зданию и деятельности хранятся упорядоченными, объединение списков - np.unique.<br>
+        Порядковый номер здания и деятельности - позиция в порядке id.<br>
+        Здание организации в карточке - с наименьшим ID, телефоны - в порядке добавления,
+        деятельности - в порядке (level, parent_id, id), как в get_organization_cards.<br>
+        Индексы битовых множеств (app.services.bitmaps) для комбинированного поиска:
+        activity_tree - организации деятельности и всех вложенных (по activity_closure), обратный список
+        organization_activity_tree - деятельности организации вместе со всеми их предками (для счетчиков выдачи),
+        geo_cell - организации со зданием в ячейке сетки GEO_CELL_DEGREES (ключи ячеек - geo_cell_keys по возрастанию).
+    """
+    r = repository
+    organizations = conn.execute(select(r.organizations.c.id, r.organizations.c.name).order_by(r.organizations.c.name, r.organizations.c.id)).all()
+    buildings = conn.execute(select(r.buildings.c.id, r.buildings.c.address, r.buildings.c.latitude, r.buildings.c.longitude).order_by(r.buildings.c.id)).all()
+    activities = conn.execute(select(*r.ACTIVITY_COLUMNS).order_by(r.activities.c.id)).all()
+    links = conn.execute(select(r.building_organization.c.building_id, r.building_organization.c.organization_id)).all()
+    phones = conn.execute(
+        select(r.phones.c.organization_id, r.phones.c.phone_number)
+        .where(r.phones.c.phone_number.is_not(None))
+        .order_by(r.phones.c.organization_id, r.phones.c.id)
+    ).all()
+    organization_activities = conn.execute(
+        select(r.organization_activity.c.organization_id, r.activities.c.id)
+        .select_from(r.organization_activity.join(r.activities, r.activities.c.id == r.organization_activity.c.activity_id))
+        .order_by(r.organization_activity.c.organization_id, r.activities.c.level, r.activities.c.parent_id, r.activities.c.id)
+    ).all()
+    activity_tree = conn.execute(
+        select(r.activity_closure.c.ancestor_id, r.organization_activity.c.organization_id)
+        .distinct()
+        .select_from(r.activity_closure.join(r.organization_activity, r.organization_activity.c.activity_id == r.activity_closure.c.descendant_id))
+    ).all()
+
+    arrays = {}
+    # организации
+    organization_ids = np.array([row.id for row in organizations], dtype=np.int64)
+    by_id = np.argsort(organization_ids, kind="stable").astype(np.int32)
+    arrays["organization_ids"] = organization_ids
+    arrays["organization_ids_sorted"] = organization_ids[by_id]
+    arrays["organization_id_ordinals"] = by_id
+    arrays["organization_name_offsets"], arrays["organization_names"] = pack_strings(row.name for row in organizations)
+
+    # здания
+    building_ids = np.array([row.id for row in buildings], dtype=np.int64)
+    latitudes = np.array([row.latitude for row in buildings], dtype=np.float64)
+    arrays["building_ids"] = building_ids
+    arrays["building_latitudes"] = latitudes
+    arrays["building_longitudes"] = np.array([row.longitude for row in buildings], dtype=np.float64)
+    arrays["building_address_offsets"], arrays["building_addresses"] = pack_strings(row.address for row in buildings)
+    # порядок зданий по широте - отбор полосы широт двоичным поиском
+    latitude_order = np.argsort(latitudes, kind="stable").astype(np.int32)
+    arrays["building_latitude_order"] = latitude_order
+    arrays["building_sorted_latitudes"] = latitudes[latitude_order]
+
+    # деятельности
+    activity_ids = np.array([row.id for row in activities], dtype=np.int64)
+    arrays["activity_ids"] = activity_ids
+    arrays["activity_levels"] = np.array([-1 if row.level is None else row.level for row in activities], dtype=np.int32)
+    arrays["activity_parent_ids"] = np.array([-1 if row.parent_id is None else row.parent_id for row in activities], dtype=np.int64)
+    arrays["activity_name_offsets"], arrays["activity_names"] = pack_strings(row.name for row in activities)
+
+    # здание <-> организации: организации здания - по порядковому номеру (name, id), здание организации - наименьший ID
+    link_buildings = ordinals(building_ids, [row.building_id for row in links])
+    link_organizations = ordinals(arrays["organization_ids_sorted"], [row.organization_id for row in links], by_id)
+    keep = (link_buildings >= 0) & (link_organizations >= 0)
+    link_buildings, link_organizations = link_buildings[keep], link_organizations[keep]
+    order = np.lexsort((link_organizations, link_buildings))
+    arrays["building_organization_offsets"], arrays["building_organizations"] = csr(link_buildings[order], link_organizations[order], len(building_ids))
+    organization_building = np.full(len(organization_ids), -1, dtype=np.int32)
+    # первое вхождение организации в порядке (организация, здание) - здание с наименьшим ID
+    order = np.lexsort((link_buildings, link_organizations))
+    linked, first = np.unique(link_organizations[order], return_index=True)
+    organization_building[linked] = link_buildings[order][first]
+    arrays["organization_building"] = organization_building
+    arrays["organization_building_offsets"], arrays["organization_buildings"] = csr(link_organizations[order], link_buildings[order], len(organization_ids))
+
+    # организации по ячейкам сетки зданий
+    rows, columns = geo_cells(latitudes[link_buildings], arrays["building_longitudes"][link_buildings])
+    cell_keys, cell_positions = np.unique(rows * GEO_CELL_COLUMNS + columns, return_inverse=True)
+    arrays["geo_cell_keys"] = cell_keys
+    # пары (ячейка, организация) без повторов - одним числом
+    stride = max(len(organization_ids), 1)
+    pairs = np.unique(cell_positions.astype(np.int64) * stride + link_organizations)
+    arrays.update(pack_bitmap_index("geo_cell", pairs // stride, pairs % stride, len(cell_keys), len(organization_ids)))
+
+    # телефоны организаций (в порядке добавления)
+    phone_organizations = ordinals(arrays["organization_ids_sorted"], [row.organization_id for row in phones], by_id)
+    keep = np.flatnonzero(phone_organizations >= 0)
+    arrays["organization_phone_offsets"], phone_index = csr(phone_organizations[keep], keep, len(organization_ids))
+    arrays["phone_offsets"], arrays["phone_numbers"] = pack_strings(phones[i].phone_number for i in phone_index.tolist())
+
+    # организация <-> деятельности
+    pair_organizations = ordinals(arrays["organization_ids_sorted"], [row[0] for row in organization_activities], by_id)
+    pair_activities = ordinals(activity_ids, [row[1] for row in organization_activities])
+    keep = (pair_organizations >= 0) & (pair_activities >= 0)
+    pair_organizations, pair_activities = pair_organizations[keep], pair_activities[keep]
+    arrays["organization_activity_offsets"], arrays["organization_activities"] = csr(pair_organizations, pair_activities, len(organization_ids))
+    order = np.lexsort((pair_organizations, pair_activities))
+    arrays["activity_organization_offsets"], arrays["activity_organizations"] = csr(pair_activities[order], pair_organizations[order], len(activity_ids))
+
+    # организации по деятельностям с вложенными
+    tree_activities = ordinals(activity_ids, [row.ancestor_id for row in activity_tree])
+    tree_organizations = ordinals(arrays["organization_ids_sorted"], [row.organization_id for row in activity_tree], by_id)
+    keep = (tree_activities >= 0) & (tree_organizations >= 0)
+    tree_activities, tree_organizations = tree_activities[keep], tree_organizations[keep]
+    arrays.update(pack_bitmap_index("activity_tree", tree_activities, tree_organizations, len(activity_ids), len(organization_ids)))
+    order = np.lexsort((tree_activities, tree_organizations))
+    arrays["organization_activity_tree_offsets"], arrays["organization_activity_tree"] = csr(tree_organizations[order], tree_activities[order], len(organization_ids))
+    return arrays
+
+
+# Порядковые номера значений в отсортированном массиве sorted_ids (нет значения - -1), mapping - перестановка для sorted_ids ------------------------
+def ordinals(sorted_ids: np.ndarray, values: List[int], mapping: np.ndarray = None) -> np.ndarray:
+    values = np.asarray(values, dtype=np.int64)
+    positions = np.searchsorted(sorted_ids, values)
+    found = positions < len(sorted_ids)
+    found[found] = sorted_ids[positions[found]] == values[found]
+    result = np.full(len(values), -1, dtype=np.int32)
+    result[found] = positions[found] if mapping is None else mapping[positions[found]]
+    return result
+
+
+# Запись снимка: во временный файл рядом, затем атомарная подмена (os.replace) --------------------------------------------------------------------
+def write_snapshot(path: str, arrays: Dict[str, np.ndarray], meta: Dict = None, is_current: Callable[[], bool] = None) -> int:
+    """
+        Процессы, открывшие прежний файл, продолжают читать его страницы (файл удаляется после закрытия отображений),
+        новые обращения открывают новый файл. Возвращает размер файла.<br>
+        is_current - проверка перед подменой: False - данные устарели, файл не подменяется (возвращается 0).
+    """
+    layout = {}
+    offset = 0
+    for name, array in arrays.items():
+        array = np.ascontiguousarray(array)
+        layout[name] = {"dtype": array.dtype.newbyteorder("<").str, "shape": list(array.shape), "offset": offset}
+        offset = aligned(offset + array.nbytes)
+    description = json.dumps({"arrays": layout, **(meta or {})}, ensure_ascii=False).encode("utf-8")
+    data_start = aligned(HEADER.size + len(description))
+
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix=os.path.basename(path) + ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_VERSION, len(description)))
+            f.write(description)
+            for name, array in arrays.items():
+                f.seek(data_start + layout[name]["offset"])
+                f.write(np.ascontiguousarray(array, dtype=layout[name]["dtype"]).tobytes())
+            f.truncate(data_start + offset)
+            f.flush()
+            os.fsync(f.fileno())
+        if is_current is not None and not is_current():
+            os.unlink(temp_path)
+            return 0
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
+    return data_start + offset
+
+
+# Построение и запись снимка каталога по данным БД ---------------------------------------------------------------------------------------
+def build_snapshot(conn: Connection, path: str, is_current: Callable[[], bool] = None, version: Optional[int] = None) -> Optional[Dict]:
+    """
+        conn - соединение в транзакции чтения (все запросы видят одно состояние БД).<br>
+        version - версия каталога этого состояния (meta["catalog_version"]).<br>
+        is_current - проверка перед подменой файла (см. write_snapshot): None - каталог изменился за время построения,
+        снимок не записан.
+    """
+    logger.info(f"build_snapshot() -> {path} ...")
+    start = time.perf_counter()
+    arrays = build_arrays(conn)
+    meta = {
+        "built_at": time.time(),
+        "organizations": len(arrays["organization_ids"]),
+        "buildings": len(arrays["building_ids"]),
+        "activities": len(arrays["activity_ids"]),
+        "geo_cell_degrees": GEO_CELL_DEGREES,
+        "catalog_version": version,
+    }
+    size = write_snapshot(path, arrays, meta, is_current=is_current)
+    if not size:
+        logger.info(f"build_snapshot() -> каталог изменился за время построения, снимок не записан")
+        return None
+    logger.info(
+        f"build_snapshot() -> {meta['organizations']} организаций, {meta['buildings']} зданий, {meta['activities']} деятельностей, "
+        f"{size / 2 ** 20:.1f} МиБ за {time.perf_counter() - start:.2f} сек."
+    )
+    return {**meta, "bytes": size}
+
+
+# Снимок каталога, отображенный в память (только чтение) ----------------------------------------------------------------------------------------
+class CatalogSnapshot:
+    """
+        Все массивы - представления одного отображения файла (np.memmap): данные не копируются в память процесса,
+        страницы файла общие для всех процессов (кэш ОС).<br>
+        Методы поиска возвращают порядковые номера организаций в порядке выдачи, iter_cards - карточки по ним.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        # представление ndarray того же отображения: индексация без накладных расходов подкласса np.memmap
+        buffer = np.memmap(path, dtype=np.uint8, mode="r").view(np.ndarray)
+        magic, version, length = HEADER.unpack(bytes(buffer[:HEADER.size]))
+        if magic != SNAPSHOT_MAGIC or version != SNAPSHOT_VERSION:
+            raise ValueError(f"{path}: не снимок каталога версии {SNAPSHOT_VERSION}")
+        description = json.loads(bytes(buffer[HEADER.size:HEADER.size + length]).decode("utf-8"))
+        data_start = aligned(HEADER.size + length)
+        self.meta = {name: value for name, value in description.items() if name != "arrays"}
+        self.arrays = {}
+        for name, spec in description["arrays"].items():
+            dtype = np.dtype(spec["dtype"])
+            start = data_start + spec["offset"]
+            count = int(np.prod(spec["shape"]))
+            self.arrays[name] = buffer[start:start + count * dtype.itemsize].view(dtype).reshape(spec["shape"])
+        for name, array in self.arrays.items():
+            setattr(self, name, array)
+        if self.meta.get("geo_cell_degrees") != GEO_CELL_DEGREES:
+            raise ValueError(f"{path}: снимок построен для другой сетки координат")
+        self.activity_tree_index = BitmapIndex(self.arrays, "activity_tree", len(self))
+        self.geo_cell_index = BitmapIndex(self.arrays, "geo_cell", len(self))
+
+    def __len__(self):
+        return len(self.organization_ids)
+
+    # строка i из блока строк
+    @staticmethod
+    def text(offsets: np.ndarray, blob: np.ndarray, i: int) -> str:
+        return blob[offsets[i]:offsets[i + 1]].tobytes().decode("utf-8")
+
+    # порядковые номера организаций по ID (в порядке ids, отсутствующие отбрасываются)
+    def ordinals_of(self, ids: Iterable[int]) -> np.ndarray:
+        result = ordinals(self.organization_ids_sorted, list(ids), self.organization_id_ordinals)
+        return result[result >= 0]
+
+    # первый порядковый номер организации после курсора страницы (name, id): следующий за организацией курсора
+    def ordinal_after(self, name: str, id: int) -> Optional[int]:
+        """
+            Порядок снимка - ORDER BY name, id базы данных (у PostgreSQL строки сравниваются по правилам локали, не как str
+            в Python), поэтому позиция находится по ID организации курсора, а не двоичным поиском по названиям.<br>
+            None - организации курсора нет в снимке или она переименована (курсор выдан до изменения каталога).
+        """
+        found = int(ordinals(self.organization_ids_sorted, [id], self.organization_id_ordinals)[0])
+        if found < 0 or self.text(self.organization_name_offsets, self.organization_names, found) != name:
+            return None
+        return found + 1
+
+    # порядковые номера здания и деятельностей по ID (отсутствующие отбрасываются)
+    def building_ordinals_of(self, ids: Iterable[int]) -> np.ndarray:
+        result = ordinals(self.building_ids, list(ids))
+        return result[result >= 0]
+
+    def activity_ordinals_of(self, ids: Iterable[int]) -> np.ndarray:
+        result = ordinals(self.activity_ids, list(ids))
+        return result[result >= 0]
+
+    # организации в зданиях (без повторов, по названию)
+    def organizations_by_buildings(self, building_ordinals: np.ndarray) -> np.ndarray:
+        found = csr_gather(self.building_organization_offsets, self.building_organizations, building_ordinals)
+        return found if len(building_ordinals) == 1 else np.unique(found)
+
+    # организации с любой из деятельностей (без повторов, по названию)
+    def organizations_by_activities(self, activity_ordinals: np.ndarray) -> np.ndarray:
+        found = csr_gather(self.activity_organization_offsets, self.activity_organizations, activity_ordinals)
+        return found if len(activity_ordinals) == 1 else np.unique(found)
+
+    # здания внутри прямоугольника (по ID): полоса широт - двоичным поиском, долготы - маской по полосе
+    def buildings_in_box(self, min_lat: float, max_lat: float, min_lon: float, max_lon: float) -> np.ndarray:
+        low = np.searchsorted(self.building_sorted_latitudes, min_lat, side="left")
+        high = np.searchsorted(self.building_sorted_latitudes, max_lat, side="right")
+        candidates = self.building_latitude_order[low:high]
+        longitudes = self.building_longitudes[candidates]
+        return np.sort(candidates[(longitudes >= min_lon) & (longitudes <= max_lon)])
+
+    # организации в радиусе: (организации, ближайшее здание каждой, расстояние до него), ближайшие - первыми
+    def organizations_nearby(self, latitude: float, longitude: float, radius: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+            Расстояния считаются тем же GeoIndex, что и при поиске по БД; при равном расстоянии - по названию.
+        """
+        candidates = self.buildings_in_box(*bounding_box(latitude, longitude, radius))
+        index = GeoIndex(candidates, self.building_latitudes[candidates], self.building_longitudes[candidates])
+        buildings, distances = index.query_radius(latitude, longitude, radius)
+        offsets = self.building_organization_offsets
+        counts = offsets[buildings + 1] - offsets[buildings]
+        found = csr_gather(offsets, self.building_organizations, buildings)
+        found_buildings = np.repeat(buildings, counts)
+        found_distances = np.repeat(distances, counts)
+        order = np.lexsort((found, found_distances))
+        # первое (ближайшее) вхождение каждой организации
+        _, first = np.unique(found[order], return_index=True)
+        first = order[np.sort(first)]
+        return found[first], found_buildings[first], found_distances[first]
+
+    # позиции ячеек сетки, пересекающих прямоугольник (по строкам сетки - диапазон ключей двоичным поиском)
+    def geo_cells_in_box(self, min_lat: float, max_lat: float, min_lon: float, max_lon: float) -> np.ndarray:
+        (first_row, last_row), (first_column, last_column) = geo_cells([min_lat, max_lat], [min_lon, max_lon])
+        rows = np.arange(first_row, last_row + 1, dtype=np.int64) * GEO_CELL_COLUMNS
+        starts = np.searchsorted(self.geo_cell_keys, rows + first_column, side="left")
+        ends = np.searchsorted(self.geo_cell_keys, rows + last_column, side="right")
+        return np.concatenate([np.arange(start, end) for start, end in zip(starts.tolist(), ends.tolist())])
+
+    # организации со зданием в прямоугольнике или рядом (объединение ячеек сетки - надмножество для точной проверки)
+    def geo_bitmap(self, cells: np.ndarray) -> Bitmap:
+        return Bitmap.union(len(self), [self.geo_cell_index.get(cell) for cell in cells.tolist()])
+
+    # ближайшее к точке здание каждой организации и расстояние до него (по всем зданиям организации)
+    def nearest_buildings(self, organization_ordinals: np.ndarray, latitude: float, longitude: float) -> Tuple[np.ndarray, np.ndarray]:
+        """
+            Организация без зданий - здание -1 и расстояние inf. При равном расстоянии - здание с наименьшим ID.
+        """
+        offsets = self.organization_building_offsets
+        counts = offsets[organization_ordinals + 1] - offsets[organization_ordinals]
+        found = csr_gather(offsets, self.organization_buildings, organization_ordinals)
+        buildings = np.full(len(organization_ordinals), -1, dtype=np.int64)
+        distances = np.full(len(organization_ordinals), np.inf)
+        if len(found):
+            index = GeoIndex(found, self.building_latitudes[found], self.building_longitudes[found])
+            found_distances = index.distances(latitude, longitude)
+            rows = np.repeat(np.arange(len(organization_ordinals)), counts)
+            # первое вхождение строки в порядке (строка, расстояние, здание) - ближайшее здание
+            order = np.lexsort((found, found_distances, rows))
+            linked, first = np.unique(rows[order], return_index=True)
+            buildings[linked] = found[order][first]
+            distances[linked] = found_distances[order][first]
+        return buildings, distances
+
+    # счетчики организаций по деятельностям (с вложенными) и зданиям за один проход по выдаче
+    def facet_counts(
+            self,
+            organization_ordinals: np.ndarray,
+            point: Tuple[float, float, float] = None,
+            deadline: float = None
+    ) -> Tuple[np.ndarray, np.ndarray, int]:
+        """
+            Возвращает (счетчики по порядковым номерам деятельностей, по порядковым номерам зданий, число учтенных организаций).<br>
+            point - (latitude, longitude, radius км.): учитываются только здания в радиусе.<br>
+            Выдача обрабатывается шагами по FACET_CHUNK организаций; после шага, закончившегося позже
+            deadline (time.perf_counter()), подсчет прекращается - счетчики только по началу выдачи.
+        """
+        activity_counts = np.zeros(len(self.activity_ids), dtype=np.int64)
+        building_counts = np.zeros(len(self.building_ids), dtype=np.int64)
+        counted = 0
+        for start in range(0, len(organization_ordinals), FACET_CHUNK):
+            rows = np.asarray(organization_ordinals[start:start + FACET_CHUNK], dtype=np.int64)
+            activities = csr_gather(self.organization_activity_tree_offsets, self.organization_activity_tree, rows)
+            activity_counts += np.bincount(activities, minlength=len(activity_counts))
+            buildings = csr_gather(self.organization_building_offsets, self.organization_buildings, rows)
+            if point is not None:
+                latitude, longitude, radius = point
+                index = GeoIndex(buildings, self.building_latitudes[buildings], self.building_longitudes[buildings])
+                buildings = buildings[index.distances(latitude, longitude) <= radius]
+            building_counts += np.bincount(buildings, minlength=len(building_counts))
+            counted += len(rows)
+            if deadline is not None and time.perf_counter() > deadline:
+                break
+        return activity_counts, building_counts, counted
+
+    # карточки организаций по порядковым номерам, buildings/distances - здание и расстояние вместо здания карточки
+    def iter_cards(
+            self,
+            organization_ordinals: np.ndarray,
+            buildings: np.ndarray = None,
+            distances: np.ndarray = None
+    ) -> Iterator[OrganizationCardSchema]:
+        """
+            Одинаковые здания и деятельности разных карточек - один объект схемы (как в get_organization_cards).
+        """
+        building_schemas = {}
+        activity_schemas = {}
+        for i, ordinal in enumerate(organization_ordinals.tolist()):
+            building = int(buildings[i]) if buildings is not None else int(self.organization_building[ordinal])
+            schema = None
+            if building >= 0:
+                schema = building_schemas.get(building)
+                if schema is None:
+                    schema = building_schemas[building] = BuildingSchema(
+                        id=int(self.building_ids[building]),
+                        address=self.text(self.building_address_offsets, self.building_addresses, building),
+                        latitude=float(self.building_latitudes[building]),
+                        longitude=float(self.building_longitudes[building])
+                    )
+            phones = self.organization_phone_offsets
+            activities = self.organization_activity_offsets
+            card_activities = []
+            for activity in self.organization_activities[activities[ordinal]:activities[ordinal + 1]].tolist():
+                activity_schema = activity_schemas.get(activity)
+                if activity_schema is None:
+                    activity_schema = activity_schemas[activity] = self.activity_schema(activity)
+                card_activities.append(activity_schema)
+            yield OrganizationCardSchema(
+                id=int(self.organization_ids[ordinal]),
+                name=self.text(self.organization_name_offsets, self.organization_names, ordinal),
+                building=schema,
+                phones=[self.text(self.phone_offsets, self.phone_numbers, phone) for phone in range(phones[ordinal], phones[ordinal + 1])],
+                activities=card_activities,
+                distance=float(distances[i]) if distances is not None else None
+            )
+
+    # схема деятельности по порядковому номеру (уровень и родитель -1 - не заданы)
+    def activity_schema(self, activity: int) -> ActivitySchema:
+        level = int(self.activity_levels[activity])
+        parent_id = int(self.activity_parent_ids[activity])
+        return ActivitySchema(
+            id=int(self.activity_ids[activity]),
+            level=None if level < 0 else level,
+            name=self.text(self.activity_name_offsets, self.activity_names, activity),
+            parent_id=None if parent_id < 0 else parent_id
+        )
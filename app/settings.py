@@ -0,0 +1,59 @@
+import functools
+import os
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+# Файл переменных окружения (как env_file в docker-compose.yml); переменные окружения процесса имеют приоритет
+ENV_FILE = os.getenv("ENV_FILE", ".env")
+
+# Проверка схемы БД при запуске приложения (схема создается миграциями: alembic upgrade head):
+# verify - ревизия БД должна совпадать с последней миграцией (иначе запуск прерывается), по умолчанию,
+# none - без проверки,
+# create - создание отсутствующих таблиц по моделям (Base.metadata.create_all)
+SCHEMA_CHECK_MODES = ("none", "verify", "create")
+
+
+# Загрузка переменных из файла KEY=VALUE (нет файла - пустой словарь) ----------------------------------------------------------------------
+def load_env(env_path: str = ENV_FILE) -> Dict[str, str]:
+    env_vars = {}
+    if not os.path.exists(env_path):
+        return env_vars
+    with open(env_path) as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith('#') and '=' in line:
+                key, value = line.split('=', 1)
+                env_vars[key.strip()] = value.strip()
+    return env_vars
+
+
+# Настройки приложения ------------------------------------------------------------------------------------------------------------------------
+@dataclass(frozen=True)
+class Settings:
+    """
+        api_key - API ключ (None - не задан: все запросы с ключом отклоняются),<br>
+        schema_check - проверка схемы БД при запуске (SCHEMA_CHECK_MODES),<br>
+        log_level - уровень журнала приложения.<br>
+        Настройки подключения к БД и кэша - в app/database/database.py и app/services/cache.py (переменные окружения).
+    """
+    api_key: Optional[str] = None
+    schema_check: str = "verify"
+    log_level: str = "INFO"
+
+    @classmethod
+    def load(cls, env_path: str = ENV_FILE) -> "Settings":
+        values = {**load_env(env_path), **os.environ}
+        schema_check = values.get("SCHEMA_CHECK", "verify").lower()
+        if schema_check not in SCHEMA_CHECK_MODES:
+            raise ValueError(f"SCHEMA_CHECK={schema_check} (допустимо: {', '.join(SCHEMA_CHECK_MODES)})")
+        return cls(
+            api_key=values.get("API_KEY") or None,
+            schema_check=schema_check,
+            log_level=values.get("LOG_LEVEL", "INFO").upper(),
+        )
+
+
+# Настройки процесса (загружаются один раз)
+@functools.lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    return Settings.load()
@@ -0,0 +1,18 @@
+import logging
+from uvicorn.workers import UvicornWorker as BaseUvicornWorker
+
+# Создание логгера
+logger = logging.getLogger(__name__)
+
+
+# Воркер gunicorn для ASGI приложения: при остановке ждет завершения запросов не дольше graceful_timeout ------------------------------------
+class UvicornWorker(BaseUvicornWorker):
+    """
+        uvicorn.workers.UvicornWorker не передает graceful_timeout серверу uvicorn: без этого при SIGTERM
+        сервер ждет запросы без ограничения, и gunicorn завершает воркер по SIGKILL, не выполнив lifespan shutdown.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # на секунду раньше SIGKILL от gunicorn - чтобы успел выполниться lifespan shutdown
+        self.config.timeout_graceful_shutdown = max(int(self.cfg.graceful_timeout) - 1, 1)
@@ -0,0 +1,43 @@
+# Запуск в несколько процессов: gunicorn -c gunicorn.conf.py main:app
+#
+# Приложение загружается и прогревается в главном процессе (preload_app, app.server.warmup) до запуска воркеров:
+# воркеры получают загруженные модули и данные через fork (общие страницы памяти) и сразу готовы к запросам.
+# При SIGTERM воркеры перестают принимать соединения и завершают начатые запросы не дольше GRACEFUL_TIMEOUT секунд.
+# Кэш ответов (CACHE_BACKEND=memory) и дерево деятельностей у каждого воркера свои: они сверяются с версией каталога
+# в БД (журнал изменений), поэтому запись в одном воркере видна остальным со следующего запроса. Без журнала
+# изменений запуск нескольких воркеров прерывается (app.server.check_shared_version).
+import multiprocessing
+import os
+
+from app.server import check_shared_version, dispose_engines, process_memory, warmup
+
+bind = os.getenv("BIND", "0.0.0.0:8000")
+# число воркеров: WEB_CONCURRENCY или число ядер
+workers = int(os.getenv("WEB_CONCURRENCY") or multiprocessing.cpu_count())
+worker_class = "app.workers.UvicornWorker"
+preload_app = True
+graceful_timeout = int(os.getenv("GRACEFUL_TIMEOUT", 30))
+timeout = int(os.getenv("WORKER_TIMEOUT", 60))
+keepalive = 5
+accesslog = "-" if os.getenv("ACCESS_LOG", "false").lower() == "true" else None
+
+
+# Главный процесс: приложение загружено (preload_app), воркеры еще не запущены
+def when_ready(server):
+    check_shared_version(workers)
+    warmup()
+
+
+# Воркер после fork: соединения главного процесса не используются
+def post_fork(server, worker):
+    dispose_engines(close=False)
+
+
+# Воркер готов к запросам: память воркера (общие с главным процессом страницы - shared)
+def post_worker_init(worker):
+    try:
+        memory = process_memory(worker.pid)
+    except OSError:
+        return
+    worker.log.info(f"worker {worker.pid}: " + ", ".join(f"{name}={value / 2 ** 20:.1f} MiB" for name, value in memory.items()))
+
@@ -1,25 +1,92 @@
 # main.py
 
-from fastapi import FastAPI, Request
-from fastapi.responses import HTMLResponse
+import logging
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI
 from fastapi.staticfiles import StaticFiles
-import fastapi.templating
+from starlette.concurrency import run_in_threadpool
 
 from app.routes.router import router
-from app.database.database import engine, Base
-import uvicorn
+from app.routes.api_v1 import router as api_v1_router
+from app.routes.metrics import QueryMetricsMiddleware, router as metrics_router
+from app.database.database import async_engine, engine, read_engine, Base
+from app.services.cache import response_cache
+from app.services.metrics import instrument_engine
+from app.settings import Settings, get_settings
+
+# Создание логгера
+logger = logging.getLogger(__name__)
+
+
+# Проверка схемы БД при запуске (SCHEMA_CHECK, по умолчанию - ревизия БД = последняя миграция) ------------------------------------------------
+def check_schema(settings: Settings):
+    logger.info(f"check_schema() -> {settings.schema_check}")
+    if settings.schema_check == "create":
+        # Создание таблиц
+        Base.metadata.create_all(bind=engine)
+        # журнал изменений создан без триггеров миграции: версия каталога не меняется при записи, кэш ответов выключается
+        response_cache.backend = None
+    elif settings.schema_check == "verify":
+        # alembic импортируется только при включенной проверке
+        from alembic.config import Config
+        from alembic.runtime.migration import MigrationContext
+        from alembic.script import ScriptDirectory
+        heads = set(ScriptDirectory.from_config(Config("alembic.ini")).get_heads())
+        with engine.connect() as conn:
+            current = set(MigrationContext.configure(conn).get_current_heads())
+        if current != heads:
+            raise RuntimeError(f"Схема БД не соответствует миграциям: ревизия БД {sorted(current)}, последняя миграция {sorted(heads)} (alembic upgrade head)")
+
+
+# Запуск и остановка приложения ---------------------------------------------------------------------------------------------------------------
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    settings = app.state.settings
+    if settings.api_key is None:
+        logger.error(f"lifespan() -> API_KEY не задан (переменная окружения или файл .env): запросы с API ключом будут отклонены")
+    await run_in_threadpool(check_schema, settings)
+    yield
+    # соединения пулов закрываются при остановке (а не при сборке мусора)
+    engine.dispose()
+    if read_engine is not engine:
+        read_engine.dispose()
+    await async_engine.dispose()
 
-# Создание таблиц
-Base.metadata.create_all(bind=engine)
 
-# объект FastAPI
-app = FastAPI()
+# Создание приложения -------------------------------------------------------------------------------------------------------------------------
+def create_app() -> FastAPI:
+    """
+        При импорте модулей приложения не выполняется работа с БД и чтение файлов: настройки
+        загружаются один раз (get_settings), схема БД проверяется в lifespan только при SCHEMA_CHECK=verify/create.<br>
+        Запуск: uvicorn main:app или uvicorn --factory main:create_app, несколько воркеров - gunicorn -c gunicorn.conf.py main:app
+    """
+    settings = get_settings()
+    # Настройка логирования (один раз на процесс: basicConfig не меняет уже настроенный корневой логгер)
+    logging.basicConfig(level=settings.log_level)
 
-# Настройка статических файлов
-app.mount("/static", StaticFiles(directory="static"), name="static")
+    # Счетчики SQL запросов (Server-Timing, /metrics)
+    instrument_engine(engine, "sync")
+    if read_engine is not engine:
+        instrument_engine(read_engine, "read")
+    instrument_engine(async_engine.sync_engine, "async")
 
-# Подключение маршрутов
-app.include_router(router)
+    # объект FastAPI
+    app = FastAPI(lifespan=lifespan)
+    app.state.settings = settings
+    app.add_middleware(QueryMetricsMiddleware)
+
+    # Настройка статических файлов
+    app.mount("/static", StaticFiles(directory="static"), name="static")
+
+    # Подключение маршрутов
+    app.include_router(router)
+    app.include_router(api_v1_router)
+    app.include_router(metrics_router)
+    return app
+
+
+app = create_app()
 
 # Запуск сервера
 #if __name__ == "__main__":
@@ -28,5 +95,3 @@ app.include_router(router)
 
 # Запуск сервера в Docker
 # uvicorn main:app --host 0.0.0.0 --port 8000 --reload
-
-
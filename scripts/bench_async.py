@@ -0,0 +1,93 @@
+"""
+    Масштабирование по числу одновременных запросов: синхронный путь (def + get_db, потоки Starlette)
+    против асинхронного /api/v1 (async def + get_async_db) в одном процессе.
+
+    запуск: python scripts/bench_async.py [--concurrency 1 8 32 128] [--requests 512]
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+import httpx
+from fastapi import Depends, FastAPI
+from sqlalchemy.orm import Session
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '../'))
+sys.path.append(ROOT)
+# .env и test.db открываются по относительным путям
+os.chdir(ROOT)
+
+from app.database.database import get_db
+from app.routes.api_v1 import organizations_page, router as api_v1_router
+from app.settings import get_settings
+from app.schemas.schemas import OrganizationPageSchema
+
+QUERY_ORGANIZATIONS_BY_ACTIVITY_TREE = """
+    SELECT a.organization_id
+    FROM activity_closure c
+    JOIN organization_activity a ON a.activity_id = c.descendant_id
+    WHERE c.ancestor_id = :activity_id
+"""
+
+app = FastAPI()
+app.include_router(api_v1_router)
+
+
+# прежний синхронный вариант того же запроса
+@app.get("/sync/organizations/by_activity_tree/{activity_id}", response_model=OrganizationPageSchema)
+def sync_organizations_by_activity_tree(activity_id: int, limit: int = 20, db: Session = Depends(get_db)):
+    return organizations_page(db=db, subquery=QUERY_ORGANIZATIONS_BY_ACTIVITY_TREE, params={"activity_id": activity_id}, limit=limit, cursor=None)
+
+
+# requests запросов, не более concurrency одновременно; возвращает (сек., задержки успешных запросов, число ошибок)
+async def run(client, url, requests, concurrency):
+    latencies = []
+    errors = [0]
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            start = time.perf_counter()
+            response = await client.get(url, params={"api_key": get_settings().api_key})
+            if response.status_code == 200:
+                latencies.append(time.perf_counter() - start)
+            else:
+                errors[0] += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    return time.perf_counter() - start, sorted(latencies), errors[0]
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32, 128])
+    parser.add_argument("--requests", type=int, default=512)
+    parser.add_argument("--activity-id", type=int, default=1)
+    args = parser.parse_args()
+
+    paths = {
+        "sync": f"/sync/organizations/by_activity_tree/{args.activity_id}",
+        "async": f"/api/v1/organizations/by_activity_tree/{args.activity_id}",
+    }
+    # синхронный путь при concurrency больше пула соединений (5 + 10) может упираться в таймаут пула (30 сек.):
+    # потоки Starlette заняты ожиданием соединения, а закрытию сессий get_db тоже нужен поток - такие запросы считаются ошибками
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        # прогрев: пулы соединений, кэши планов
+        for url in paths.values():
+            await run(client, url, 16, 4)
+
+        print(f"{'path':>6} {'concurrency':>12} {'req/s':>10} {'p50, ms':>10} {'p95, ms':>10} {'errors':>8}")
+        for concurrency in args.concurrency:
+            for name, url in paths.items():
+                elapsed, latencies, errors = await run(client, url, args.requests, concurrency)
+                p50 = latencies[len(latencies) // 2] * 1000 if latencies else float("nan")
+                p95 = latencies[max(int(len(latencies) * 0.95) - 1, 0)] * 1000 if latencies else float("nan")
+                print(f"{name:>6} {concurrency:>12} {len(latencies) / elapsed:>10.0f} {p50:>10.2f} {p95:>10.2f} {errors:>8}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
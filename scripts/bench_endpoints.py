@@ -0,0 +1,251 @@
+"""
+    Бенчмарк вспомогательных функций и эндпоинтов на сгенерированных каталогах (scripts/generate_catalog.py):
+    время (p50 / p95), число SQL запросов и пиковая память Python на вызов.
+
+    Каталоги создаются один раз в --workdir (одинаковые seed и размер - одинаковые данные), каждый размер
+    измеряется в отдельном процессе (DATABASE_URL задается до импорта приложения, кэш ответов отключен).
+    Результаты пишутся в JSON; с --compare сравниваются с прежним результатом (код возврата 1 при замедлении).
+
+    запуск: python scripts/bench_endpoints.py [--sizes 1000 10000 100000] [--repeat 20] [--out bench.json] [--compare baseline.json]
+"""
+import argparse
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '../'))
+sys.path.append(ROOT)
+
+
+# Создание каталога заданного размера (если еще не создан) ----------------------------------------------------------------------------------
+def ensure_catalog(workdir: str, organizations: int, seed: int) -> str:
+    path = os.path.join(workdir, f"catalog_{organizations}_{seed}.db")
+    if not os.path.exists(path):
+        from generate_catalog import create_database, generate_catalog, write_catalog
+        directory = os.path.join(workdir, f"catalog_{organizations}_{seed}")
+        catalog = generate_catalog(organizations, seed=seed)
+        write_catalog(catalog, directory)
+        create_database(f"sqlite:///{path}", catalog, directory)
+    return path
+
+
+# Измерение одного случая: задержки по repeat вызовам, SQL запросы и пиковая память одного вызова --------------------------------------------
+def measure(fn, repeat: int, queries: list) -> dict:
+    for _ in range(2):
+        fn()
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+
+    before = queries[0]
+    fn()
+    query_count = queries[0] - before
+
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "p50_ms": round(statistics.median(latencies) * 1000, 3),
+        "p95_ms": round(latencies[max(int(len(latencies) * 0.95) - 1, 0)] * 1000, 3),
+        "mean_ms": round(statistics.fmean(latencies) * 1000, 3),
+        "queries": query_count,
+        "peak_kib": round(peak / 1024, 1),
+    }
+
+
+# Измерение всех случаев на текущей БД (в отдельном процессе) ------------------------------------------------------------------------------
+def run_worker(repeat: int) -> dict:
+    import logging
+    from fastapi.testclient import TestClient
+    from sqlalchemy import event, text
+
+    os.chdir(ROOT)
+    from main import app
+    from app.database.database import SessionLocal, async_engine, engine
+    from app.geo.nearby import get_buildings_nearby
+    from app.geo.spatial import get_buildings_in_box, rectangle
+    from app.routes import router
+    from app.services.activity_tree import activity_tree
+    from app.services.cards import get_organization_cards
+    from app.services.search import search_organizations
+    from app.settings import get_settings
+
+    # без вывода журнала: измеряется работа приложения, а не запись логов
+    logging.disable(logging.INFO)
+
+    queries = [0]
+
+    def count(*args):
+        queries[0] += 1
+
+    event.listen(engine, "before_cursor_execute", count)
+    event.listen(async_engine.sync_engine, "before_cursor_execute", count)
+
+    # параметры: самое "населенное" здание и его координаты, корневая деятельность с наибольшим поддеревом, средняя организация
+    with engine.connect() as conn:
+        building = conn.execute(text("""
+            SELECT b.id, b.latitude, b.longitude
+            FROM buildings b
+            JOIN building_organization a ON a.building_id = b.id
+            GROUP BY b.id, b.latitude, b.longitude
+            ORDER BY COUNT(*) DESC, b.id
+            LIMIT 1
+        """)).fetchone()
+        activity_id = conn.execute(text("SELECT MIN(id) FROM activities WHERE level = 1")).scalar()
+        leaf_id = conn.execute(text("SELECT MAX(id) FROM activities WHERE level = 3")).scalar()
+        organization_id = conn.execute(text("SELECT id FROM organizations ORDER BY id LIMIT 1 OFFSET (SELECT COUNT(*) / 2 FROM organizations)")).scalar()
+        card_ids = [row[0] for row in conn.execute(text("SELECT id FROM organizations ORDER BY id LIMIT 100"))]
+    name = "ромашка"
+    latitude, longitude = building.latitude, building.longitude
+
+    def helper(fn, **kwargs):
+        def call():
+            with SessionLocal() as db:
+                result = fn(db=db, **kwargs)
+                return list(result) if not isinstance(result, (list, tuple, dict)) else result
+        return call
+
+    def tree_cold(db):
+        activity_tree.invalidate()
+        return activity_tree.get(db).as_list()
+
+    client = TestClient(app)
+    api_key = get_settings().api_key
+
+    def post(url, **data):
+        def call():
+            response = client.post(url, data={"api_key": api_key, **data})
+            assert response.status_code == 200, (url, response.status_code)
+            return response.content
+        return call
+
+    def get(url, **params):
+        def call():
+            response = client.get(url, params={"api_key": api_key, **params})
+            assert response.status_code == 200, (url, response.status_code)
+            return response.content
+        return call
+
+    cases = {
+        # вспомогательные функции
+        "helper:get_all_buildings": helper(router.get_all_buildings),
+        "helper:get_activities": helper(router.get_activities),
+        "helper:activity_tree_cold": helper(tree_cold),
+        "helper:get_organizations_by_building": helper(router.get_organizations_by_building, building_id=building.id),
+        "helper:get_organizations_by_activity": helper(router.get_organizations_by_activity, activity_id=leaf_id),
+        "helper:get_organizations_by_activity_tree": helper(router.get_organizations_by_activity_tree, activity_id=activity_id),
+        "helper:get_organizations_by_name": helper(router.get_organizations_by_name, name=name),
+        "helper:search_organizations": helper(search_organizations, name=name),
+        "helper:get_buildings_nearby": helper(get_buildings_nearby, latitude=latitude, longitude=longitude, radius=1.0),
+        "helper:get_buildings_in_box": helper(get_buildings_in_box, **dict(zip(["min_lat", "max_lat", "min_lon", "max_lon"], rectangle(latitude, longitude, 2.0, 2.0)))),
+        "helper:get_organization_cards": helper(get_organization_cards, organization_ids=card_ids),
+        # HTML / NDJSON эндпоинты
+        "GET /": get("/"),
+        "POST /organizations/building": post("/organizations/building", building_id=building.id),
+        "POST /organizations/activity": post("/organizations/activity", activity_id=leaf_id),
+        "POST /organizations/nearby": post("/organizations/nearby", latitude=latitude, longitude=longitude, radius=1.0),
+        "POST /organizations/area": post("/organizations/area", latitude=latitude, longitude=longitude, width=2.0, height=2.0),
+        "POST /organization/id": post("/organization/id", organization_id=organization_id),
+        "POST /activity/level": post("/activity/level", activity_id=activity_id),
+        "POST /activity/level ndjson": post("/activity/level", activity_id=activity_id, format="ndjson"),
+        "POST /organizations/search_by_name": post("/organizations/search_by_name", name=name),
+        # JSON API
+        "GET /api/v1/organizations/by_building": get(f"/api/v1/organizations/by_building/{building.id}"),
+        "GET /api/v1/organizations/by_activity": get(f"/api/v1/organizations/by_activity/{leaf_id}"),
+        "GET /api/v1/organizations/by_activity_tree": get(f"/api/v1/organizations/by_activity_tree/{activity_id}"),
+        "GET /api/v1/organizations/nearby": get("/api/v1/organizations/nearby", latitude=latitude, longitude=longitude, radius=1.0),
+        "GET /api/v1/organizations/search": get("/api/v1/organizations/search", name=name),
+        "GET /api/v1/organizations/{id}": get(f"/api/v1/organizations/{organization_id}"),
+    }
+    results = {}
+    for case, fn in cases.items():
+        results[case] = measure(fn, repeat, queries)
+        print(f"{case:>48} {results[case]['p50_ms']:>10.2f} ms {results[case]['queries']:>5} q {results[case]['peak_kib']:>10.1f} KiB", file=sys.stderr)
+    return results
+
+
+# Сравнение с прежним результатом: замедление p50 более чем на tolerance или рост числа запросов -------------------------------------------
+def compare(current: dict, baseline: dict, tolerance: float) -> int:
+    regressions = 0
+    print(f"{'size':>8} {'case':>48} {'p50 old':>10} {'p50 new':>10} {'ratio':>7} {'queries':>9}")
+    for size, cases in current["results"].items():
+        for case, new in cases.items():
+            old = baseline.get("results", {}).get(size, {}).get(case)
+            if old is None:
+                continue
+            ratio = new["p50_ms"] / old["p50_ms"] if old["p50_ms"] else float("inf")
+            flag = ""
+            if ratio > 1 + tolerance or new["queries"] > old["queries"]:
+                flag = " <- регрессия"
+                regressions += 1
+            print(f"{size:>8} {case:>48} {old['p50_ms']:>10.2f} {new['p50_ms']:>10.2f} {ratio:>6.2f}x {old['queries']:>4}->{new['queries']:<4}{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000], help="число организаций (до 1 000 000)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--workdir", default=os.path.join(tempfile.gettempdir(), "nebus_bench"), help="каталог для сгенерированных БД")
+    parser.add_argument("--out", default="bench_endpoints.json", help="файл результатов (JSON)")
+    parser.add_argument("--compare", default=None, help="прежний результат (JSON) для сравнения")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="допустимое замедление p50 (0.2 = 20%%)")
+    parser.add_argument("--worker", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_worker(args.repeat)))
+        return
+
+    os.makedirs(args.workdir, exist_ok=True)
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = ""
+    current = {
+        "meta": {
+            "commit": commit,
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "platform": platform.platform(),
+            "seed": args.seed,
+            "repeat": args.repeat,
+        },
+        "results": {},
+    }
+    for size in args.sizes:
+        path = ensure_catalog(args.workdir, size, args.seed)
+        print(f"--- {size} организаций: {path}", file=sys.stderr)
+        env = {**os.environ, "DATABASE_URL": f"sqlite:///{path}", "CACHE_BACKEND": "none"}
+        worker = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--worker", path, "--repeat", str(args.repeat)],
+            env=env, stdout=subprocess.PIPE, check=True, text=True
+        )
+        current["results"][str(size)] = json.loads(worker.stdout.strip().splitlines()[-1])
+
+    with open(args.out, "w") as f:
+        json.dump(current, f, ensure_ascii=False, indent=2)
+    print(f"результаты: {args.out}", file=sys.stderr)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if compare(current, baseline, args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
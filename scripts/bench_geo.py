@@ -0,0 +1,88 @@
+"""
+    Сравнение скалярного расчета расстояний (цикл по зданиям, как было в router.py)
+    с векторным GeoIndex на 10k / 100k / 1M точек.
+
+    запуск: python scripts/bench_geo.py [--sizes 10000 100000 1000000] [--repeat 5]
+"""
+import argparse
+import math
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../')))
+
+from app.geo.engine import GeoIndex
+from app.geo.spatial import bounding_box
+
+
+# расстояние между двумя точками (в метрах) - прежняя скалярная реализация из router.py
+def distance(lat1, lon1, lat2, lon2):
+    R = 6371000
+    dLat = (lat2 - lat1) * math.pi / 180.0
+    dLon = (lon2 - lon1) * math.pi / 180.0
+    a = math.sin(dLat / 2) * math.sin(dLat / 2) + math.cos(lat1 * math.pi / 180.0) * math.cos(lat2 * math.pi / 180.0) * math.sin(dLon / 2) * math.sin(dLon / 2)
+    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+    return R * c
+
+
+# скалярный поиск: расстояние до каждого здания, отбор и сортировка
+def scalar_nearby(ids, latitudes, longitudes, latitude, longitude, radius):
+    hits = []
+    for id, lat, lon in zip(ids, latitudes, longitudes):
+        d = distance(latitude, longitude, lat, lon) / 1000
+        if d <= radius:
+            hits.append((d, id))
+    hits.sort()
+    return hits
+
+
+# лучшее время из repeat запусков (сек.)
+def best_time(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--radius", type=float, default=2.0, help="радиус поиска в км.")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    # центр поиска и облако точек размером примерно с крупный город (~40 x 40 км.)
+    latitude, longitude = 51.83, 107.59
+
+    print(f"{'points':>10} {'scalar, ms':>12} {'vector, ms':>12} {'vector+bbox, ms':>16} {'speedup':>8} {'hits':>8}")
+    for size in args.sizes:
+        latitudes = latitude + rng.uniform(-0.2, 0.2, size)
+        longitudes = longitude + rng.uniform(-0.3, 0.3, size)
+        ids = np.arange(1, size + 1)
+        index = GeoIndex(ids, latitudes, longitudes)
+        bbox = bounding_box(latitude, longitude, args.radius)
+
+        # для скалярного варианта - обычные списки Python, как строки из БД
+        ids_list, lat_list, lon_list = ids.tolist(), latitudes.tolist(), longitudes.tolist()
+        scalar_repeat = 1 if size >= 1_000_000 else args.repeat
+
+        t_scalar = best_time(lambda: scalar_nearby(ids_list, lat_list, lon_list, latitude, longitude, args.radius), scalar_repeat)
+        t_vector = best_time(lambda: index.query_radius(latitude, longitude, args.radius), args.repeat)
+        t_bbox = best_time(lambda: index.query_radius(latitude, longitude, args.radius, bbox=bbox), args.repeat)
+
+        # результаты обоих вариантов должны совпадать
+        hits_scalar = [id for _, id in scalar_nearby(ids_list, lat_list, lon_list, latitude, longitude, args.radius)]
+        hits_vector, _ = index.query_radius(latitude, longitude, args.radius, bbox=bbox)
+        assert sorted(hits_scalar) == sorted(hits_vector.tolist()), "результаты скалярного и векторного поиска различаются"
+
+        print(f"{size:>10} {t_scalar * 1000:>12.2f} {t_vector * 1000:>12.2f} {t_bbox * 1000:>16.2f} {t_scalar / t_bbox:>7.0f}x {len(hits_vector):>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+    Накладные расходы одного вызова: прежние запросы (text() на каждый вызов, Session.execute, схема Pydantic на каждую строку)
+    против готовых запросов app.services.repository (select() с параметрами, выполнение через соединение, строки Core).
+
+    запуск: python scripts/bench_repository.py [--database-url sqlite:///./test.db] [--calls 2000]
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '../'))
+sys.path.append(ROOT)
+
+from sqlalchemy import bindparam, create_engine, text
+from sqlalchemy.orm import sessionmaker
+
+from app.database.database import engine_options
+from app.schemas.schemas import ActivitySchema, OrganizationSchema, PhonesSchema
+from app.services import repository
+from app.services.repository import fetch_all
+
+
+# Прежние реализации (для сравнения) --------------------------------------------------------------------------------------------------------
+def old_phones(db, organization_id):
+    query = text("""
+        SELECT phone_number
+        FROM phones
+        WHERE organization_id = :organization_id
+    """)
+    return [PhonesSchema(organization_id=organization_id, phone_number=rec.phone_number) for rec in db.execute(query, {"organization_id": organization_id}).fetchall()]
+
+
+def old_activities(db, organization_id):
+    query = text("""
+        SELECT c.id, c.name, c.parent_id, c.level
+        FROM organization_activity a
+        LEFT JOIN activities c ON (a.activity_id = c.id)
+        WHERE a.organization_id = :organization_id
+        ORDER BY c.level, c.parent_id, c.id
+    """)
+    return [ActivitySchema(id=rec.id, name=rec.name, parent_id=rec.parent_id, level=rec.level) for rec in db.execute(query, {"organization_id": organization_id}).fetchall()]
+
+
+def old_organizations_by_building(db, building_id):
+    query = text("""
+        SELECT b.id, b.name, c.address
+        FROM building_organization a
+        LEFT JOIN organizations b ON b.id = a.organization_id
+        LEFT JOIN buildings c ON c.id = a.building_id
+        WHERE a.building_id = :building_id
+        ORDER BY b.name, b.id
+    """)
+    return db.execute(query, {"building_id": building_id}).fetchall()
+
+
+def old_organizations_by_activity(db, activity_id):
+    query = text("""
+        SELECT b.id, b.name
+        FROM organization_activity a
+        LEFT JOIN organizations b ON (a.organization_id = b.id)
+        WHERE a.activity_id = :activity_id
+        ORDER BY b.name, b.id
+    """)
+    organizations = []
+    for rec in db.execute(query, {"activity_id": activity_id}).fetchall():
+        organization = OrganizationSchema(id=rec.id, name=rec.name)
+        if not any(org.id == organization.id for org in organizations):
+            organizations.append(organization)
+    return organizations
+
+
+def old_organizations_by_buildings(db, building_ids):
+    query = text("""
+        SELECT b.id, b.name, a.building_id
+        FROM building_organization a
+        JOIN organizations b ON b.id = a.organization_id
+        WHERE a.building_id IN :building_ids
+        ORDER BY b.name, b.id
+    """).bindparams(bindparam("building_ids", expanding=True))
+    return db.execute(query, {"building_ids": building_ids}).fetchall()
+
+
+# Среднее время вызова в мкс. --------------------------------------------------------------------------------------------------------------
+def timed(fn, args_list) -> float:
+    for args in args_list[:50]:
+        fn(*args)
+    start = time.perf_counter()
+    for args in args_list:
+        fn(*args)
+    return (time.perf_counter() - start) / len(args_list) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default="sqlite:///./test.db")
+    parser.add_argument("--calls", type=int, default=2000)
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    engine = create_engine(args.database_url, **engine_options(args.database_url))
+    Session = sessionmaker(bind=engine, autoflush=False)
+    with Session() as db:
+        organization_ids = [row[0] for row in db.execute(text("SELECT id FROM organizations ORDER BY id"))]
+        building_ids = [row[0] for row in db.execute(text("SELECT id FROM buildings ORDER BY id"))]
+        activity_ids = [row[0] for row in db.execute(text("SELECT id FROM activities ORDER BY id"))]
+
+        def sample(ids):
+            return [(db, ids[i % len(ids)]) for i in range(args.calls)]
+
+        building_lists = [(db, building_ids[i % len(building_ids):i % len(building_ids) + 20]) for i in range(args.calls)]
+        cases = [
+            ("телефоны организации", old_phones, lambda db, id: fetch_all(db, repository.SELECT_PHONES, {"organization_id": id}), sample(organization_ids)),
+            ("деятельности организации", old_activities, lambda db, id: fetch_all(db, repository.SELECT_ACTIVITIES_BY_ORGANIZATION, {"organization_id": id}), sample(organization_ids)),
+            ("организации в здании", old_organizations_by_building, lambda db, id: fetch_all(db, repository.SELECT_ORGANIZATIONS_BY_BUILDING, {"building_id": id}), sample(building_ids)),
+            ("организации по деятельности", old_organizations_by_activity, lambda db, id: fetch_all(db, repository.SELECT_ORGANIZATIONS_BY_ACTIVITY, {"activity_id": id}), sample(activity_ids)[:max(args.calls // 10, 1)]),
+            ("организации в 20 зданиях", old_organizations_by_buildings, lambda db, ids: fetch_all(db, repository.SELECT_ORGANIZATIONS_BY_BUILDINGS, {"building_ids": ids}), building_lists),
+        ]
+        print(f"{'запрос':>30} {'прежний, мкс':>14} {'repository, мкс':>16} {'ускорение':>10}")
+        for name, old, new, calls in cases:
+            old_us = timed(old, calls)
+            new_us = timed(new, calls)
+            print(f"{name:>30} {old_us:>14.1f} {new_us:>16.1f} {old_us / new_us:>9.2f}x")
+
+
+if __name__ == "__main__":
+    main()
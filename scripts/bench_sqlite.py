@@ -0,0 +1,147 @@
+"""
+    Одновременные чтение и запись в SQLite: профиль по умолчанию (журнал отката, один движок на чтение и запись)
+    против профиля приложения (WAL, synchronous=NORMAL, mmap, кэш страниц, движок только для чтения и один писатель).
+
+    Каждый профиль запускается в отдельном процессе на своей копии каталога (scripts/generate_catalog.py):
+    readers потоков читают организации здания и их карточки, writers потоков добавляют телефоны (транзакция на запись).
+
+    запуск: python scripts/bench_sqlite.py [--organizations 10000] [--readers 8] [--writers 2] [--seconds 10]
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '../'))
+sys.path.append(ROOT)
+
+# Настройки профилей (переменные окружения app/database/database.py)
+PROFILES = {
+    "default": {
+        "SQLITE_JOURNAL_MODE": "DELETE",
+        "SQLITE_SYNCHRONOUS": "FULL",
+        "SQLITE_MMAP_SIZE": "",
+        "SQLITE_CACHE_SIZE": "",
+        "SQLITE_TEMP_STORE": "",
+        "SQLITE_BUSY_TIMEOUT": "",
+        "SQLITE_READ_ONLY": "false",
+    },
+    "tuned": {},
+}
+
+
+# Нагрузка в текущем процессе: потоки чтения и записи в течение seconds сек. ----------------------------------------------------------------
+def run_worker(readers: int, writers: int, seconds: float) -> dict:
+    import logging
+    from sqlalchemy import text
+    from app.database.database import ReadSessionLocal, SessionLocal, read_engine
+    from app.routes.router import get_organizations_by_building
+    from app.services.cards import get_organization_cards
+
+    logging.disable(logging.INFO)
+    with read_engine.connect() as conn:
+        building_ids = [row[0] for row in conn.execute(text("SELECT id FROM buildings"))]
+        organization_ids = [row[0] for row in conn.execute(text("SELECT id FROM organizations"))]
+
+    stop = time.perf_counter() + seconds
+    latencies = {"read": [], "write": []}
+    errors = {"read": 0, "write": 0}
+    lock = threading.Lock()
+
+    def reader(seed):
+        rng = random.Random(seed)
+        while time.perf_counter() < stop:
+            start = time.perf_counter()
+            try:
+                with ReadSessionLocal() as db:
+                    organizations = get_organizations_by_building(db=db, building_id=rng.choice(building_ids))
+                    get_organization_cards(db=db, organization_ids=[row.id for row in organizations[:20]])
+            except Exception:
+                with lock:
+                    errors["read"] += 1
+                continue
+            with lock:
+                latencies["read"].append(time.perf_counter() - start)
+
+    def writer(seed):
+        rng = random.Random(seed)
+        while time.perf_counter() < stop:
+            start = time.perf_counter()
+            try:
+                with SessionLocal() as db:
+                    db.execute(
+                        text("INSERT INTO phones (organization_id, phone_number) VALUES (:organization_id, :phone_number)"),
+                        {"organization_id": rng.choice(organization_ids), "phone_number": f"+7 (3012) {rng.randint(200000, 999999)}"}
+                    )
+                    db.commit()
+            except Exception:
+                with lock:
+                    errors["write"] += 1
+                continue
+            with lock:
+                latencies["write"].append(time.perf_counter() - start)
+
+    threads = [threading.Thread(target=reader, args=(i,)) for i in range(readers)]
+    threads += [threading.Thread(target=writer, args=(1000 + i,)) for i in range(writers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    result = {}
+    for kind, values in latencies.items():
+        values.sort()
+        result[kind] = {
+            "ops_per_sec": round(len(values) / seconds, 1),
+            "p50_ms": round(statistics.median(values) * 1000, 2) if values else None,
+            "p95_ms": round(values[max(int(len(values) * 0.95) - 1, 0)] * 1000, 2) if values else None,
+            "errors": errors[kind],
+        }
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--organizations", type=int, default=10_000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--writers", type=int, default=2)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--workdir", default=os.path.join(tempfile.gettempdir(), "nebus_bench"))
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_worker(args.readers, args.writers, args.seconds)))
+        return
+
+    from bench_endpoints import ensure_catalog
+    os.makedirs(args.workdir, exist_ok=True)
+    source = ensure_catalog(args.workdir, args.organizations, args.seed)
+
+    print(f"{'профиль':>8} {'чтений/с':>10} {'p95, мс':>9} {'ошибок':>7} {'записей/с':>10} {'p95, мс':>9} {'ошибок':>7}")
+    for profile, settings in PROFILES.items():
+        path = os.path.join(args.workdir, f"bench_sqlite_{profile}.db")
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+        shutil.copyfile(source, path)
+        env = {**os.environ, "DATABASE_URL": f"sqlite:///{path}", "CACHE_BACKEND": "none", **settings}
+        worker = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--worker", "--readers", str(args.readers), "--writers", str(args.writers), "--seconds", str(args.seconds)],
+            env=env, cwd=ROOT, stdout=subprocess.PIPE, check=True, text=True
+        )
+        result = json.loads(worker.stdout.strip().splitlines()[-1])
+        read, write = result["read"], result["write"]
+        print(f"{profile:>8} {read['ops_per_sec']:>10} {read['p95_ms']!s:>9} {read['errors']:>7} {write['ops_per_sec']:>10} {write['p95_ms']!s:>9} {write['errors']:>7}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+    Холодный запуск приложения: импорт main (с созданием приложения) в новом процессе под python -X importtime.
+
+    Печатает медиану времени импорта main по --repeat запускам и самые долгие модули (собственное время),
+    затем проверяет бюджет: время импорта main не больше --budget-ms и модули из --forbid не загружаются
+    при запуске (тяжелые зависимости должны импортироваться лениво - при первом использовании).
+
+    Код возврата 1 - бюджет превышен (для проверки в CI после изменения импортов).
+
+    запуск: python scripts/bench_startup.py [--repeat 5] [--budget-ms 1500] [--top 15] [--forbid pandas numpy pyarrow alembic redis]
+"""
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '../'))
+
+# Импорт приложения и список загруженных модулей (последняя строка вывода)
+PROBE = "import sys, main; print(' '.join(sorted(sys.modules)))"
+
+# Строка -X importtime: "import time: <собственное, мкс> | <с вложенными, мкс> | <отступ><модуль>"
+PATTERN_IMPORT = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)$")
+
+
+# Один запуск: {модуль: (собственное время, с вложенными) в мс.}, загруженные модули --------------------------------------------------------
+def run_once() -> tuple:
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", PROBE],
+        cwd=ROOT, env=os.environ.copy(), capture_output=True, text=True, check=True
+    )
+    times = {}
+    for line in process.stderr.splitlines():
+        match = PATTERN_IMPORT.match(line)
+        if match:
+            times[match.group(4)] = (int(match.group(1)) / 1000, int(match.group(2)) / 1000)
+    modules = set(process.stdout.strip().splitlines()[-1].split())
+    return times, modules
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=1500, help="предельное время импорта main, мс.")
+    parser.add_argument("--top", type=int, default=15, help="сколько самых долгих модулей печатать")
+    parser.add_argument("--forbid", nargs="*", default=["pandas", "numpy", "pyarrow", "alembic", "redis"],
+                        help="модули, которые не должны загружаться при запуске")
+    args = parser.parse_args()
+
+    # первый запуск - компиляция .pyc, в замер не входит
+    run_once()
+    runs = [run_once() for _ in range(args.repeat)]
+    main_ms = [times["main"][1] for times, _ in runs]
+    median_ms = statistics.median(main_ms)
+
+    # самые долгие модули последнего запуска (собственное время, без вложенных импортов)
+    times, modules = runs[-1]
+    print(f"{'модуль':>50} {'собств., мс':>12} {'всего, мс':>10}")
+    for name, (self_ms, total_ms) in sorted(times.items(), key=lambda item: item[1][0], reverse=True)[:args.top]:
+        print(f"{name:>50} {self_ms:>12.1f} {total_ms:>10.1f}")
+    print(f"импорт main: медиана {median_ms:.0f} мс., мин. {min(main_ms):.0f} мс. ({args.repeat} запусков), бюджет {args.budget_ms:.0f} мс.")
+
+    failed = False
+    if median_ms > args.budget_ms:
+        print(f"FAIL время импорта main {median_ms:.0f} мс. больше бюджета {args.budget_ms:.0f} мс.")
+        failed = True
+    loaded = sorted(name for name in args.forbid if name in modules)
+    if loaded:
+        print(f"FAIL при запуске загружены модули: {', '.join(loaded)}")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
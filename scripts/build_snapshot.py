@@ -0,0 +1,67 @@
+"""
+    Снимок каталога (SNAPSHOT_PATH): массивы numpy в одном файле, который воркеры отображают в память (np.memmap)
+    и по которому отвечают обработчики чтения app/routes/router.py без обращения к БД.
+
+    Без --check снимок строится по БД и атомарно подменяет прежний файл, затем карточки всех организаций
+    сверяются с get_organization_cards. Код возврата 1 - есть расхождения.
+
+    запуск: python scripts/build_snapshot.py [--database-url sqlite:///./test.db] [--output catalog.snapshot] [--check]
+"""
+import argparse
+import logging
+import os
+import sys
+
+from sqlalchemy import create_engine, select
+from sqlalchemy.orm import sessionmaker
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../')))
+
+from app.database.database import DATABASE_URL, configure_sqlite, engine_options
+from app.services.cards import chunked, get_organization_cards
+from app.services.repository import organizations
+from app.services.snapshot import SNAPSHOT_PATH, SnapshotService
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=DATABASE_URL)
+    parser.add_argument("--output", default=SNAPSHOT_PATH or None, help="файл снимка (по умолчанию SNAPSHOT_PATH)")
+    parser.add_argument("--check", action="store_true", help="только сверка, без перестроения")
+    args = parser.parse_args()
+    if not args.output:
+        parser.error("не задан файл снимка: --output или переменная окружения SNAPSHOT_PATH")
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    engine = create_engine(args.database_url, **engine_options(args.database_url))
+    configure_sqlite(engine)
+    Session = sessionmaker(bind=engine, autoflush=False)
+
+    service = SnapshotService(args.output)
+    if not args.check:
+        service.rebuild(engine)
+    snapshot = service.get()
+    if snapshot is None:
+        raise SystemExit(f"Снимок {args.output} не найден или поврежден")
+
+    # сверка карточек снимка с карточками из БД
+    different = []
+    with Session() as db:
+        ids = [row[0] for row in db.execute(select(organizations.c.id).order_by(organizations.c.id))]
+        missing = sorted(set(ids) - set(snapshot.organization_ids.tolist()))
+        stale = sorted(set(snapshot.organization_ids.tolist()) - set(ids))
+        for chunk in chunked(ids):
+            expected = {card.id: card.model_dump() for card in get_organization_cards(db=db, organization_ids=chunk)}
+            for card in snapshot.iter_cards(snapshot.ordinals_of(chunk)):
+                if card.model_dump() != expected.get(card.id):
+                    different.append(card.id)
+
+    result = {"missing": missing, "stale": stale, "different": different}
+    print(f"{'organizations':>13} {len(snapshot):>8}  {snapshot.meta}")
+    for name, found in result.items():
+        print(f"{name:>13} {len(found):>8}" + (f"  {found[:20]}" if found else ""))
+    sys.exit(1 if any(result.values()) else 0)
+
+
+if __name__ == "__main__":
+    main()
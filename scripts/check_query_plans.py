@@ -0,0 +1,187 @@
+"""
+    Проверка планов запросов (SQLite, EXPLAIN QUERY PLAN): каждый запрос app.services.repository и запросы
+    постраничной выдачи, поиска по названию и поиска зданий в прямоугольнике выполняются на БД,
+    их SQL перехватывается и для него строится план. Полный просмотр таблицы (SCAN <таблица>, в т.ч. по индексу
+    без условия) - ошибка, кроме явно разрешенных для запроса таблиц (например, список всех зданий).
+
+    Код возврата 1 - есть запросы с полным просмотром таблицы (для проверки в CI после изменения запросов или индексов;
+    та же проверка - tests/test_query_plans.py).
+
+    запуск: python scripts/check_query_plans.py [--database-url sqlite:///./test.db] [--verbose]
+"""
+import argparse
+import logging
+import os
+import re
+import sys
+from typing import Dict, List
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '../'))
+sys.path.append(ROOT)
+
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.orm import sessionmaker
+
+from app.database.database import engine_options
+from app.geo.spatial import bounding_box, get_buildings_in_box
+from app.services import repository
+from app.services.cards import get_organization_cards
+from app.services.pagination import encode_cursor, keyset_page
+from app.services.repository import fetch_all, fetch_one
+from app.services.search import name_filter, search_organizations
+
+# Строка плана с просмотром таблицы: SCAN <таблица> [USING [COVERING] INDEX ...]
+# (SCAN ... VIRTUAL TABLE - поиск по FTS5/R*Tree, SCAN CONSTANT ROW - без таблицы)
+PATTERN_SCAN = re.compile(r"^SCAN (?!CONSTANT ROW)(\w+)\b(?! VIRTUAL TABLE)")
+
+
+# Проверяемые запросы: (название, вызов (db, sample), таблицы, полный просмотр которых разрешен) ------------------------------------------
+def cases():
+    return [
+        # все здания и все деятельности выбираются целиком по назначению
+        ("все здания", lambda db, s: fetch_all(db, repository.SELECT_ALL_BUILDINGS), {"buildings"}),
+        ("все деятельности", lambda db, s: fetch_all(db, repository.SELECT_ACTIVITIES), {"activities"}),
+        ("дерево деятельностей", lambda db, s: fetch_all(db, repository.SELECT_ACTIVITY_ROWS), {"activities"}),
+        ("здание организации", lambda db, s: fetch_one(db, repository.SELECT_BUILDING_BY_ORGANIZATION, {"organization_id": s["organization_id"]}), set()),
+        ("телефоны организации", lambda db, s: fetch_all(db, repository.SELECT_PHONES, {"organization_id": s["organization_id"]}), set()),
+        ("деятельности организации", lambda db, s: fetch_all(db, repository.SELECT_ACTIVITIES_BY_ORGANIZATION, {"organization_id": s["organization_id"]}), set()),
+        ("деятельность", lambda db, s: fetch_one(db, repository.SELECT_ACTIVITY, {"activity_id": s["activity_id"]}), set()),
+        ("организация", lambda db, s: fetch_one(db, repository.SELECT_ORGANIZATION, {"organization_id": s["organization_id"]}), set()),
+        ("организации после курсора", lambda db, s: fetch_all(db, repository.SELECT_ORGANIZATION_IDS_AFTER, {"after_name": s["organization_name"], "after_id": s["organization_id"], "page_limit": 5}), set()),
+        ("организации в здании", lambda db, s: fetch_all(db, repository.SELECT_ORGANIZATIONS_BY_BUILDING, {"building_id": s["building_id"]}), set()),
+        ("организации в зданиях", lambda db, s: fetch_all(db, repository.SELECT_ORGANIZATIONS_BY_BUILDINGS, {"building_ids": s["building_ids"]}), set()),
+        ("ID организаций в здании", lambda db, s: fetch_all(db, repository.SELECT_ORGANIZATION_IDS_BY_BUILDING, {"building_id": s["building_id"]}), set()),
+        ("организации по деятельности", lambda db, s: fetch_all(db, repository.SELECT_ORGANIZATIONS_BY_ACTIVITY, {"activity_id": s["activity_id"]}), set()),
+        ("организации по дереву деятельностей", lambda db, s: fetch_all(db, repository.SELECT_ORGANIZATIONS_BY_ACTIVITY_TREE, {"activity_id": s["activity_id"]}), set()),
+        ("здания организаций", lambda db, s: fetch_all(db, repository.SELECT_BUILDINGS_OF_ORGANIZATIONS, {"organization_ids": s["organization_ids"]}), set()),
+        ("карточки: организации", lambda db, s: fetch_all(db, repository.SELECT_CARD_ORGANIZATIONS, {"ids": s["organization_ids"]}), set()),
+        ("карточки: телефоны", lambda db, s: fetch_all(db, repository.SELECT_CARD_PHONES, {"ids": s["organization_ids"]}), set()),
+        ("карточки: деятельности", lambda db, s: fetch_all(db, repository.SELECT_CARD_ACTIVITIES, {"ids": s["organization_ids"]}), set()),
+        ("карточки (organization_cards или по таблицам)", lambda db, s: get_organization_cards(db, s["organization_ids"]), set()),
+        # страницы организаций: первая и следующая (по курсору)
+        ("страница: здание", lambda db, s: pages(db, s, repository.SUBQUERY_ORGANIZATIONS_BY_BUILDING, {"building_id": s["building_id"]}), set()),
+        ("страница: здания", lambda db, s: pages(db, s, repository.SUBQUERY_ORGANIZATIONS_BY_BUILDINGS, {"building_ids": s["building_ids"]}), set()),
+        ("страница: деятельность", lambda db, s: pages(db, s, repository.SUBQUERY_ORGANIZATIONS_BY_ACTIVITY, {"activity_id": s["activity_id"]}), set()),
+        ("страница: дерево деятельностей", lambda db, s: pages(db, s, repository.SUBQUERY_ORGANIZATIONS_BY_ACTIVITY_TREE, {"activity_id": s["activity_id"]}), set()),
+        ("страница: название", lambda db, s: pages(db, s, *name_filter(db, s["name"])), set()),
+        # поиск по названию и зданий в прямоугольнике (без FTS5 / R*Tree - LIKE и индекс по координатам)
+        ("поиск по названию", lambda db, s: search_organizations(db=db, name=s["name"]), set()),
+        ("здания в прямоугольнике", lambda db, s: get_buildings_in_box(db, *bounding_box(s["latitude"], s["longitude"], 1.0)), set()),
+    ]
+
+
+def pages(db, sample, subquery, params):
+    keyset_page(db, subquery, params, limit=5)
+    keyset_page(db, subquery, params, limit=5, cursor=encode_cursor(sample["organization_name"], sample["organization_id"]))
+
+
+# Значения параметров запросов - из данных БД ----------------------------------------------------------------------------------------------
+def sample_values(db) -> dict:
+    organization = db.execute(text("""
+        SELECT o.id, o.name
+        FROM organizations o
+        JOIN building_organization bo ON bo.organization_id = o.id
+        ORDER BY o.id
+        LIMIT 1
+    """)).fetchone()
+    building = db.execute(text("SELECT id, latitude, longitude FROM buildings ORDER BY id LIMIT 1")).fetchone()
+    # деятельность верхнего уровня (с вложенными)
+    activity_id = db.execute(text("SELECT id FROM activities ORDER BY level, id LIMIT 1")).scalar()
+    building_ids = [row[0] for row in db.execute(text("SELECT id FROM buildings ORDER BY id LIMIT 5"))]
+    organization_ids = [row[0] for row in db.execute(text("SELECT id FROM organizations ORDER BY id LIMIT 5"))]
+    if organization is None or building is None or activity_id is None:
+        raise SystemExit("В БД нет данных для проверки (организации, здания, деятельности)")
+    return {
+        "organization_id": organization.id,
+        "organization_name": organization.name,
+        "organization_ids": organization_ids,
+        "building_id": building.id,
+        "building_ids": building_ids,
+        "latitude": building.latitude,
+        "longitude": building.longitude,
+        "activity_id": activity_id,
+        # первое слово названия организации
+        "name": organization.name.split()[0],
+    }
+
+
+# Таблицы с полным просмотром в плане запроса ------------------------------------------------------------------------------------------------
+def full_scans(plan) -> set:
+    tables = set()
+    for row in plan:
+        match = PATTERN_SCAN.match(row[3])
+        if match:
+            tables.add(match.group(1))
+    return tables
+
+
+# Планы запросов всех проверок: [{name, statement (None - запрос не выполнен), plan, scans - запрещенные полные просмотры}] -----------------------
+def query_plans(engine) -> List[Dict]:
+    if engine.dialect.name != "sqlite":
+        raise SystemExit("Проверка планов поддерживается только для SQLite (EXPLAIN QUERY PLAN)")
+    Session = sessionmaker(bind=engine, autoflush=False)
+
+    # SQL, выполненный в проверяемом вызове
+    captured = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        # служебные запросы (PRAGMA проверки наличия таблиц) не проверяются
+        if not conn.info.get("explain") and statement.lstrip().upper().startswith(("SELECT", "WITH")):
+            captured.append((statement, parameters))
+
+    results = []
+    event.listen(engine, "before_cursor_execute", capture)
+    try:
+        with Session() as db:
+            sample = sample_values(db)
+            connection = db.connection()
+            for name, call, allowed in cases():
+                captured.clear()
+                call(db, sample)
+                statements = list(captured)
+                if not statements:
+                    results.append({"name": name, "statement": None, "plan": [], "scans": set()})
+                for statement, parameters in statements:
+                    connection.info["explain"] = True
+                    try:
+                        plan = connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).fetchall()
+                    finally:
+                        connection.info["explain"] = False
+                    results.append({"name": name, "statement": statement, "plan": plan, "scans": full_scans(plan) - allowed})
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+    return results
+
+
+# Нарушения: запросы с полным просмотром таблиц и проверки, не выполнившие запроса
+def violations(results: List[Dict]) -> List[Dict]:
+    return [result for result in results if result["statement"] is None or result["scans"]]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default="sqlite:///./test.db")
+    parser.add_argument("--verbose", action="store_true", help="печатать планы всех запросов")
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    engine = create_engine(args.database_url, **engine_options(args.database_url))
+    results = query_plans(engine)
+    for result in results:
+        name, statement, scans = result["name"], result["statement"], result["scans"]
+        if statement is None:
+            print(f"?    {name}: запрос не выполнен")
+            continue
+        print(f"{'FAIL' if scans else 'ok':<4} {name}" + (f": полный просмотр {', '.join(sorted(scans))}" if scans else ""))
+        if scans or args.verbose:
+            print("     " + " ".join(statement.split()))
+            for row in result["plan"]:
+                print(f"       {row[3]}")
+
+    failed = len(violations(results))
+    print(f"Запросов с полным просмотром таблиц: {failed}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
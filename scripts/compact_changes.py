@@ -0,0 +1,41 @@
+"""
+    Сжатие журнала изменений change_log: удаляются записи, после которых есть запись о той же строке,
+    и (--retention-days) все записи старше срока хранения - клиентам с более старым курсором нужна полная выгрузка.
+
+    Запускается по расписанию (cron), одна транзакция.
+
+    запуск: python scripts/compact_changes.py [--database-url sqlite:///./test.db] [--retention-days 30]
+"""
+import argparse
+import logging
+import os
+import sys
+
+from sqlalchemy import create_engine
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../')))
+
+from app.database.database import DATABASE_URL, configure_sqlite, engine_options
+from app.services.changes import compact_changes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=DATABASE_URL)
+    parser.add_argument("--retention-days", type=float, default=None, help="срок хранения записей (без него - только свертка по строкам)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    engine = create_engine(args.database_url, **engine_options(args.database_url, writer=True))
+    configure_sqlite(engine)
+
+    retention_seconds = args.retention_days * 86400 if args.retention_days is not None else None
+    with engine.begin() as conn:
+        result = compact_changes(conn, retention_seconds=retention_seconds)
+
+    for name, value in result.items():
+        print(f"{name:>10} {value:>8}")
+
+
+if __name__ == "__main__":
+    main()
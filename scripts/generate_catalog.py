@@ -0,0 +1,188 @@
+"""
+    Детерминированный генератор тестового каталога (одинаковые seed и размер - одинаковые данные).
+
+    - дерево деятельностей в 3 уровня;
+    - здания сгруппированы в кварталы / районы вокруг центра города;
+    - организации распределены по зданиям неравномерно (торговые центры - сотни организаций, большинство зданий - единицы),
+      часть организаций - в двух зданиях;
+    - 1-5 телефонов и 1-3 вида деятельности (в основном листовых) на организацию.
+
+    Файлы для загрузки пишутся в формате scripts/import_catalog.py, с --database-url создается и заполняется новая БД
+    (схема - миграциями, данные - через import_catalog).
+
+    запуск: python scripts/generate_catalog.py --organizations 100000 --out DIR [--database-url sqlite:///catalog.db] [--seed 42]
+"""
+import argparse
+import logging
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import create_engine, text
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '../'))
+sys.path.append(ROOT)
+
+from app.database.database import engine_options
+from app.services.importer import import_catalog
+
+# Центр города (как в test.db)
+CENTER_LATITUDE, CENTER_LONGITUDE = 51.83, 107.59
+
+ROOT_ACTIVITIES = ["Еда", "Автомобили", "Одежда", "Строительство", "Медицина", "Образование", "Спорт", "Услуги"]
+CHILDREN_PER_ACTIVITY = 4
+
+ORGANIZATION_PREFIXES = ["ООО", "ИП", "АО", "ЗАО", "ПАО"]
+ORGANIZATION_PREFIX_WEIGHTS = [0.55, 0.25, 0.1, 0.06, 0.04]
+ORGANIZATION_WORDS = [
+    "Ромашка", "Вектор", "Престиж", "Гранит", "Сибирь", "Байкал", "Альянс", "Восток", "Меридиан", "Элита",
+    "Стандарт", "Прогресс", "Успех", "Лидер", "Мастер", "Хлеб", "Мясной двор", "Автомир", "Запчасть", "Строй",
+    "Медика", "Здоровье", "Знание", "Атлет", "Сервис", "Комфорт", "Уют", "Сфера", "Орион", "Полюс",
+]
+STREETS = [
+    "ул. Ленина", "ул. Балтахинова", "ул. Ербанова", "ул. Смолина", "пр. Строителей", "ул. Гагарина", "ул. Советская",
+    "ул. Коммунистическая", "ул. Кирова", "пр. Победы", "ул. Борсоева", "ул. Терешковой", "ул. Пушкина", "ул. Шумяцкого",
+]
+
+
+# Дерево деятельностей: корни, по CHILDREN_PER_ACTIVITY потомков на 2-м и 3-м уровне ---------------------------------------------------------
+def generate_activities() -> pd.DataFrame:
+    rows = []
+    for root in ROOT_ACTIVITIES:
+        root_id = len(rows) + 1
+        rows.append((root_id, root, None, 1))
+        for child in range(1, CHILDREN_PER_ACTIVITY + 1):
+            child_id = len(rows) + 1
+            rows.append((child_id, f"{root}: группа {child}", root_id, 2))
+            for leaf in range(1, CHILDREN_PER_ACTIVITY + 1):
+                rows.append((len(rows) + 1, f"{root}: группа {child}.{leaf}", child_id, 3))
+    return pd.DataFrame(rows, columns=["id", "name", "parent_id", "level"])
+
+
+# Таблицы каталога для organizations организаций: {таблица: DataFrame} --------------------------------------------------------------------
+def generate_catalog(organizations: int, seed: int = 42) -> dict:
+    rng = np.random.default_rng(seed)
+    activities = generate_activities()
+
+    # здания: кластеры (районы) вокруг центра, внутри кластера - нормальное распределение
+    buildings_count = max(20, organizations // 4)
+    clusters = max(3, buildings_count // 2000)
+    centers_lat = CENTER_LATITUDE + rng.uniform(-0.15, 0.15, clusters)
+    centers_lon = CENTER_LONGITUDE + rng.uniform(-0.25, 0.25, clusters)
+    spread = rng.uniform(0.005, 0.03, clusters)
+    cluster = rng.choice(clusters, buildings_count, p=rng.dirichlet(np.ones(clusters)))
+    buildings = pd.DataFrame({
+        "id": np.arange(1, buildings_count + 1),
+        "address": [f"{STREETS[street]} {house}" for street, house in zip(rng.integers(0, len(STREETS), buildings_count), rng.integers(1, 200, buildings_count))],
+        "latitude": np.round(centers_lat[cluster] + rng.normal(0, spread[cluster]), 6),
+        "longitude": np.round(centers_lon[cluster] + rng.normal(0, spread[cluster] * 1.6), 6),
+    })
+
+    # организации
+    prefixes = rng.choice(len(ORGANIZATION_PREFIXES), organizations, p=ORGANIZATION_PREFIX_WEIGHTS)
+    first = rng.integers(0, len(ORGANIZATION_WORDS), organizations)
+    second = rng.integers(-len(ORGANIZATION_WORDS), len(ORGANIZATION_WORDS), organizations)
+    names = [
+        f"{ORGANIZATION_PREFIXES[p]} {ORGANIZATION_WORDS[a]}" + (f" {ORGANIZATION_WORDS[b]}" if b >= 0 and b != a else "")
+        for p, a, b in zip(prefixes, first, second)
+    ]
+    organization_ids = np.arange(1, organizations + 1)
+    organizations_frame = pd.DataFrame({"id": organization_ids, "name": names})
+
+    # организации по зданиям: логнормальные веса - немного зданий с множеством организаций; 5% - во втором здании
+    weights = rng.lognormal(0, 1.5, buildings_count)
+    building_of = rng.choice(buildings_count, organizations, p=weights / weights.sum()) + 1
+    second_building = rng.random(organizations) < 0.05
+    building_organization = pd.DataFrame({
+        "building_id": np.concatenate([building_of, rng.integers(1, buildings_count + 1, second_building.sum())]),
+        "organization_id": np.concatenate([organization_ids, organization_ids[second_building]]),
+    })
+
+    # телефоны: 1-5 на организацию
+    phone_counts = rng.choice(np.arange(1, 6), organizations, p=[0.45, 0.25, 0.15, 0.1, 0.05])
+    phone_numbers = rng.integers(200000, 999999, phone_counts.sum())
+    phones = pd.DataFrame({
+        "organization_id": np.repeat(organization_ids, phone_counts),
+        "phone_number": [f"+7 (3012) {number // 10000}-{number // 100 % 100:02d}-{number % 100:02d}" for number in phone_numbers],
+    })
+
+    # деятельности: 1-3 на организацию, 80% - листовые (3-й уровень)
+    leaves = activities.loc[activities.level == 3, "id"].to_numpy()
+    activity_counts = rng.choice(np.arange(1, 4), organizations, p=[0.6, 0.3, 0.1])
+    total = activity_counts.sum()
+    organization_activity = pd.DataFrame({
+        "organization_id": np.repeat(organization_ids, activity_counts),
+        "activity_id": np.where(rng.random(total) < 0.8, rng.choice(leaves, total), rng.choice(activities.id.to_numpy(), total)),
+    })
+
+    return {
+        "activities": activities,
+        "buildings": buildings,
+        "organizations": organizations_frame,
+        "phones": phones,
+        "building_organization": building_organization,
+        "organization_activity": organization_activity,
+    }
+
+
+# Запись файлов для import_catalog (CSV) ------------------------------------------------------------------------------------------------
+def write_catalog(catalog: dict, directory: str):
+    os.makedirs(directory, exist_ok=True)
+    for table, frame in catalog.items():
+        frame.to_csv(os.path.join(directory, f"{table}.csv"), index=False)
+
+
+# Новая БД: схема миграциями, деятельности с таблицей замыкания, остальное - import_catalog ---------------------------------------------------
+def create_database(database_url: str, catalog: dict, directory: str):
+    from alembic import command
+    from alembic.config import Config
+
+    engine = create_engine(database_url, **engine_options(database_url))
+    config = Config(os.path.join(ROOT, "alembic.ini"))
+    config.set_main_option("script_location", os.path.join(ROOT, "alembic"))
+    with engine.begin() as conn:
+        config.attributes["connection"] = conn
+        command.upgrade(config, "head")
+
+    with engine.begin() as conn:
+        conn.execute(
+            text("INSERT INTO activities (id, name, parent_id, level) VALUES (:id, :name, :parent_id, :level)"),
+            [{**row, "parent_id": None if pd.isna(row["parent_id"]) else int(row["parent_id"])} for row in catalog["activities"].to_dict("records")]
+        )
+        conn.execute(text("""
+            INSERT INTO activity_closure (ancestor_id, descendant_id, depth)
+            WITH RECURSIVE tree (ancestor_id, descendant_id, depth) AS (
+                SELECT id, id, 0
+                FROM activities
+                UNION ALL
+                SELECT t.ancestor_id, a.id, t.depth + 1
+                FROM tree t
+                JOIN activities a ON a.parent_id = t.descendant_id
+            )
+            SELECT ancestor_id, descendant_id, depth
+            FROM tree
+        """))
+    import_catalog(engine, directory)
+    engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--organizations", type=int, default=10_000, help="число организаций (1 000 - 1 000 000)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", required=True, help="каталог для файлов")
+    parser.add_argument("--database-url", default=None, help="создать и заполнить новую БД (например, sqlite:///catalog.db)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    catalog = generate_catalog(args.organizations, seed=args.seed)
+    write_catalog(catalog, args.out)
+    for table, frame in catalog.items():
+        print(f"{table:>22} {len(frame):>10}")
+    if args.database_url:
+        create_database(args.database_url, catalog, args.out)
+
+
+if __name__ == "__main__":
+    main()
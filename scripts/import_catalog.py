@@ -0,0 +1,61 @@
+"""
+    Загрузка каталога (здания, организации, телефоны, связи) из файлов CSV / Parquet / NDJSON.
+
+    В каталоге ищутся файлы <таблица>.<csv|parquet|ndjson|jsonl>:
+        buildings             - id, address, latitude, longitude
+        organizations         - id, name
+        phones                - organization_id, phone_number
+        building_organization - building_id, organization_id
+        organization_activity - organization_id, activity_id (виды деятельности должны существовать)
+
+    Прерванная загрузка продолжается с последней зафиксированной пачки при повторном запуске.
+
+    запуск: python scripts/import_catalog.py DIR [--chunk-size 50000] [--keep-indexes] [--rejected-dir DIR/rejected]
+"""
+import argparse
+import logging
+import os
+import sys
+
+from sqlalchemy import create_engine
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../')))
+
+from app.database.database import DATABASE_URL, configure_sqlite, engine_options
+from app.services.importer import IMPORT_CHUNK_SIZE, import_catalog
+from app.services.snapshot import catalog_snapshot
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("directory", help="каталог с файлами для загрузки")
+    parser.add_argument("--database-url", default=DATABASE_URL)
+    parser.add_argument("--chunk-size", type=int, default=IMPORT_CHUNK_SIZE, help="строк в пачке (одна транзакция)")
+    parser.add_argument("--keep-indexes", action="store_true", help="не откладывать индексы и триггеры FTS5 / R*Tree (для небольших догрузок)")
+    parser.add_argument("--rejected-dir", default=None, help="куда сохранять отклоненные строки (по умолчанию DIR/rejected)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    engine = create_engine(args.database_url, **engine_options(args.database_url))
+    # профиль SQLite приложения: WAL (чтение во время загрузки не блокируется), busy_timeout
+    configure_sqlite(engine)
+    results = import_catalog(
+        engine,
+        args.directory,
+        chunk_size=args.chunk_size,
+        defer_indexes=not args.keep_indexes,
+        rejected_dir=args.rejected_dir or os.path.join(args.directory, "rejected")
+    )
+    # снимок каталога (SNAPSHOT_PATH) удаляется: до перестроения процессы сервера читают из БД
+    # (кэш ответов сбрасывать не нужно: загрузка сбрасывает журнал изменений, это новая версия каталога)
+    catalog_snapshot.invalidate()
+    # перестроение снимка каталога: процессы сервера переоткрывают файл при следующем запросе
+    catalog_snapshot.rebuild(engine)
+
+    print(f"{'table':>22} {'rows':>10} {'inserted':>10} {'rejected':>10}")
+    for table, stats in results.items():
+        print(f"{table:>22} {stats['rows']:>10} {stats['inserted']:>10} {stats['rejected']:>10}")
+
+
+if __name__ == "__main__":
+    main()
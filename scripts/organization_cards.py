@@ -0,0 +1,51 @@
+"""
+    Таблица карточек организаций organization_cards (SQLite): полное перестроение и сверка
+    с нормализованными таблицами (organizations, building_organization, buildings, phones, organization_activity, activities).
+
+    Без --check таблица перестраивается, затем сверяется. Код возврата 1 - есть расхождения.
+
+    запуск: python scripts/organization_cards.py [--database-url sqlite:///./test.db] [--check]
+"""
+import argparse
+import logging
+import os
+import sys
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../')))
+
+from app.database.database import DATABASE_URL, configure_sqlite, engine_options
+from app.services.cards import has_card_table
+from app.services.read_model import check_organization_cards, rebuild_organization_cards
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=DATABASE_URL)
+    parser.add_argument("--check", action="store_true", help="только сверка, без перестроения")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
+    engine = create_engine(args.database_url, **engine_options(args.database_url))
+    configure_sqlite(engine)
+    Session = sessionmaker(bind=engine, autoflush=False)
+
+    with Session() as db:
+        if not has_card_table(db):
+            raise SystemExit("Таблицы organization_cards нет (только SQLite, миграция a9c4e7d2f318)")
+        if not args.check:
+            rebuild_organization_cards(db.connection())
+            db.commit()
+            # версия каталога (журнал изменений) не меняется: карточки строятся по тем же таблицам каталога
+
+        result = check_organization_cards(db)
+
+    for name, ids in result.items():
+        print(f"{name:>10} {len(ids):>8}" + (f"  {ids[:20]}" if ids else ""))
+    sys.exit(1 if any(result.values()) else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+"""
+    Память главного процесса gunicorn и его воркеров (Linux, /proc/<pid>/smaps_rollup), МиБ.
+
+    rss - резидентная память процесса, pss - его доля (общие страницы делятся между процессами),
+    shared - общие страницы (загружены и прогреты в главном процессе до fork), private - собственные страницы.
+    Сумма pss по всем процессам - фактически занятая ими память; сумма rss учитывает общие страницы многократно.
+
+    запуск: python scripts/report_workers.py --pid <pid главного процесса> | --pidfile <файл gunicorn --pid>
+"""
+import argparse
+import os
+import sys
+
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '../')))
+
+from app.server import workers_memory
+
+COLUMNS = ("rss", "pss", "shared", "private")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument("--pid", type=int, help="pid главного процесса gunicorn")
+    group.add_argument("--pidfile", help="файл с pid главного процесса (gunicorn --pid)")
+    args = parser.parse_args()
+
+    pid = args.pid
+    if args.pidfile:
+        with open(args.pidfile) as f:
+            pid = int(f.read().strip())
+
+    report = workers_memory(pid)
+    print(f"{'pid':>8} {'роль':>7} " + " ".join(f"{name:>9}" for name in COLUMNS))
+    for process_pid, role, memory in report:
+        print(f"{process_pid:>8} {role:>7} " + " ".join(f"{memory[name] / 2 ** 20:>9.1f}" for name in COLUMNS))
+    print(f"{'':>8} {'всего':>7} " + " ".join(f"{sum(memory[name] for _, _, memory in report) / 2 ** 20:>9.1f}" for name in COLUMNS))
+
+
+if __name__ == "__main__":
+    main()
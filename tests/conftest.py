@@ -0,0 +1,141 @@
+"""
+    Общая настройка тестов: приложение работает с копией test.db во временном каталоге (миграции применяются
+    к копии, test.db в репозитории не меняется), кэш ответов и снимок каталога выключены.
+
+    Переменные окружения задаются до импорта приложения: движки БД создаются при импорте app.database.
+"""
+import os
+import shutil
+import sys
+import tempfile
+from contextlib import contextmanager
+
+import pytest
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '../'))
+sys.path.append(ROOT)
+# шаблоны и статические файлы приложения подключаются по путям от корня репозитория
+os.chdir(ROOT)
+
+TEST_DIR = tempfile.mkdtemp(prefix="nebus-tests-")
+TEST_DB = os.path.join(TEST_DIR, "test.db")
+shutil.copyfile(os.path.join(ROOT, "test.db"), TEST_DB)
+
+API_KEY = "test-api-key"
+os.environ["DATABASE_URL"] = f"sqlite:///{TEST_DB}"
+os.environ["API_KEY"] = API_KEY
+os.environ["CACHE_BACKEND"] = "none"
+os.environ["SNAPSHOT_PATH"] = ""
+os.environ["SCHEMA_CHECK"] = "verify"
+# счетчики выдачи считаются целиком (срок подсчета проверяется в test_facets)
+os.environ["FACET_BUDGET_MS"] = "60000"
+
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import event, insert
+
+from app.database.database import async_engine, engine, read_engine
+from app.services.repository import buildings
+
+# Размер малой выборки (большая - в 10 раз больше, обе - в пределах одной пачки карточек IN_CHUNK_SIZE)
+SMALL_SIZE = 20
+LARGE_SIZE = 10 * SMALL_SIZE
+
+
+# Миграции применяются к копии БД до импорта приложения ----------------------------------------------------------------------------------
+def upgrade_test_db():
+    config = Config(os.path.join(ROOT, "alembic.ini"))
+    config.set_main_option("script_location", os.path.join(ROOT, "alembic"))
+    command.upgrade(config, "head")
+
+
+upgrade_test_db()
+
+from fastapi.testclient import TestClient
+from main import app
+
+
+def pytest_sessionfinish(session, exitstatus):
+    for bind in (engine, read_engine):
+        bind.dispose()
+    shutil.rmtree(TEST_DIR, ignore_errors=True)
+
+
+@pytest.fixture(scope="session")
+def client():
+    with TestClient(app) as client:
+        yield client
+
+
+@pytest.fixture(scope="session")
+def api_headers():
+    return {"X-API-Key": API_KEY}
+
+
+# Две выборки одного вида: SMALL_SIZE и LARGE_SIZE организаций (свои здание, деятельность и слово в названии) -------------------------------
+@pytest.fixture(scope="session")
+def catalog(client, api_headers):
+    """
+        {"small": {...}, "large": {...}}: building_id, activity_id, latitude, longitude, name, size.<br>
+        Здания добавляются в БД напрямую (пакетная запись зданий не создает), деятельности и организации -
+        через /api/v1/batch (дерево деятельностей, карточки и индексы поддерживаются приложением).
+    """
+    samples = {
+        "small": {"size": SMALL_SIZE, "name": "Малинка", "latitude": 10.0, "longitude": 10.0},
+        "large": {"size": LARGE_SIZE, "name": "Брусника", "latitude": 20.0, "longitude": 20.0},
+    }
+    with engine.begin() as conn:
+        for key, sample in samples.items():
+            sample["building_id"] = conn.execute(
+                insert(buildings).values(address=f"Тестовое здание {key}", latitude=sample["latitude"], longitude=sample["longitude"])
+                .returning(buildings.c.id)
+            ).scalar_one()
+
+    batch = {"activities": [{"name": f"Тестовая деятельность {key}"} for key in samples], "organizations": []}
+    response = client.post("/api/v1/batch", json=batch, headers=api_headers)
+    assert response.status_code == 200, response.text
+    for sample, activity in zip(samples.values(), response.json()["activities"]):
+        sample["activity_id"] = activity["id"]
+
+    batch = {"organizations": [
+        {
+            "name": f"{sample['name']} {number:03d}",
+            "phones": [f"8-900-{number:03d}-00-00"],
+            "building_ids": [sample["building_id"]],
+            "activity_ids": [sample["activity_id"]],
+        }
+        for sample in samples.values() for number in range(sample["size"])
+    ]}
+    response = client.post("/api/v1/batch", json=batch, headers=api_headers)
+    assert response.status_code == 200, response.text
+    return samples
+
+
+# Счетчик SQL запросов ко всем движкам приложения (событие after_cursor_execute) ---------------------------------------------------------------
+class QueryCounter:
+
+    def __init__(self):
+        self.count = 0
+        self.statements = []
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        self.count += 1
+        self.statements.append(statement)
+
+
+@pytest.fixture
+def count_queries():
+    binds = {engine, read_engine, async_engine.sync_engine}
+
+    @contextmanager
+    def counting():
+        counter = QueryCounter()
+        for bind in binds:
+            event.listen(bind, "after_cursor_execute", counter)
+        try:
+            yield counter
+        finally:
+            for bind in binds:
+                event.remove(bind, "after_cursor_execute", counter)
+
+    return counting
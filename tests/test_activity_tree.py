@@ -0,0 +1,29 @@
+"""
+    Дерево деятельностей процесса перечитывается после записи деятельностей другим процессом (здесь - напрямую в БД,
+    минуя catalog_changed этого процесса): версия деятельностей хранится в журнале изменений.
+"""
+from sqlalchemy import delete, insert
+
+from app.database.database import SessionLocal, engine
+from app.services.activity_tree import ActivityTreeService
+from app.services.repository import activities
+
+
+def test_tree_reloaded_after_write_from_other_process():
+    service = ActivityTreeService()
+    with SessionLocal() as db:
+        tree = service.get(db)
+        assert service.get(db) is tree
+
+    with engine.begin() as conn:
+        activity_id = conn.execute(
+            insert(activities).values(name="Деятельность другого процесса", level=1).returning(activities.c.id)
+        ).scalar_one()
+    try:
+        with SessionLocal() as db:
+            reloaded = service.get(db)
+        assert reloaded is not tree
+        assert reloaded.nodes[activity_id].name == "Деятельность другого процесса"
+    finally:
+        with engine.begin() as conn:
+            conn.execute(delete(activities).where(activities.c.id == activity_id))
@@ -0,0 +1,43 @@
+"""
+    Кэш ответов в памяти процесса при нескольких воркерах: запись, выполненная другим процессом (здесь - напрямую в БД,
+    минуя catalog_changed этого процесса), сдвигает версию каталога, и закэшированный ответ больше не отдается.
+"""
+import pytest
+from sqlalchemy import text
+
+from app.database.database import engine
+from app.routes import caching
+from app.services.cache import MemoryCacheBackend, ResponseCache
+
+
+@pytest.fixture
+def memory_cache(monkeypatch):
+    cache = ResponseCache(MemoryCacheBackend())
+    monkeypatch.setattr(caching, "response_cache", cache)
+    return cache
+
+
+def test_write_from_other_process_changes_version(client, api_headers, catalog, memory_cache):
+    organization_id = client.get(
+        "/api/v1/organizations/by_building/{}".format(catalog["small"]["building_id"]), params={"limit": 1}, headers=api_headers
+    ).json()["items"][0]["id"]
+    path = f"/api/v1/organizations/{organization_id}"
+
+    first = client.get(path, headers=api_headers)
+    assert first.headers["X-Cache"] == "MISS"
+    assert client.get(path, headers=api_headers).headers["X-Cache"] == "HIT"
+    version = memory_cache.version()
+
+    with engine.begin() as conn:
+        name = conn.execute(text("SELECT name FROM organizations WHERE id = :id"), {"id": organization_id}).scalar_one()
+        conn.execute(text("UPDATE organizations SET name = :name WHERE id = :id"), {"name": name + " (2)", "id": organization_id})
+    try:
+        assert memory_cache.version() > version
+        # ETag прежней версии не совпадает, ответ строится заново
+        second = client.get(path, headers={**api_headers, "If-None-Match": first.headers["ETag"]})
+        assert second.status_code == 200
+        assert second.headers["X-Cache"] == "MISS"
+        assert second.json()["name"] == name + " (2)"
+    finally:
+        with engine.begin() as conn:
+            conn.execute(text("UPDATE organizations SET name = :name WHERE id = :id"), {"name": name, "id": organization_id})
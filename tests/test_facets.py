@@ -0,0 +1,53 @@
+"""
+    Срок подсчета счетчиков выдачи на БД (без снимка каталога): запрос прерывается по сроку, а не после выполнения.
+"""
+import asyncio
+import time
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from app.database.database import AsyncSessionLocal, ReadSessionLocal, statement_deadline
+from app.services import repository
+from app.services.facets import db_facets
+
+# Запрос на несколько секунд (рекурсивный счет до 10^8)
+SLOW_QUERY = text("WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < 100000000) SELECT count(*) FROM n")
+BUDGET = 0.05
+
+
+def test_statement_deadline_interrupts_query():
+    with ReadSessionLocal() as db:
+        start = time.perf_counter()
+        with pytest.raises(OperationalError):
+            with statement_deadline(db, start + BUDGET):
+                db.execute(SLOW_QUERY).scalar()
+        assert time.perf_counter() - start < 1
+        # после блока запросы соединения выполняются без срока
+        assert db.execute(text("SELECT 1")).scalar() == 1
+
+
+def test_statement_deadline_interrupts_async_query():
+    def slow(db):
+        with statement_deadline(db, time.perf_counter() + BUDGET):
+            return db.execute(SLOW_QUERY).scalar()
+
+    async def run():
+        async with AsyncSessionLocal() as db:
+            with pytest.raises(OperationalError):
+                await db.run_sync(slow)
+            return (await db.execute(text("SELECT 1"))).scalar()
+
+    start = time.perf_counter()
+    assert asyncio.run(run()) == 1
+    assert time.perf_counter() - start < 1
+
+
+def test_db_facets_incomplete_after_deadline(catalog):
+    params = {"activity_id": catalog["large"]["activity_id"]}
+    with ReadSessionLocal() as db:
+        complete = db_facets(db, repository.SUBQUERY_ORGANIZATIONS_BY_ACTIVITY_TREE, params, building_ids=None, deadline=time.perf_counter() + 60)
+        late = db_facets(db, repository.SUBQUERY_ORGANIZATIONS_BY_ACTIVITY_TREE, params, building_ids=None, deadline=time.perf_counter() - 1)
+    assert complete.complete and complete.total >= catalog["large"]["size"] and complete.activities and complete.buildings
+    assert not late.complete and late.total == complete.total and not late.activities and not late.buildings
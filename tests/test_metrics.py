@@ -0,0 +1,36 @@
+"""
+    Предупреждение о повторяющихся SQL запросах (N+1): запрос на каждую строку учитывается,
+    загрузка пачками по списку ID (IN с расширяемым параметром) - нет.
+"""
+from app.database.database import engine
+from app.services import repository
+from app.services.metrics import RequestStats, SQL_REPEAT_THRESHOLD, request_stats
+
+
+def run_in_request(execute) -> RequestStats:
+    stats = RequestStats()
+    token = request_stats.set(stats)
+    try:
+        with engine.connect() as conn:
+            execute(conn)
+    finally:
+        request_stats.reset(token)
+    return stats
+
+
+def test_per_row_query_is_repeated():
+    def execute(conn):
+        for id in range(SQL_REPEAT_THRESHOLD + 1):
+            conn.execute(repository.SELECT_ORGANIZATION, {"organization_id": id}).all()
+
+    assert len(run_in_request(execute).repeated()) == 1
+
+
+def test_chunked_query_is_not_repeated():
+    def execute(conn):
+        for chunk in range(SQL_REPEAT_THRESHOLD + 1):
+            conn.execute(repository.SELECT_CARD_PHONES, {"ids": list(range(chunk * 500, (chunk + 1) * 500))}).all()
+
+    stats = run_in_request(execute)
+    assert stats.queries == SQL_REPEAT_THRESHOLD + 1
+    assert stats.repeated() == []
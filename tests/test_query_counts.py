@@ -0,0 +1,64 @@
+"""
+    Число SQL запросов на HTTP запрос не зависит от размера выдачи (нет N+1): каждый эндпоинт вызывается
+    для выборки из SMALL_SIZE и из LARGE_SIZE организаций (см. conftest.catalog), запросы считаются
+    по событию after_cursor_execute.
+"""
+import pytest
+
+from conftest import API_KEY
+
+
+# Эндпоинт: (метод, путь, параметры по выборке); HTML списки - формы с API ключом, ответ потоковый
+def form(**fields):
+    return {**fields, "api_key": API_KEY}
+
+
+ENDPOINTS = {
+    "html_building": ("post", "/organizations/building", lambda s: form(building_id=s["building_id"])),
+    "html_building_ndjson": ("post", "/organizations/building", lambda s: form(building_id=s["building_id"], format="ndjson")),
+    "html_activity": ("post", "/organizations/activity", lambda s: form(activity_id=s["activity_id"])),
+    "html_nearby": ("post", "/organizations/nearby", lambda s: form(latitude=s["latitude"], longitude=s["longitude"], radius=1)),
+    "html_area": ("post", "/organizations/area", lambda s: form(latitude=s["latitude"], longitude=s["longitude"], width=0.1, height=0.1)),
+    "html_search": ("post", "/organizations/search_by_name", lambda s: form(name=s["name"], limit=1000)),
+    "api_by_building": ("get", "/api/v1/organizations/by_building/{building_id}", lambda s: {"limit": 100}),
+    "api_by_activity": ("get", "/api/v1/organizations/by_activity/{activity_id}", lambda s: {"limit": 100}),
+    "api_by_activity_tree": ("get", "/api/v1/organizations/by_activity_tree/{activity_id}", lambda s: {"limit": 100}),
+    "api_nearby": ("get", "/api/v1/organizations/nearby", lambda s: {"latitude": s["latitude"], "longitude": s["longitude"], "radius": 1, "limit": 100}),
+    "api_search": ("get", "/api/v1/organizations/search", lambda s: {"name": s["name"], "limit": 100}),
+    "api_filter": ("get", "/api/v1/organizations/filter", lambda s: {"activity_id": s["activity_id"], "name": s["name"], "limit": 100}),
+    "api_facets": ("get", "/api/v1/organizations/filter/facets", lambda s: {"activity_id": s["activity_id"], "limit": 100}),
+}
+
+
+def call(client, api_headers, endpoint: str, sample):
+    method, path, params = ENDPOINTS[endpoint]
+    path = path.format(**sample)
+    if method == "post":
+        return client.post(path, data=params(sample))
+    return client.get(path, params=params(sample), headers=api_headers)
+
+
+# Размер ответа: строки таблицы / NDJSON или элементы страницы JSON
+def result_size(response) -> int:
+    if response.headers["content-type"].startswith("application/json"):
+        body = response.json()
+        return len(body.get("items", []))
+    if "ndjson" in response.headers["content-type"]:
+        return len(response.text.splitlines())
+    return response.text.count("<tr") - 1
+
+
+@pytest.mark.parametrize("endpoint", ENDPOINTS)
+def test_query_count_does_not_depend_on_result_size(client, api_headers, catalog, count_queries, endpoint):
+    counts, sizes = {}, {}
+    for key, sample in catalog.items():
+        # первый вызов прогревает кэши процесса (наличие таблиц, дерево деятельностей)
+        call(client, api_headers, endpoint, sample)
+        with count_queries() as counter:
+            response = call(client, api_headers, endpoint, sample)
+        assert response.status_code == 200, response.text
+        counts[key] = counter.count
+        sizes[key] = result_size(response)
+
+    assert sizes["large"] > sizes["small"] > 0
+    assert counts["large"] == counts["small"], f"{endpoint}: {counts}"
@@ -0,0 +1,23 @@
+"""
+    Планы запросов приложения (scripts/check_query_plans.py) на копии БД тестов: нет полных просмотров таблиц.
+"""
+import os
+import sys
+
+import pytest
+
+from conftest import ROOT
+from app.database.database import engine
+
+sys.path.append(os.path.join(ROOT, "scripts"))
+from check_query_plans import query_plans, violations
+
+
+def test_no_full_table_scans(catalog):
+    if engine.dialect.name != "sqlite":
+        pytest.skip("EXPLAIN QUERY PLAN - только SQLite")
+    found = [
+        (result["name"], sorted(result["scans"]), " ".join((result["statement"] or "запрос не выполнен").split()))
+        for result in violations(query_plans(engine))
+    ]
+    assert found == []
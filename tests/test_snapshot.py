@@ -0,0 +1,97 @@
+"""
+    Выдача /api/v1/organizations/filter из снимка каталога совпадает с выдачей из БД: порядок страниц и курсоры
+    (порядок снимка - ORDER BY name, id базы данных, курсоры снимка и БД взаимозаменяемы).
+    Снимок, построенный по прежней версии каталога, не используется.
+"""
+import pytest
+from sqlalchemy import text
+
+from app.database.database import engine
+from app.routes import api_v1
+from app.services.changes import catalog_version
+from app.services.snapshot import SnapshotService
+
+# Названия с разными регистрами и алфавитами: порядок зависит от правил сравнения строк БД
+MIXED_NAMES = ["брусника", "Брусника", "Ёлка", "ёж", "Елка", "Apple", "apple", "Яблоко", "Zebra", "_Брусника", "Брусника-2"]
+PAGE_SIZE = 7
+
+
+@pytest.fixture(scope="module")
+def activity_id(client, api_headers, catalog):
+    sample = catalog["large"]
+    batch = {"organizations": [{"name": name, "building_ids": [sample["building_id"]], "activity_ids": [sample["activity_id"]]} for name in MIXED_NAMES]}
+    response = client.post("/api/v1/batch", json=batch, headers=api_headers)
+    assert response.status_code == 200, response.text
+    return sample["activity_id"]
+
+
+@pytest.fixture
+def snapshot(tmp_path):
+    service = SnapshotService(str(tmp_path / "catalog.snapshot"))
+    assert service.rebuild(engine) is not None
+    return service
+
+
+# Все страницы выдачи: [(ID организаций страницы, курсор следующей)]
+def pages(client, api_headers, params, cursor=None):
+    result = []
+    while True:
+        response = client.get("/api/v1/organizations/filter", params={**params, "limit": PAGE_SIZE, **({"cursor": cursor} if cursor else {})}, headers=api_headers)
+        assert response.status_code == 200, response.text
+        body = response.json()
+        result.append(([item["id"] for item in body["items"]], body["next_cursor"]))
+        cursor = body["next_cursor"]
+        if cursor is None:
+            return result
+
+
+def test_snapshot_pages_match_db(client, api_headers, activity_id, snapshot, monkeypatch):
+    params = {"activity_id": activity_id}
+    from_db = pages(client, api_headers, params)
+    monkeypatch.setattr(api_v1, "catalog_snapshot", snapshot)
+    from_snapshot = pages(client, api_headers, params)
+
+    assert from_snapshot == from_db
+    assert sum(len(ids) for ids, _ in from_db) > 2 * PAGE_SIZE
+
+
+def test_snapshot_continues_db_cursor(client, api_headers, activity_id, snapshot, monkeypatch):
+    params = {"activity_id": activity_id}
+    from_db = pages(client, api_headers, params)
+    monkeypatch.setattr(api_v1, "catalog_snapshot", snapshot)
+    for number, (_, cursor) in enumerate(from_db[:-1]):
+        assert pages(client, api_headers, params, cursor=cursor) == from_db[number + 1:]
+
+
+def test_snapshot_cursor_of_renamed_organization(client, api_headers, activity_id, snapshot, monkeypatch):
+    params = {"activity_id": activity_id}
+    first_ids, cursor = pages(client, api_headers, params)[0]
+    # организация курсора переименована после построения снимка и переместилась в начало выдачи
+    with engine.begin() as conn:
+        name = conn.execute(text("SELECT name FROM organizations WHERE id = :id"), {"id": first_ids[-1]}).scalar_one()
+        conn.execute(text("UPDATE organizations SET name = :name WHERE id = :id"), {"name": "0 " + name, "id": first_ids[-1]})
+    try:
+        from_db = pages(client, api_headers, params, cursor=cursor)
+        monkeypatch.setattr(api_v1, "catalog_snapshot", snapshot)
+        from_snapshot = pages(client, api_headers, params, cursor=cursor)
+    finally:
+        with engine.begin() as conn:
+            conn.execute(text("UPDATE organizations SET name = :name WHERE id = :id"), {"name": name, "id": first_ids[-1]})
+
+    assert [ids for ids, _ in from_snapshot] == [ids for ids, _ in from_db]
+
+
+def test_snapshot_of_previous_version_not_used(activity_id, snapshot):
+    with engine.connect() as conn:
+        version = catalog_version(conn)
+    assert snapshot.get(version) is not None
+
+    # запись другого процесса: снимок еще не удален, но построен по прежней версии каталога
+    with engine.begin() as conn:
+        conn.execute(text("UPDATE organizations SET name = name WHERE id IN (SELECT organization_id FROM organization_activity WHERE activity_id = :id)"), {"id": activity_id})
+    with engine.connect() as conn:
+        current = catalog_version(conn)
+    assert current > version
+    assert snapshot.get(current) is None
+    assert snapshot.rebuild(engine)["catalog_version"] == current
+    assert snapshot.get(current) is not None
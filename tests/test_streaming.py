@@ -0,0 +1,29 @@
+"""
+    Потоковые ответы со списком организаций: ошибка БД при загрузке первой пачки карточек возвращается как 500,
+    а не как 200 с пустым или обрезанным телом.
+"""
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy.exc import OperationalError
+
+from app.services import cards
+from conftest import API_KEY
+from main import app
+
+
+@pytest.fixture
+def failing_cards(monkeypatch):
+    def get_organization_cards(db, organization_ids):
+        raise OperationalError("SELECT ...", {}, Exception("database is locked"))
+
+    monkeypatch.setattr(cards, "get_organization_cards", get_organization_cards)
+
+
+@pytest.mark.parametrize("output_format", ["html", "ndjson"])
+def test_db_error_before_first_chunk_is_500(catalog, failing_cards, output_format):
+    with TestClient(app, raise_server_exceptions=False) as client:
+        response = client.post(
+            "/organizations/building",
+            data={"building_id": catalog["small"]["building_id"], "api_key": API_KEY, "format": output_format}
+        )
+    assert response.status_code == 500